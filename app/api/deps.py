@@ -1,12 +1,15 @@
+from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from app.core.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_db, get_async_db
 from app.core.security import verify_token
 from app.services.auth_service import AuthService
 from app.models.user import User
 
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 
 def get_current_user(
@@ -34,3 +37,47 @@ def get_current_user(
         )
 
     return user
+
+
+def get_current_user_id(
+        credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> int:
+    """仅校验令牌并返回用户ID（不查询数据库），用于可直接由缓存响应的只读接口"""
+    user_id = verify_token(credentials.credentials)
+
+    if user_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="无效的认证凭据",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    return int(user_id)
+
+
+def get_optional_user_id(
+        credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+) -> Optional[int]:
+    """可选登录：令牌有效时返回用户ID，否则返回 None（用于匿名可访问的接口）"""
+    if credentials is None:
+        return None
+    user_id = verify_token(credentials.credentials)
+    return int(user_id) if user_id is not None else None
+
+
+async def get_current_user_async(
+        credentials: HTTPAuthorizationCredentials = Depends(security),
+        db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """获取当前用户（异步会话，供 async def 路由使用）"""
+    user_id = get_current_user_id(credentials)
+
+    user = await db.get(User, user_id)
+
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="用户不存在"
+        )
+
+    return user
@@ -1,6 +1,8 @@
+import httpx
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from app.core.database import get_db
+from app.core.http_client import get_http_client
 from app.schemas.user import UserLogin, UserLoginResponse
 from app.services.auth_service import AuthService
 from app.core.exceptions import AuthenticationError
@@ -13,11 +15,12 @@ router = APIRouter()
 @router.post("/wechat/login", response_model=UserLoginResponse)
 async def wechat_login(
     login_data: UserLogin,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    http_client: httpx.AsyncClient = Depends(get_http_client)
 ):
 
     try:
-        auth_service = AuthService(db)
+        auth_service = AuthService(db, http_client)
         result = await auth_service.wechat_login(login_data.code)
         return result
     except AuthenticationError as e:
@@ -0,0 +1,66 @@
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from typing import Optional
+from app.core.http_client import get_http_client
+from app.schemas.district import DistrictListResponse
+from app.services.district_service import DistrictService
+from app.core.exceptions import NotFoundError, ValidationError, ServiceUnavailableError
+
+router = APIRouter()
+
+@router.get("", response_model=DistrictListResponse)
+async def list_districts(
+    keyword: Optional[str] = Query(None, description="名称、全拼或拼音首字母前缀；为空时返回省级列表"),
+    level: Optional[str] = Query(None, description="级别：province, city, district"),
+    limit: int = Query(20, ge=1, le=100, description="返回数量"),
+    http_client: httpx.AsyncClient = Depends(get_http_client)
+):
+    """行政区列表/搜索"""
+    try:
+        district_service = DistrictService(http_client)
+        result = await district_service.list_districts(keyword, level, limit)
+        return result
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ServiceUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取行政区失败: {str(e)}")
+
+@router.get("/{adcode}/children", response_model=DistrictListResponse)
+async def get_district_children(
+    adcode: str = Path(..., description="行政区编码"),
+    http_client: httpx.AsyncClient = Depends(get_http_client)
+):
+    """下级行政区"""
+    try:
+        district_service = DistrictService(http_client)
+        result = await district_service.get_children(adcode)
+        return result
+    except NotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ServiceUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取下级行政区失败: {str(e)}")
+
+@router.get("/{adcode}/ancestors", response_model=DistrictListResponse)
+async def get_district_ancestors(
+    adcode: str = Path(..., description="行政区编码"),
+    http_client: httpx.AsyncClient = Depends(get_http_client)
+):
+    """上级行政区链（省 -> 市 -> 区县，含自身）"""
+    try:
+        district_service = DistrictService(http_client)
+        result = await district_service.get_ancestors(adcode)
+        return result
+    except NotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ServiceUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取上级行政区失败: {str(e)}")
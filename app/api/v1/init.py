@@ -1,3 +1,3 @@
-from . import auth, trips, locations
+from . import auth, trips, locations, districts
 
-__all__ = ["auth", "trips", "locations"]
+__all__ = ["auth", "trips", "locations", "districts"]
@@ -1,41 +1,63 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.deps import get_optional_user_id
+from app.core.database import get_async_db
+from app.core.http_client import get_http_client
 from app.schemas.location import (
-    LocationListResponse, LocationDetailResponse, LocationAroundListResponse
+    LocationListResponse, LocationDetailResponse, LocationAroundListResponse, LocationSuggestResponse
 )
 from app.services.location_service import LocationService
-from app.core.exceptions import ValidationError
+from app.core.exceptions import ValidationError, ServiceUnavailableError
 
 router = APIRouter()
 
 @router.get("/search", response_model=LocationListResponse)
 async def search_locations(
+    request: Request,
     keyword: str = Query(..., description="搜索关键词"),
     city: Optional[str] = Query(None, description="城市名称"),
     page: int = Query(1, ge=1, description="页码"),
-    page_size: int = Query(20, ge=1, le=50, description="每页数量")
+    page_size: int = Query(20, ge=1, le=50, description="每页数量"),
+    user_id: Optional[int] = Depends(get_optional_user_id),
+    http_client: httpx.AsyncClient = Depends(get_http_client)
 ):
     """搜索地点"""
     try:
-        location_service = LocationService()
+        location_service = LocationService(http_client)
         result = await location_service.search_locations(keyword, city, page, page_size)
+        if page == 1:
+            # Later pages are the same search
+            location_service.record_search(
+                keyword, city, result.total, user_id,
+                request.client.host if request.client else None, request.headers.get("user-agent")
+            )
         return result
     except ValidationError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except ServiceUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"搜索失败: {str(e)}")
 
 @router.get("/detail", response_model=LocationDetailResponse)
 async def get_location_detail(
-    id: str = Query(..., description="地点ID")
+    id: str = Query(..., description="地点ID"),
+    http_client: httpx.AsyncClient = Depends(get_http_client),
+    db: AsyncSession = Depends(get_async_db),
+    user_id: Optional[int] = Depends(get_optional_user_id)
 ):
     """获取地点详情"""
     try:
-        location_service = LocationService()
+        location_service = LocationService(http_client, db)
         result = await location_service.get_location_detail(id)
+        location_service.record_view(user_id, result)
         return result
     except ValidationError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except ServiceUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取详情失败: {str(e)}")
 
@@ -45,14 +67,36 @@ async def search_around(
     radius: int = Query(3000, ge=100, le=50000, description="搜索半径(米)"),
     type: Optional[str] = Query(None, description="搜索类型"),
     page: int = Query(1, ge=1, description="页码"),
-    page_size: int = Query(20, ge=1, le=50, description="每页数量")
+    page_size: int = Query(20, ge=1, le=50, description="每页数量"),
+    http_client: httpx.AsyncClient = Depends(get_http_client)
 ):
     """周边搜索"""
     try:
-        location_service = LocationService()
+        location_service = LocationService(http_client)
         result = await location_service.search_around(location, radius, type, page, page_size)
         return result
     except ValidationError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except ServiceUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"周边搜索失败: {str(e)}")
+
+@router.get("/suggest", response_model=LocationSuggestResponse)
+async def suggest_locations(
+    keyword: str = Query(..., min_length=1, description="输入前缀（中文、全拼或拼音首字母）"),
+    city: Optional[str] = Query(None, description="城市名称"),
+    limit: int = Query(10, ge=1, le=20, description="返回数量"),
+    http_client: httpx.AsyncClient = Depends(get_http_client)
+):
+    """地点联想"""
+    try:
+        location_service = LocationService(http_client)
+        result = await location_service.suggest(keyword, city, limit)
+        return result
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ServiceUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"联想失败: {str(e)}")
@@ -1,29 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Path
-from sqlalchemy.orm import Session
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, Header, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
-from app.core.database import get_db
-from app.api.deps import get_current_user
+from app.core.database import get_async_db
+from app.core.http_client import get_http_client
+from app.api.deps import get_current_user_async, get_current_user_id
 from app.models.user import User
 from app.schemas.trip import (
     TripCreate, TripFullResponse, TripListResponse,
     TripOverviewResponse, TripDayDetailResponse, TripDayUpdate,
     TripFoodsResponse, TripCancelRequest, TripCancelResponse
 )
-from app.services.trip_service import TripService
+from app.services.trip_service import AsyncTripService
+from app.services.location_service import LocationService
 from app.core.exceptions import NotFoundError, PermissionError, ValidationError
+from app.utils.response_util import FastJSONResponse
 
 router = APIRouter()
 
 @router.post("", response_model=TripFullResponse)
-def create_trip(
+async def create_trip(
     trip_data: TripCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
+    http_client: httpx.AsyncClient = Depends(get_http_client)
 ):
     """创建行程"""
     try:
-        trip_service = TripService(db)
-        result = trip_service.create_trip(trip_data, current_user.id)
+        trip_service = AsyncTripService(db, current_user, LocationService(http_client, db))
+        result = await trip_service.create_trip(trip_data, current_user.id)
         return result
     except ValidationError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -31,39 +36,55 @@ def create_trip(
         raise HTTPException(status_code=500, detail=f"创建行程失败: {str(e)}")
 
 @router.get("", response_model=TripListResponse)
-def get_trips(
+async def get_trips(
     status: Optional[str] = Query(None, description="行程状态 (all/planning/completed/cancelled)"),
     trip_id: Optional[int] = Query(None, description="指定行程ID查询单个行程"),
     page: int = Query(1, ge=1, description="页码"),
     page_size: int = Query(20, ge=1, le=50, description="每页数量"),
     include_days: Optional[bool] = Query(False, description="是否包含每日行程简要信息，默认为false"),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="分页游标，取上一页返回的next_cursor"),
+    include_total: bool = Query(True, description="是否返回总数"),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取行程列表
 
     - **status**: 行程状态 (all/planning/completed/cancelled/inprogress)
     - **trip_id**: 如果提供，则优先根据ID查询单个行程，忽略其他筛选和分页参数
     - **include_days**: 是否在每个行程项中包含days_overview这样的每日简要信息
+    - **cursor**: 提供时按游标翻页并忽略page
+    - **include_total**: 为false时不统计总数
     """
     try:
-        trip_service = TripService(db)
-        result = trip_service.get_trips(user_id=current_user.id, status=status, trip_id=trip_id, page=page, page_size=page_size, include_days=include_days)
-        return result
+        trip_service = AsyncTripService(db, current_user)
+        result = await trip_service.get_trips_payload(
+            user_id=current_user.id, status=status, trip_id=trip_id, page=page, page_size=page_size,
+            include_days=include_days, cursor=cursor, include_total=include_total
+        )
+        return FastJSONResponse(result)
+    except NotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取行程列表失败: {str(e)}")
 
 @router.get("/{trip_id}/overview", response_model=TripOverviewResponse)
-def get_trip_overview(
+async def get_trip_overview(
     trip_id: int = Path(..., description="行程ID"),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    if_none_match: Optional[str] = Header(None),
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """获取行程总览"""
+    """获取行程总览（支持ETag / If-None-Match）"""
     try:
-        trip_service = TripService(db)
-        result = trip_service.get_trip_overview(trip_id, current_user.id)
-        return result
+        trip_service = AsyncTripService(db)
+        result, etag = await trip_service.get_trip_overview_payload(trip_id, current_user_id, if_none_match)
+        if result is None:
+            return Response(status_code=304, headers={"ETag": etag})
+        return FastJSONResponse(result, headers={"ETag": etag} if etag else None)
     except NotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except PermissionError as e:
@@ -72,17 +93,20 @@ def get_trip_overview(
         raise HTTPException(status_code=500, detail=f"获取行程总览失败: {str(e)}")
 
 @router.get("/{trip_id}/days/{day_index}", response_model=TripDayDetailResponse)
-def get_trip_day_detail(
+async def get_trip_day_detail(
     trip_id: int = Path(..., description="行程ID"),
     day_index: int = Path(..., description="第几天"),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    if_none_match: Optional[str] = Header(None),
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """获取行程日程详情"""
+    """获取行程日程详情（支持ETag / If-None-Match）"""
     try:
-        trip_service = TripService(db)
-        result = trip_service.get_trip_day_detail(trip_id, day_index, current_user.id)
-        return result
+        trip_service = AsyncTripService(db)
+        result, etag = await trip_service.get_trip_day_detail_payload(trip_id, day_index, current_user_id, if_none_match)
+        if result is None:
+            return Response(status_code=304, headers={"ETag": etag})
+        return FastJSONResponse(result, headers={"ETag": etag} if etag else None)
     except NotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except PermissionError as e:
@@ -91,17 +115,17 @@ def get_trip_day_detail(
         raise HTTPException(status_code=500, detail=f"获取行程详情失败: {str(e)}")
 
 @router.put("/{trip_id}/days/{day_index}", response_model=TripDayDetailResponse)
-def update_trip_day(
+async def update_trip_day(
     day_data: TripDayUpdate,
     trip_id: int = Path(..., description="行程ID"),
     day_index: int = Path(..., description="第几天"),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """修改行程日程详情"""
     try:
-        trip_service = TripService(db)
-        result = trip_service.update_trip_day(trip_id, day_index, day_data, current_user.id)
+        trip_service = AsyncTripService(db, current_user)
+        result = await trip_service.update_trip_day(trip_id, day_index, day_data, current_user.id)
         return result
     except NotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -113,15 +137,15 @@ def update_trip_day(
         raise HTTPException(status_code=500, detail=f"修改行程失败: {str(e)}")
 
 @router.get("/{trip_id}/foods", response_model=TripFoodsResponse)
-def get_trip_foods(
+async def get_trip_foods(
     trip_id: int = Path(..., description="行程ID"),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取行程美食攻略"""
     try:
-        trip_service = TripService(db)
-        result = trip_service.get_trip_foods(trip_id, current_user.id)
+        trip_service = AsyncTripService(db, current_user)
+        result = await trip_service.get_trip_foods(trip_id, current_user.id)
         return result
     except NotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -131,19 +155,22 @@ def get_trip_foods(
         raise HTTPException(status_code=500, detail=f"获取美食攻略失败: {str(e)}")
 
 @router.post("/{trip_id}/cancel", response_model=TripCancelResponse)
-def cancel_trip(
+async def cancel_trip(
+    cancel_data: TripCancelRequest,
     trip_id: int = Path(..., description="行程ID"),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """取消行程"""
     try:
-        trip_service = TripService(db)
-        cancelled_trip_data = trip_service.cancel_trip(trip_id, current_user.id)
+        trip_service = AsyncTripService(db, current_user)
+        cancelled_trip_data = await trip_service.cancel_trip(trip_id, current_user.id, cancel_data.confirm)
         return TripCancelResponse(data=cancelled_trip_data)
     except NotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except PermissionError as e:
         raise HTTPException(status_code=403, detail=str(e))
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"取消行程失败: {str(e)}")
@@ -1,6 +1,9 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from .config import settings
 
 engine = create_engine(
@@ -13,9 +16,50 @@ engine = create_engine(
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async drivers for the sync URLs we configure (mysql+pymysql://, sqlite://)
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_database_url() -> str:
+    """ASYNC_DATABASE_URL if set, otherwise DATABASE_URL with its async driver"""
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    url = make_url(settings.DATABASE_URL)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername)).render_as_string(hide_password=False)
+
+
+def _create_async_engine():
+    url = make_url(get_async_database_url())
+    if url.get_backend_name() == "sqlite":
+        # Local stand-in for MySQL; an in-memory database must be shared by all sessions
+        pool_kwargs = {"poolclass": StaticPool} if url.database in (None, "", ":memory:") else {}
+        return create_async_engine(url, echo=settings.DEBUG, **pool_kwargs)
+    return create_async_engine(
+        url,
+        pool_pre_ping=True,
+        pool_recycle=300,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        echo=settings.DEBUG
+    )
+
+
+async_engine = _create_async_engine()
+
+# expire_on_commit=False: attributes of committed objects must stay readable without implicit IO
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -21,3 +21,7 @@ class NotFoundError(TripPlannerException):
 class ValidationError(TripPlannerException):
     def __init__(self, message: str = "参数错误"):
         super().__init__(message, 40001)
+
+class ServiceUnavailableError(TripPlannerException):
+    def __init__(self, message: str = "服务暂时不可用"):
+        super().__init__(message, 50301)
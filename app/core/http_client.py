@@ -0,0 +1,68 @@
+import httpx
+from typing import Optional
+from app.core.config import settings
+
+# Process-wide client for outbound calls (AMap, weather, WeChat). Sharing one client
+# keeps connections alive across requests instead of paying a TCP/TLS handshake per call.
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def create_http_client(**overrides) -> httpx.AsyncClient:
+    """按配置创建HTTP客户端（overrides 透传给 httpx.AsyncClient，如 verify）"""
+    http2 = settings.HTTP2_ENABLED
+    if http2 and not _http2_available():
+        print("HTTP2_ENABLED is set but the h2 package is not installed; using HTTP/1.1")
+        http2 = False
+
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            settings.HTTP_TIMEOUT,
+            connect=settings.HTTP_CONNECT_TIMEOUT,
+            pool=settings.HTTP_POOL_TIMEOUT,
+        ),
+        **overrides
+    )
+
+
+async def start_http_client() -> httpx.AsyncClient:
+    """应用启动时创建共享客户端（由 lifespan 调用）"""
+    return shared_http_client()
+
+
+async def close_http_client():
+    """应用关闭时释放连接池（由 lifespan 调用）"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def shared_http_client() -> httpx.AsyncClient:
+    """获取共享客户端；未经 lifespan 启动时（脚本等）按需创建"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = create_http_client()
+    return _http_client
+
+
+async def get_http_client() -> httpx.AsyncClient:
+    """共享客户端的 FastAPI 依赖
+
+    Declared async so FastAPI resolves it on the event loop; a plain ``def``
+    dependency is run in the threadpool, a thread hop per request for a dict lookup.
+    """
+    return shared_http_client()
@@ -1,14 +1,46 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from app.core.config import settings
+from app.core.database import async_engine
+from app.core.http_client import start_http_client, close_http_client
 from app.core.exceptions import TripPlannerException
-from app.api.v1 import auth, trips, locations
+from app.utils.metrics import metrics
+from app.services.location_service import run_suggest_refresher, search_log_writer, history_writer, search_count_writer
+from app.services.trip_service import run_weather_refresher
+from app.api.v1 import auth, trips, locations, districts
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await start_http_client()
+    suggest_refresher = asyncio.create_task(run_suggest_refresher()) if settings.SUGGEST_ENABLED else None
+    weather_refresher = (
+        asyncio.create_task(run_weather_refresher())
+        if settings.WEATHER_REFRESH_ENABLED and settings.WEATHER_API_KEY else None
+    )
+    search_log_writer.start()
+    history_writer.start()
+    search_count_writer.start()
+    yield
+    if suggest_refresher is not None:
+        suggest_refresher.cancel()
+    if weather_refresher is not None:
+        weather_refresher.cancel()
+    # Write out buffered logs before the engine goes away
+    await search_log_writer.stop()
+    await history_writer.stop()
+    await search_count_writer.stop()
+    await close_http_client()
+    await async_engine.dispose()
 
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.VERSION,
-    debug=settings.DEBUG
+    debug=settings.DEBUG,
+    lifespan=lifespan
 )
 
 # CORS涓�闂翠欢
@@ -47,6 +79,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["璁よ瘉"])
 app.include_router(trips.router, prefix="/api/v1/trips", tags=["琛岀▼"])
 app.include_router(locations.router, prefix="/api/v1/locations", tags=["鍦扮偣"])
+app.include_router(districts.router, prefix="/api/v1/districts", tags=["行政区"])
 
 @app.get("/")
 async def root():
@@ -56,6 +89,11 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def get_metrics():
+    # Per worker process
+    return {"pid": os.getpid(), "counters": metrics.snapshot()}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -10,8 +10,8 @@ class Location(BaseModel):
 
     amap_poi_id = Column(String(64), unique=True, nullable=False, comment="高德POI ID")
     name = Column(String(128), nullable=False, comment="地点名称")
-    type = Column(String(32), comment="地点类型")
-    type_code = Column(String(16), comment="类型代码")
+    type = Column(String(128), comment="地点类型") # AMap types are ";"-joined paths, e.g. 风景名胜;风景名胜;国家级景点
+    type_code = Column(String(64), comment="类型代码") # may hold several codes joined with "|"
     address = Column(String(255), comment="详细地址") # Changed DECIMAL to String, address is not usually a number
     latitude = Column(DECIMAL(10, 6), comment="纬度")
     longitude = Column(DECIMAL(10, 6), comment="经度")
@@ -33,6 +33,7 @@ class Trip(BaseModel):
     like_count = Column(Integer, default=0, comment="点赞次数")
     share_count = Column(Integer, default=0, comment="分享次数")
     is_public = Column(Integer, default=0, comment="是否公开：0私密，1公开")
+    overview_snapshot = Column(MysqlJSON, comment="行程总览快照（读模型，写入时重建）")
 
     # 关系
     user = relationship("User", back_populates="trips")
@@ -51,6 +52,7 @@ class Trip(BaseModel):
         Index('idx_public', 'is_public', 'status'),
         Index('idx_start_datetime', 'start_datetime'),
         Index('idx_created_at', 'created_at'),
+        Index('idx_user_created', 'user_id', 'created_at', 'id'), # Keyset pagination of trip lists
         Index('idx_departure_poi_id', 'departure_poi_id'), # Added
     )
 
@@ -104,6 +106,7 @@ class TripDay(BaseModel):
     is_generated = Column(Integer, default=0, comment="是否已生成详细行程：0否，1是")
     place_count = Column(Integer, default=0, comment="景点数量")
     food_count = Column(Integer, default=0, comment="美食数量")
+    detail_snapshot = Column(MysqlJSON, comment="日程详情快照（读模型，写入时重建）")
 
     # 关系
     trip = relationship("Trip", back_populates="trip_days")
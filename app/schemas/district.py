@@ -0,0 +1,14 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List
+
+
+class DistrictResponse(BaseModel):
+    adcode: str = Field(..., description="行政区编码")
+    name: str = Field(..., description="行政区名称")
+    level: str = Field(..., description="级别：province, city, district")
+    center: Optional[str] = Field(None, description="中心点坐标，格式：经度,纬度")
+    citycode: Optional[str] = Field(None, description="城市编码")
+
+
+class DistrictListResponse(BaseModel):
+    districts: List[DistrictResponse]
@@ -63,3 +63,17 @@ class LocationListResponse(BaseModel):
 class LocationAroundListResponse(BaseModel):
     total: int
     locations: List[LocationAroundResponse]
+
+
+class LocationSuggestion(BaseModel):
+    id: Optional[str] = Field(None, description="地点ID（关键词联想为空）")
+    name: str = Field(..., description="联想词")
+    city: Optional[str] = None
+    district: Optional[str] = None
+    address: Optional[str] = None
+    location: Optional[str] = Field(None, description="坐标，格式：经度,纬度")
+    source: str = Field(..., description="来源：poi, keyword, amap")
+
+
+class LocationSuggestResponse(BaseModel):
+    suggestions: List[LocationSuggestion]
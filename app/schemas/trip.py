@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime, date, time
+from datetime import time as dt_time # for fields named `time`, which shadow the type in the class body
 from decimal import Decimal
 
 
@@ -59,12 +60,13 @@ class TripListItemResponse(BaseModel):
 
 
 class TripListResponse(BaseModel):
-    total: int
+    total: Optional[int] = Field(None, description="总数，include_total=false时不返回")
     page: int
     page_size: int
-    total_pages: int
+    total_pages: Optional[int] = None
     has_next: bool
     has_prev: bool
+    next_cursor: Optional[str] = Field(None, description="下一页游标，无下一页时为空")
     trips: List[TripListItemResponse]
 
 
@@ -112,7 +114,7 @@ class AccommodationInfo(BaseModel):
 
 class PointInfo(BaseModel):
     name: str
-    time: Optional[time] = None
+    time: Optional[dt_time] = None
     type: Optional[str] = None
     poi_id: Optional[str] = Field(None, description="地点POI ID")
 
@@ -0,0 +1,300 @@
+"""高德 Web 服务 API 客户端（限流、重试、熔断）
+
+Every AMap call goes through ``AmapClient.get``:
+
+1. Circuit breaker: after AMAP_BREAKER_FAILURES consecutive failed calls (each
+   counted once, after its retries) the circuit opens for AMAP_BREAKER_RESET
+   seconds, then lets one probe through.
+2. Token bucket: a per-process bucket (AMAP_PROCESS_QPS), then a Redis bucket shared
+   by all workers (AMAP_QPS). Both reserve a slot and sleep until it comes up; a
+   caller that would wait longer than its ``max_wait`` is throttled instead. If
+   Redis is unreachable the shared bucket fails open.
+3. Transient failures (transport errors, 5xx, AMap's QPS/busy infocodes) are retried
+   with full-jitter exponential backoff.
+
+Successful responses are also kept in Redis for AMAP_STALE_TTL. While the circuit
+is open, or when a call is throttled or fails, that stale copy is returned instead,
+marked so that ``is_stale`` is true: callers serve it but must not write it back to
+their own caches or tables as if it were fresh. Without one,
+``ServiceUnavailableError`` is raised. Responses with other non-"1"
+statuses (bad parameters, ...) are returned as-is for the caller to report.
+
+Redis (the shared bucket, the stale copies) is a blocking client and is only called
+through ``asyncio.to_thread``.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.exceptions import ServiceUnavailableError
+from app.core.http_client import shared_http_client
+from app.utils.cache import cache, CacheKeys
+from app.utils.metrics import metrics
+
+# ACCESS_TOO_FREQUENT, QPS limits, gateway timeout, server busy, resource unavailable
+TRANSIENT_INFOCODES = {"10004", "10014", "10015", "10016", "10017", "10019", "10020", "10021"}
+# DAILY_QUERY_OVER_LIMIT, USER_DAILY_QUERY_OVER_LIMIT: retrying will not help today
+QUOTA_INFOCODES = {"10003", "10044"}
+# Set on stale copies served while AMap is unavailable
+STALE_MARKER = "_stale"
+
+# Reserves one token and returns the wait in seconds, or -1 when it exceeds max_wait.
+# Uses the Redis clock so workers agree on time.
+_RESERVE_TOKEN = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local max_wait = tonumber(ARGV[3])
+local clock = redis.call("TIME")
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call("HMGET", KEYS[1], "tokens", "ts")
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens < 1 then
+    wait = (1 - tokens) / rate
+end
+if wait > max_wait then
+    redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "ts", tostring(now))
+    return "-1"
+end
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens - 1), "ts", tostring(now))
+redis.call("EXPIRE", KEYS[1], math.ceil(burst / rate) + 60)
+return tostring(wait)
+"""
+
+
+class AmapUnavailable(Exception):
+    """上游暂不可用（内部使用，对外转换为 stale 结果或 ServiceUnavailableError）"""
+
+    def __init__(self, reason: str):
+        self.reason = reason
+        super().__init__(reason)
+
+
+class TokenBucket:
+    """进程内令牌桶（预约式：先占位，再等待）"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        """占用一个令牌，返回需要等待的秒数；等待超过 max_wait 时不占用，返回 None"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        if wait > max_wait:
+            return None
+        self.tokens -= 1
+        return wait
+
+    def refund(self):
+        self.tokens = min(self.burst, self.tokens + 1)
+
+    def available(self) -> float:
+        """当前可用令牌数（只查看，不占用）"""
+        return min(self.burst, self.tokens + (time.monotonic() - self.updated_at) * self.rate)
+
+
+class RedisTokenBucket:
+    """跨 worker 共享的令牌桶"""
+
+    def __init__(self, key: str, rate: float, burst: float):
+        self.key = key
+        self.rate = rate
+        self.burst = burst
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        try:
+            wait = float(cache.redis_client.eval(_RESERVE_TOKEN, 1, self.key, self.rate, self.burst, max_wait))
+        except Exception as e:
+            metrics.incr("amap.redis_limiter_error")
+            print(f"Redis rate limiter error: {e}")
+            return 0.0
+        return None if wait < 0 else wait
+
+
+class CircuitBreaker:
+    """连续失败熔断器：closed -> open -> half-open（放行一个探测请求）"""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        # A probe that never reports back (throttled, cancelled) frees its slot after reset_timeout
+        self.probe_started: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        now = time.monotonic()
+        if state == "half-open" and (self.probe_started is None or now - self.probe_started >= self.reset_timeout):
+            self.probe_started = now
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+        metrics.set("amap.circuit_open", 0)
+
+    def record_failure(self):
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                metrics.incr("amap.circuit_opened")
+            # A failed probe (or a straggler) keeps it open for another reset_timeout
+            self.opened_at = time.monotonic()
+            self.probe_started = None
+            metrics.set("amap.circuit_open", 1)
+
+
+# Shared by every AmapClient in the process
+_local_bucket = TokenBucket(settings.AMAP_PROCESS_QPS, settings.AMAP_BURST)
+_shared_bucket = RedisTokenBucket(CacheKeys.AMAP_RATE_LIMIT, settings.AMAP_QPS, settings.AMAP_BURST)
+_breaker = CircuitBreaker(settings.AMAP_BREAKER_FAILURES, settings.AMAP_BREAKER_RESET)
+_waiting = 0
+
+
+def is_stale(data: Dict[str, Any]) -> bool:
+    """是否为上游不可用时返回的旧副本"""
+    return bool(data.get(STALE_MARKER))
+
+
+def has_spare_capacity(min_tokens: float = 1) -> bool:
+    """上游是否空闲：熔断关闭、无排队、本进程令牌充足（供可有可无的后台调用判断）"""
+    return _breaker.state == "closed" and _waiting == 0 and _local_bucket.available() >= min_tokens
+
+
+class AmapClient:
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
+        self.base_url = settings.AMAP_BASE_URL
+        self.api_key = settings.AMAP_API_KEY
+        self._http_client = http_client
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        return self._http_client or shared_http_client()
+
+    async def get(
+            self,
+            path: str,
+            params: Dict[str, Any],
+            stale: bool = True,
+            max_wait: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """调用高德接口，返回解析后的 JSON
+
+        ``stale`` keeps a copy of successful responses and serves it when AMap is
+        unavailable; turn it off for calls that must be current. ``max_wait`` caps the
+        time spent queued for a rate-limit slot (default AMAP_MAX_QUEUE_WAIT).
+        """
+        stale_key = self._stale_key(path, params) if stale else None
+        try:
+            data = await self._call(path, params, settings.AMAP_MAX_QUEUE_WAIT if max_wait is None else max_wait)
+        except AmapUnavailable as e:
+            if stale_key:
+                data = await asyncio.to_thread(cache.get, stale_key)
+                if data is not None:
+                    metrics.incr("amap.stale_served")
+                    data[STALE_MARKER] = True
+                    return data
+            raise ServiceUnavailableError(f"地图服务暂时不可用（{e.reason}），请稍后重试")
+
+        if stale_key and data.get("status") == "1":
+            await asyncio.to_thread(cache.set, stale_key, data, settings.AMAP_STALE_TTL)
+        return data
+
+    async def _call(self, path: str, params: Dict[str, Any], max_wait: float) -> Dict[str, Any]:
+        attempts = settings.AMAP_MAX_RETRIES + 1
+        reason = ""
+        for attempt in range(attempts):
+            if not _breaker.allow():
+                metrics.incr("amap.circuit_rejected")
+                raise AmapUnavailable("circuit open")
+            await self._acquire(max_wait)
+
+            metrics.incr("amap.requests")
+            try:
+                response = await self.http_client.get(f"{self.base_url}{path}", params={**params, "key": self.api_key})
+                if response.status_code >= 500:
+                    reason = f"HTTP {response.status_code}"
+                else:
+                    data = response.json()
+                    infocode = str(data.get("infocode", ""))
+                    if data.get("status") == "1" or infocode not in TRANSIENT_INFOCODES | QUOTA_INFOCODES:
+                        _breaker.record_success()
+                        return data
+                    reason = f"{data.get('info')} ({infocode})"
+                    if infocode in QUOTA_INFOCODES:
+                        _breaker.record_failure()
+                        metrics.incr("amap.quota_exceeded")
+                        raise AmapUnavailable(reason)
+            except (httpx.TransportError, ValueError) as e:
+                reason = type(e).__name__
+
+            metrics.incr("amap.transient_errors")
+            if _breaker.state != "closed":
+                # A failed probe reopens the circuit at once; no retries against it
+                break
+            if attempt + 1 < attempts:
+                metrics.incr("amap.retries")
+                # Full jitter
+                await asyncio.sleep(random.uniform(0, min(
+                    settings.AMAP_RETRY_MAX_BACKOFF, settings.AMAP_RETRY_BACKOFF * 2 ** attempt
+                )))
+        # One failure per call, once its retries are spent
+        _breaker.record_failure()
+        raise AmapUnavailable(reason)
+
+    @staticmethod
+    async def _acquire(max_wait: float):
+        global _waiting
+        wait = _local_bucket.reserve(max_wait)
+        if wait is not None and settings.AMAP_RATE_LIMIT_REDIS:
+            # Blocking redis-py call: keep it off the event loop
+            shared_wait = await asyncio.to_thread(_shared_bucket.reserve, max_wait - wait)
+            if shared_wait is None:
+                _local_bucket.refund()
+            wait = None if shared_wait is None else wait + shared_wait
+        if wait is None:
+            metrics.incr("amap.throttled")
+            raise AmapUnavailable("rate limited")
+        if wait <= 0:
+            return
+
+        metrics.incr("amap.throttle_waits")
+        metrics.incr("amap.throttle_wait_ms", int(wait * 1000))
+        _waiting += 1
+        metrics.set("amap.queue_depth", _waiting)
+        try:
+            await asyncio.sleep(wait)
+        finally:
+            _waiting -= 1
+            metrics.set("amap.queue_depth", _waiting)
+
+    @staticmethod
+    def _stale_key(path: str, params: Dict[str, Any]) -> str:
+        signature = json.dumps([path, sorted(params.items())], ensure_ascii=False, default=str)
+        return CacheKeys.AMAP_STALE.format(digest=hashlib.md5(signature.encode("utf-8")).hexdigest())
@@ -1,7 +1,9 @@
 import httpx
+from typing import Optional
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from app.core.config import settings
+from app.core.http_client import shared_http_client
 from app.core.security import create_access_token
 from app.core.exceptions import AuthenticationError, ValidationError
 from app.models.user import User
@@ -9,8 +11,13 @@ from app.schemas.user import UserCreate, UserLoginResponse, UserResponse
 
 
 class AuthService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, http_client: Optional[httpx.AsyncClient] = None):
         self.db = db
+        self._http_client = http_client
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        return self._http_client or shared_http_client()
 
     async def wechat_login(self, code: str) -> UserLoginResponse:
         """微信登录"""
@@ -77,31 +84,31 @@ class AuthService:
             "grant_type": "authorization_code"
         }
 
-        async with httpx.AsyncClient() as client:
-            token_response = await client.get(token_url, params=token_params)
-            token_data = token_response.json()
+        client = self.http_client
+        token_response = await client.get(token_url, params=token_params)
+        token_data = token_response.json()
 
-            if "errcode" in token_data:
-                raise AuthenticationError(f"获取微信access_token失败: {token_data.get('errmsg')}")
+        if "errcode" in token_data:
+            raise AuthenticationError(f"获取微信access_token失败: {token_data.get('errmsg')}")
 
-            access_token = token_data["access_token"]
-            openid = token_data["openid"]
+        access_token = token_data["access_token"]
+        openid = token_data["openid"]
 
-            # 第二步：通过access_token获取用户信息
-            user_url = "https://api.weixin.qq.com/sns/userinfo"
-            user_params = {
-                "access_token": access_token,
-                "openid": openid,
-                "lang": "zh_CN"
-            }
+        # 第二步：通过access_token获取用户信息
+        user_url = "https://api.weixin.qq.com/sns/userinfo"
+        user_params = {
+            "access_token": access_token,
+            "openid": openid,
+            "lang": "zh_CN"
+        }
 
-            user_response = await client.get(user_url, params=user_params)
-            user_data = user_response.json()
+        user_response = await client.get(user_url, params=user_params)
+        user_data = user_response.json()
 
-            if "errcode" in user_data:
-                raise AuthenticationError(f"获取微信用户信息失败: {user_data.get('errmsg')}")
+        if "errcode" in user_data:
+            raise AuthenticationError(f"获取微信用户信息失败: {user_data.get('errmsg')}")
 
-            return user_data
+        return user_data
 
     def get_user_by_id(self, user_id: int) -> User:
         """根据ID获取用户"""
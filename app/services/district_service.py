@@ -0,0 +1,111 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+from app.core.exceptions import NotFoundError, ValidationError
+from app.services.amap_client import AmapClient
+from app.services.district_tree import DistrictTree, LEVELS
+from app.schemas.district import DistrictResponse, DistrictListResponse
+
+# Loaded once per process: from the snapshot file while it is fresh, otherwise from AMap
+_tree: Optional[DistrictTree] = None
+# Bound to the loop it first waits in, so created per running loop (see _load_lock)
+_tree_lock: Optional[Tuple[asyncio.AbstractEventLoop, asyncio.Lock]] = None
+
+
+class DistrictService:
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
+        self.amap = AmapClient(http_client)
+
+    async def list_districts(self, keyword: Optional[str] = None, level: Optional[str] = None, limit: int = 20) -> DistrictListResponse:
+        """行政区列表：无关键词时为省级列表，否则按名称/拼音前缀搜索"""
+        if level is not None and level not in LEVELS:
+            raise ValidationError(f"不支持的行政级别: {level}")
+        tree = await self.get_tree()
+        nodes = tree.search(keyword, level, limit) if keyword else tree.roots()
+        return self._to_response(tree, nodes)
+
+    async def get_children(self, adcode: str) -> DistrictListResponse:
+        """下级行政区"""
+        tree = await self.get_tree()
+        return self._to_response(tree, tree.children[self._find(tree, adcode)])
+
+    async def get_ancestors(self, adcode: str) -> DistrictListResponse:
+        """上级链（省 -> ... -> 自身）"""
+        tree = await self.get_tree()
+        return self._to_response(tree, tree.ancestors(self._find(tree, adcode)))
+
+    async def get_tree(self) -> DistrictTree:
+        global _tree
+        if _tree is None:
+            async with _load_lock():
+                if _tree is None:
+                    _tree = await self._load_tree()
+        return _tree
+
+    async def _load_tree(self) -> DistrictTree:
+        path = settings.DISTRICT_SNAPSHOT_PATH
+        snapshot, age = await asyncio.to_thread(self._read_snapshot, path)
+        if snapshot is not None and age <= settings.DISTRICT_SNAPSHOT_MAX_AGE_DAYS * 86400:
+            return DistrictTree.from_snapshot(snapshot)
+
+        try:
+            # ~1 MB response: not worth a stale copy in Redis, the snapshot file is one
+            data = await self.amap.get(
+                "/config/district", {"keywords": "", "subdistrict": 3, "extensions": "base"}, stale=False
+            )
+            if data.get("status") != "1":
+                raise ValidationError(f"获取行政区划失败: {data.get('info')}")
+            tree = DistrictTree.from_amap(data)
+        except Exception as e:
+            if snapshot is None:
+                raise
+            print(f"District refresh failed, using the old snapshot: {e}")
+            return DistrictTree.from_snapshot(snapshot)
+
+        await asyncio.to_thread(self._write_snapshot, path, tree.to_snapshot())
+        return tree
+
+    @staticmethod
+    def _read_snapshot(path: str):
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f), time.time() - os.path.getmtime(path)
+        except (OSError, ValueError):
+            return None, None
+
+    @staticmethod
+    def _write_snapshot(path: str, snapshot: Dict[str, Any]):
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            # Replaced atomically: other workers may be reading it
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"District snapshot write error: {e}")
+
+    @staticmethod
+    def _find(tree: DistrictTree, adcode: str) -> int:
+        node = tree.find(adcode)
+        if node is None:
+            raise NotFoundError(f"行政区不存在: {adcode}")
+        return node
+
+    @staticmethod
+    def _to_response(tree: DistrictTree, nodes: List[int]) -> DistrictListResponse:
+        return DistrictListResponse(districts=[DistrictResponse(**tree.node(node)) for node in nodes])
+
+
+def _load_lock() -> asyncio.Lock:
+    global _tree_lock
+    loop = asyncio.get_running_loop()
+    if _tree_lock is None or _tree_lock[0] is not loop:
+        _tree_lock = (loop, asyncio.Lock())
+    return _tree_lock[1]
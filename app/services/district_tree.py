@@ -0,0 +1,139 @@
+"""行政区划树（内存）
+
+The whole hierarchy (country > province > city > district, about 3,600 nodes) is
+held in parallel lists indexed by node number, with a parent index per node, so
+ancestors are a walk of at most four steps. Names are searchable by prefix of the
+name, its full pinyin or its pinyin initials, through the same bisect-over-sorted-
+keys scheme as the suggest index.
+
+``to_snapshot``/``from_snapshot`` round-trip the tree through plain JSON-able lists,
+so it can be persisted to disk and loaded without calling AMap.
+"""
+import heapq
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional
+
+from app.services.suggest_index import index_keys, normalize
+
+LEVELS = ("country", "province", "city", "district")
+_END = "\U0010ffff"
+
+
+class DistrictTree:
+    """行政区划树（adcode 查找、下级、上级链、名称前缀搜索）"""
+
+    def __init__(self):
+        self.adcodes: List[str] = []
+        self.names: List[str] = []
+        self.levels: List[int] = []
+        self.centers: List[Optional[str]] = []
+        self.citycodes: List[Optional[str]] = []
+        self.parents: List[int] = []
+        self.children: List[List[int]] = []
+        self._by_adcode: Dict[str, int] = {}
+        self._keys: List[str] = []
+        self._refs: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.adcodes)
+
+    @classmethod
+    def from_amap(cls, data: Dict[str, Any]) -> "DistrictTree":
+        """由高德 /config/district（subdistrict=3）的响应构建"""
+        tree = cls()
+        stack = [(-1, district) for district in reversed(data.get("districts", []))]
+        while stack:
+            parent, district = stack.pop()
+            # Cities without districts (e.g. 东莞市) list streets instead; they repeat the city's adcode
+            if district.get("level") not in LEVELS:
+                continue
+            node = tree._add(
+                district["adcode"], district["name"], LEVELS.index(district["level"]), parent,
+                _text(district.get("center")), _text(district.get("citycode"))
+            )
+            stack.extend((node, child) for child in reversed(district.get("districts") or []))
+        tree._build_keys()
+        return tree
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict[str, Any]) -> "DistrictTree":
+        tree = cls()
+        for adcode, name, level, parent, center, citycode in snapshot["nodes"]:
+            tree._add(adcode, name, level, parent, center, citycode)
+        tree._build_keys()
+        return tree
+
+    def to_snapshot(self) -> Dict[str, Any]:
+        return {"nodes": [
+            [self.adcodes[i], self.names[i], self.levels[i], self.parents[i], self.centers[i], self.citycodes[i]]
+            for i in range(len(self))
+        ]}
+
+    def _add(self, adcode: str, name: str, level: int, parent: int, center: Optional[str], citycode: Optional[str]) -> int:
+        node = len(self.adcodes)
+        self.adcodes.append(adcode)
+        self.names.append(name)
+        self.levels.append(level)
+        self.parents.append(parent)
+        self.centers.append(center)
+        self.citycodes.append(citycode)
+        self.children.append([])
+        if parent >= 0:
+            self.children[parent].append(node)
+        # Municipalities repeat their adcode one level down (北京市 / 北京城区); keep the upper node
+        self._by_adcode.setdefault(adcode, node)
+        return node
+
+    def _build_keys(self):
+        pairs = sorted((key, node) for node, name in enumerate(self.names) for key in index_keys(name))
+        self._keys = [key for key, _ in pairs]
+        self._refs = [node for _, node in pairs]
+
+    # 查询
+
+    def node(self, index: int) -> Dict[str, Any]:
+        return {
+            "adcode": self.adcodes[index],
+            "name": self.names[index],
+            "level": LEVELS[self.levels[index]],
+            "center": self.centers[index],
+            "citycode": self.citycodes[index],
+        }
+
+    def find(self, adcode: str) -> Optional[int]:
+        return self._by_adcode.get(adcode)
+
+    def roots(self) -> List[int]:
+        """顶层（省级）节点；树根为国家时返回其下级"""
+        roots = [node for node, parent in enumerate(self.parents) if parent < 0]
+        if len(roots) == 1 and self.levels[roots[0]] == 0:
+            return self.children[roots[0]]
+        return roots
+
+    def ancestors(self, index: int) -> List[int]:
+        """自顶向下的上级链（不含国家，含自身）"""
+        chain = []
+        while index >= 0:
+            if self.levels[index] > 0:
+                chain.append(index)
+            index = self.parents[index]
+        chain.reverse()
+        return chain
+
+    def search(self, keyword: str, level: Optional[str] = None, limit: int = 20) -> List[int]:
+        """名称/全拼/首字母前缀匹配；高层级、短名称在前"""
+        prefix = normalize(keyword)
+        if not prefix:
+            return []
+        low = bisect_left(self._keys, prefix)
+        high = bisect_left(self._keys, prefix + _END, low)
+        matches = set(self._refs[low:high])
+        if level is not None:
+            wanted = LEVELS.index(level)
+            matches = {node for node in matches if self.levels[node] == wanted}
+        return heapq.nsmallest(limit, matches, key=lambda node: (self.levels[node], len(self.names[node]), self.adcodes[node]))
+
+
+def _text(value) -> Optional[str]:
+    # AMap returns [] instead of "" for empty fields
+    return value if isinstance(value, str) and value else None
@@ -0,0 +1,124 @@
+"""逐日天气聚合引擎
+
+The 5 day / 3 hour forecast is 40 slots stamped in UTC (``dt``, a unix timestamp).
+One pass over them converts each slot to a local date in the trip's timezone and
+folds it into that day's running aggregate. The slots are never rescanned per day.
+A day's WeatherInfo gets:
+- the lowest ``temp_min`` and highest ``temp_max`` of its slots
+- the most frequent condition, with daytime slots winning ties
+- the highest probability of precipitation
+- the mean humidity and wind speed, over the slots that report them
+
+Days at either end of the window can be partial (a few slots only); they are still
+reported.
+"""
+from collections import Counter
+from datetime import date, datetime, tzinfo
+from typing import Any, Dict, Iterable, Optional
+
+import pytz
+
+from app.schemas.trip import WeatherInfo
+
+DEFAULT_TIMEZONE = "Asia/Shanghai"
+
+
+def resolve_timezone(name: Optional[str]) -> tzinfo:
+    try:
+        return pytz.timezone(name or DEFAULT_TIMEZONE)
+    except pytz.UnknownTimeZoneError:
+        return pytz.timezone(DEFAULT_TIMEZONE)
+
+
+class _Day:
+    __slots__ = ("temp_min", "temp_max", "conditions", "day_conditions", "icons", "pop",
+                 "humidity", "humidity_slots", "wind", "wind_slots")
+
+    def __init__(self):
+        self.temp_min: Optional[float] = None
+        self.temp_max: Optional[float] = None
+        self.conditions: Counter = Counter()
+        self.day_conditions: Counter = Counter()
+        self.icons: Dict[str, Counter] = {}
+        self.pop = 0.0
+        # Sums, and the number of slots that reported a value
+        self.humidity = 0.0
+        self.humidity_slots = 0
+        self.wind = 0.0
+        self.wind_slots = 0
+
+    def add(self, item: Dict[str, Any]):
+        main = item.get("main") or {}
+        temp_min, temp_max = main.get("temp_min"), main.get("temp_max")
+        if temp_min is not None and (self.temp_min is None or temp_min < self.temp_min):
+            self.temp_min = temp_min
+        if temp_max is not None and (self.temp_max is None or temp_max > self.temp_max):
+            self.temp_max = temp_max
+
+        weather = (item.get("weather") or [{}])[0]
+        condition = weather.get("description")
+        if condition:
+            icon = weather.get("icon") or ""
+            self.conditions[condition] += 1
+            if icon.endswith("d"):
+                self.day_conditions[condition] += 1
+            self.icons.setdefault(condition, Counter())[icon] += 1
+
+        self.pop = max(self.pop, item.get("pop") or 0)
+        humidity = main.get("humidity")
+        if humidity is not None:
+            self.humidity += humidity
+            self.humidity_slots += 1
+        wind = (item.get("wind") or {}).get("speed")
+        if wind is not None:
+            self.wind += wind
+            self.wind_slots += 1
+
+    def to_weather_info(self) -> WeatherInfo:
+        condition, icon = None, None
+        if self.conditions:
+            # Most slots; on a tie, most daytime slots
+            condition = max(self.conditions, key=lambda name: (self.conditions[name], self.day_conditions[name]))
+            icon = self.icons[condition].most_common(1)[0][0] or None
+            # Report the day icon of the condition ("10n" -> "10d")
+            if icon and icon.endswith("n"):
+                icon = icon[:-1] + "d"
+        return WeatherInfo(
+            condition=condition,
+            temperature=self._temperature(),
+            icon=icon,
+            humidity=f"{round(self.humidity / self.humidity_slots)}%" if self.humidity_slots else None,
+            wind=f"{round(self.wind / self.wind_slots, 1)}m/s" if self.wind_slots else None,
+            precipitation=f"{int(self.pop * 100)}%"
+        )
+
+    def _temperature(self) -> Optional[str]:
+        if self.temp_min is None or self.temp_max is None:
+            return None
+        return f"{int(self.temp_min)}°-{int(self.temp_max)}°"
+
+
+def _slot_date(item: Dict[str, Any], tz: tzinfo) -> Optional[date]:
+    timestamp = item.get("dt")
+    if timestamp is None:
+        # Entries cached before ``dt`` was kept: dt_txt is the same instant in UTC
+        text = item.get("dt_txt")
+        if not text:
+            return None
+        timestamp = pytz.utc.localize(datetime.fromisoformat(text)).timestamp()
+    return datetime.fromtimestamp(timestamp, tz).date()
+
+
+def daily_forecasts(forecast_items: Iterable[Dict[str, Any]], timezone: Optional[str] = None) -> Dict[date, WeatherInfo]:
+    """3小时预报 -> 按当地日期聚合的逐日天气（单次遍历）"""
+    tz = resolve_timezone(timezone)
+    days: Dict[date, _Day] = {}
+    for item in forecast_items:
+        local_date = _slot_date(item, tz)
+        if local_date is None:
+            continue
+        day = days.get(local_date)
+        if day is None:
+            day = days[local_date] = _Day()
+        day.add(item)
+    return {local_date: day.to_weather_info() for local_date, day in days.items()}
@@ -0,0 +1,57 @@
+"""行程时间线合并引擎
+
+Places, foods and transportations of a day are three streams, each ordered by its
+visit/transport order. Items are keyed on seconds since the start of the day from
+their native ``time`` values; within a stream, a time earlier than the previous
+one means the stream crossed midnight, so it is offset by a day. Untimed items
+inherit the key of their predecessor (streams with no times at all go last).
+The keyed streams are k-way merged with the stable ``heapq.merge``.
+"""
+import heapq
+from datetime import time
+from operator import itemgetter
+from typing import Any, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+SECONDS_PER_DAY = 24 * 60 * 60
+UNTIMED = 2 ** 62 # Sorts after any real key
+
+TimelineEntry = Tuple[int, Hashable, Any]
+
+
+def time_to_seconds(value: time) -> int:
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def timeline(rows: Iterable[Any], tag: Hashable, order_attr: str, time_attr: str = "start_time") -> List[TimelineEntry]:
+    """Key one stream: ``[(seconds_from_day_start, tag, row), ...]``, nondecreasing."""
+    ordered = sorted(rows, key=lambda row: getattr(row, order_attr) or 0)
+
+    entries: List[TimelineEntry] = []
+    day_offset = 0
+    previous: Optional[int] = None
+    leading_untimed = 0
+    for row in ordered:
+        value = getattr(row, time_attr)
+        if value is None:
+            if previous is None:
+                leading_untimed += 1
+                entries.append((UNTIMED, tag, row))
+            else:
+                entries.append((previous, tag, row))
+            continue
+
+        key = day_offset + time_to_seconds(value)
+        if previous is not None and key < previous:
+            day_offset += SECONDS_PER_DAY
+            key += SECONDS_PER_DAY
+        if previous is None and leading_untimed:
+            entries[:leading_untimed] = [(key, tag, head_row) for _, _, head_row in entries[:leading_untimed]]
+        previous = key
+        entries.append((key, tag, row))
+
+    return entries
+
+
+def merge_timelines(*timelines: List[TimelineEntry]) -> Iterator[TimelineEntry]:
+    """K-way merge of keyed streams; ties keep the order of ``timelines``."""
+    return heapq.merge(*timelines, key=itemgetter(0))
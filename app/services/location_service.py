@@ -1,17 +1,88 @@
+import asyncio
 import httpx
-from typing import List, Optional
+from collections import Counter
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional, Set, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
+from app.core.database import AsyncSessionLocal
 from app.core.exceptions import ValidationError
+from app.models.location import Location, LocationSearchLog, UserLocationHistory
+from app.services.amap_client import AmapClient, has_spare_capacity, is_stale
+from app.services.spatial_index import SpatialIndex, ALL_CATEGORIES, category_of
+from app.services.suggest_index import SuggestIndex, SuggestEntry
+from app.utils.bulk_writer import BulkCounter, BulkWriter
+from app.utils.cache import cache, CacheKeys, CacheTTL, LRUCache
+from app.utils.helpers import parse_location
+from app.utils.metrics import metrics
+from app.utils.singleflight import SingleFlight
 from app.schemas.location import (
     LocationSearchResponse, LocationDetailResponse, LocationAroundResponse,
-    LocationListResponse, LocationAroundListResponse
+    LocationListResponse, LocationAroundListResponse, LocationSuggestion, LocationSuggestResponse
+)
+
+# Hottest POI details, in front of Redis (per process)
+_detail_lru = LRUCache(maxsize=settings.LOCATION_LRU_SIZE, ttl=settings.LOCATION_LRU_TTL)
+# POI ids with a background re-sync in flight, and the tasks (kept referenced until done)
+_refreshing: Set[str] = set()
+_background_tasks: Set[asyncio.Task] = set()
+# Identical concurrent AMap calls share one request (per worker, or per cluster when distributed)
+_search_flight = SingleFlight(
+    "amap.search", settings.AMAP_SINGLEFLIGHT_DISTRIBUTED, settings.AMAP_SINGLEFLIGHT_LOCK_TTL
+)
+_around_flight = SingleFlight(
+    "amap.around", settings.AMAP_SINGLEFLIGHT_DISTRIBUTED, settings.AMAP_SINGLEFLIGHT_LOCK_TTL
+)
+_detail_flight = SingleFlight(
+    "amap.detail", settings.AMAP_SINGLEFLIGHT_DISTRIBUTED, settings.AMAP_SINGLEFLIGHT_LOCK_TTL
+)
+# Typed around searches are answered from here once every grid cell they touch has
+# been mirrored from AMap for that category (per process; (cell, category) pairs are
+# filled in the background on a miss)
+spatial_index = SpatialIndex(
+    cell_deg=settings.SPATIAL_INDEX_CELL_DEG, max_age=settings.LOCATION_SYNC_MAX_AGE_HOURS * 3600
+)
+_filling_cells: Set[tuple] = set()
+# Bound to the loop it first waits in, so created per running loop (see _fill_slots)
+_fill_semaphore: Optional[Tuple[asyncio.AbstractEventLoop, asyncio.Semaphore]] = None
+# (cell, category) pairs with more POIs than a fill may page through; they stay on AMap until this expires
+_dense_cells = LRUCache(maxsize=4096, ttl=settings.LOCATION_SYNC_MAX_AGE_HOURS * 3600)
+POLYGON_PAGE_SIZE = 25  # AMap maximum
+# Next pages fetched ahead of the user (opt-in), and recently prefetched keys to count hits
+_prefetching: Set[str] = set()
+_prefetched = LRUCache(maxsize=4096, ttl=CacheTTL.LOCATION_SEARCH)
+# Autocomplete over location names and frequent search keywords (per process, see refresh_suggest_index)
+suggest_index = SuggestIndex(top_k=20, scan_limit=settings.SUGGEST_SCAN_LIMIT)
+_suggest_flight = SingleFlight(
+    "amap.suggest", settings.AMAP_SINGLEFLIGHT_DISTRIBUTED, settings.AMAP_SINGLEFLIGHT_LOCK_TTL
+)
+# Incremental refresh position, and counts of keywords not frequent enough to index yet
+_suggest_state: Dict[str, Any] = {"locations_since": None, "last_log_id": None, "keywords": 0}
+_pending_keywords: Counter = Counter()
+# Searches and detail views are logged in batches, off the request path (started in the app lifespan)
+search_log_writer = BulkWriter(
+    LocationSearchLog, "search_log", settings.ACTIVITY_LOG_BATCH_SIZE,
+    settings.ACTIVITY_LOG_FLUSH_INTERVAL, settings.ACTIVITY_LOG_MAX_PENDING
+)
+history_writer = BulkWriter(
+    UserLocationHistory, "location_history", settings.ACTIVITY_LOG_BATCH_SIZE,
+    settings.ACTIVITY_LOG_FLUSH_INTERVAL, settings.ACTIVITY_LOG_MAX_PENDING
+)
+# Locations.search_count (the suggest ranking) counts detail views: the POI a user
+# picked from search results or suggestions
+search_count_writer = BulkCounter(
+    Location.__table__.c.search_count, Location.__table__.c.amap_poi_id, "location_search_count",
+    settings.ACTIVITY_LOG_BATCH_SIZE, settings.ACTIVITY_LOG_FLUSH_INTERVAL, settings.ACTIVITY_LOG_MAX_PENDING
 )
 
 
 class LocationService:
-    def __init__(self):
-        self.base_url = settings.AMAP_BASE_URL
-        self.api_key = settings.AMAP_API_KEY
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None, db: Optional[AsyncSession] = None):
+        self.amap = AmapClient(http_client)
+        self.db = db
 
     async def search_locations(
             self,
@@ -21,9 +92,42 @@ class LocationService:
             page_size: int = 20
     ) -> LocationListResponse:
         """搜索地点"""
-        url = f"{self.base_url}/place/text"
+        cache_key = CacheKeys.LOCATION_SEARCH.format(keyword=keyword, city=city or "", page=page, page_size=page_size)
+        load = lambda: self._load_cached(cache_key, LocationListResponse)
+        result = await asyncio.to_thread(load)
+        if result is None:
+            async def fetch():
+                result, stale = await self._fetch_search(keyword, city, page, page_size)
+                if not stale:
+                    await asyncio.to_thread(cache.set, cache_key, result.model_dump(mode="json"), CacheTTL.LOCATION_SEARCH)
+                return result
+
+            result = await _search_flight.do(cache_key, fetch, load)
+        elif _prefetched.get(cache_key):
+            metrics.incr("prefetch.hit")
+
+        if settings.LOCATION_PREFETCH_ENABLED and page * page_size < result.total:
+            next_key = CacheKeys.LOCATION_SEARCH.format(keyword=keyword, city=city or "", page=page + 1, page_size=page_size)
+
+            async def prefetch():
+                result, stale = await self._fetch_search(keyword, city, page + 1, page_size, max_wait=0)
+                if not stale:
+                    await asyncio.to_thread(cache.set, next_key, result.model_dump(mode="json"), CacheTTL.LOCATION_SEARCH)
+                return result
+
+            self._schedule_prefetch(next_key, _search_flight, prefetch)
+        return result
+
+    async def _fetch_search(
+            self,
+            keyword: str,
+            city: Optional[str],
+            page: int,
+            page_size: int,
+            max_wait: Optional[float] = None
+    ) -> Tuple[LocationListResponse, bool]:
+        """高德关键字搜索，返回 (结果, 是否为旧副本)"""
         params = {
-            "key": self.api_key,
             "keywords": keyword,
             "types": "",
             "city": city or "",
@@ -33,75 +137,421 @@ class LocationService:
             "extensions": "all"
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params)
-            data = response.json()
-
-            if data.get("status") != "1":
-                raise ValidationError(f"搜索失败: {data.get('info')}")
-
-            pois = data.get("pois", [])
-            total = int(data.get("count", 0))
-
-            locations = []
-            for poi in pois:
-                location = LocationSearchResponse(
-                    id=poi.get("id"),
-                    name=poi.get("name"),
-                    type=poi.get("type"),
-                    address=poi.get("address"),
-                    location=poi.get("location"),
-                    district=poi.get("adname"),
-                    city=poi.get("cityname"),
-                    province=poi.get("pname"),
-                    image_url=self._get_poi_image(poi)
-                )
-                locations.append(location)
-
-            return LocationListResponse(total=total, locations=locations)
-
-    async def get_location_detail(self, location_id: str) -> LocationDetailResponse:
-        url = f"{self.base_url}/place/detail"
-        params = {
-            "key": self.api_key,
-            "id": location_id,
-            "extensions": "all"
-        }
-
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params)
-            data = response.json()
+        data = await self.amap.get("/place/text", params, max_wait=max_wait)
 
-            if data.get("status") != "1":
-                raise ValidationError(f"鑾峰彇璇︽儏澶辫触: {data.get('info')}")
+        if data.get("status") != "1":
+            raise ValidationError(f"搜索失败: {data.get('info')}")
 
-            pois = data.get("pois", [])
-            if not pois:
-                raise ValidationError("地点不存在")
+        pois = data.get("pois", [])
+        total = int(data.get("count", 0))
 
-            poi = pois[0]
-
-            return LocationDetailResponse(
+        locations = []
+        for poi in pois:
+            location = LocationSearchResponse(
                 id=poi.get("id"),
                 name=poi.get("name"),
                 type=poi.get("type"),
-                type_code=poi.get("typecode"),
                 address=poi.get("address"),
                 location=poi.get("location"),
                 district=poi.get("adname"),
                 city=poi.get("cityname"),
                 province=poi.get("pname"),
-                tel=poi.get("tel"),
-                website=poi.get("website"),
-                business_hours=self._format_business_hours(poi.get("business")),
-                rating=self._parse_rating(poi.get("rating")),
-                price=self._parse_price(poi.get("cost")),
-                images=self._get_poi_images(poi),
-                tags=self._parse_tags(poi.get("tag")),
-                description=poi.get("introduction"),
-                transportation=poi.get("traffic"),
-                tips=poi.get("tips")
+                image_url=self._get_poi_image(poi)
+            )
+            locations.append(location)
+
+        return LocationListResponse(total=total, locations=locations), is_stale(data)
+
+    def record_search(
+            self,
+            keyword: str,
+            city: Optional[str],
+            result_count: int,
+            user_id: Optional[int] = None,
+            ip_address: Optional[str] = None,
+            user_agent: Optional[str] = None
+    ):
+        """记录一次搜索（缓冲写入，不等待数据库）"""
+        if not settings.ACTIVITY_LOG_ENABLED:
+            return
+        # Clipped to the column sizes: one oversized row would fail its whole batch
+        search_log_writer.record({
+            "user_id": user_id,
+            "keyword": keyword[:128],
+            "city": city[:64] if city else None,
+            "search_type": "keyword",
+            "result_count": result_count,
+            "ip_address": ip_address[:45] if ip_address else None,
+            "user_agent": user_agent[:255] if user_agent else None,
+        })
+
+    def record_view(self, user_id: Optional[int], detail: LocationDetailResponse, view_type: str = "detail"):
+        """记录一次地点浏览（缓冲写入）：累加 search_count，登录用户另记浏览历史"""
+        if not settings.ACTIVITY_LOG_ENABLED:
+            return
+        search_count_writer.record(detail.id)
+        if user_id is None:
+            return
+        history_writer.record({
+            "user_id": user_id,
+            "amap_poi_id": detail.id,
+            "location_name": detail.name[:128],
+            "view_type": view_type,
+        })
+
+    async def suggest(self, keyword: str, city: Optional[str] = None, limit: int = 10) -> LocationSuggestResponse:
+        """地点联想（名称/全拼/拼音首字母前缀）
+
+        Answered from the in-process index; AMap input tips are used only when the
+        index has nothing for the prefix.
+        """
+        if settings.SUGGEST_ENABLED:
+            suggestions, seen = [], set()
+            # Every cached candidate: duplicates are skipped below, the loop stops at limit
+            for entry in suggest_index.search(keyword, city, limit=suggest_index.top_k):
+                # A frequent keyword often equals a POI name; the higher ranked one wins
+                if (entry.name, entry.city) in seen:
+                    continue
+                seen.add((entry.name, entry.city))
+                suggestions.append(LocationSuggestion(
+                    id=entry.poi_id,
+                    name=entry.name,
+                    city=entry.city,
+                    district=entry.district,
+                    address=entry.address,
+                    location=entry.location,
+                    source=entry.source
+                ))
+                if len(suggestions) >= limit:
+                    break
+            if suggestions:
+                metrics.incr("suggest.local")
+                return LocationSuggestResponse(suggestions=suggestions)
+            metrics.incr("suggest.miss")
+
+        cache_key = CacheKeys.LOCATION_SUGGEST.format(keyword=keyword, city=city or "")
+        load = lambda: self._load_cached(cache_key, LocationSuggestResponse)
+        result = await asyncio.to_thread(load)
+        if result is None:
+            async def fetch():
+                result, stale = await self._fetch_suggest(keyword, city)
+                if not stale:
+                    await asyncio.to_thread(cache.set, cache_key, result.model_dump(mode="json"), CacheTTL.LOCATION_SEARCH)
+                return result
+
+            result = await _suggest_flight.do(cache_key, fetch, load)
+        return LocationSuggestResponse(suggestions=result.suggestions[:limit])
+
+    async def _fetch_suggest(self, keyword: str, city: Optional[str]) -> Tuple[LocationSuggestResponse, bool]:
+        params = {
+            "keywords": keyword,
+            "city": city or "",
+            "citylimit": "true" if city else "false",
+            "datatype": "all"
+        }
+
+        data = await self.amap.get("/assistant/inputtips", params)
+
+        if data.get("status") != "1":
+            raise ValidationError(f"联想失败: {data.get('info')}")
+
+        return LocationSuggestResponse(suggestions=[
+            LocationSuggestion(
+                id=self._text(tip.get("id")),
+                name=tip["name"],
+                district=self._text(tip.get("district")),
+                address=self._text(tip.get("address")),
+                location=self._text(tip.get("location")),
+                source="amap"
             )
+            for tip in data.get("tips", []) if self._text(tip.get("name"))
+        ]), is_stale(data)
+
+    async def get_location_detail(self, location_id: str) -> LocationDetailResponse:
+        """获取地点详情
+
+        Read-through: process LRU -> Redis -> locations table -> AMap. Each miss is
+        written back to the layers above it. A locations row older than
+        LOCATION_SYNC_MAX_AGE_HOURS is still served, and re-synced in the background.
+        """
+        detail = _detail_lru.get(location_id)
+        if detail is not None:
+            return detail
+
+        cached = await asyncio.to_thread(cache.get, CacheKeys.LOCATION_DETAIL.format(poi_id=location_id))
+        if cached:
+            detail = LocationDetailResponse.model_validate(cached)
+            _detail_lru.set(location_id, detail)
+            return detail
+
+        if self.db is not None:
+            row = (await self.db.execute(
+                select(Location).where(Location.amap_poi_id == location_id)
+            )).scalar_one_or_none()
+            if row is not None:
+                detail = self._location_to_detail(row)
+                if self._needs_sync(row):
+                    self._schedule_refresh(location_id)
+                await self._cache_details([detail])
+                return detail
+
+        cache_key = CacheKeys.LOCATION_DETAIL.format(poi_id=location_id)
+        return await _detail_flight.do(
+            cache_key,
+            lambda: self._sync_location(location_id, save=self.db is not None),
+            lambda: self._load_cached(cache_key, LocationDetailResponse)
+        )
+
+    async def get_location_details(self, location_ids: List[str]) -> Dict[str, LocationDetailResponse]:
+        """批量获取地点详情
+
+        Same layers as get_location_detail, one round trip per layer: LRU, Redis MGET,
+        one locations IN query, then AMap's multi-id place/detail (AMAP_DETAIL_BATCH_SIZE
+        ids per call, at most AMAP_BATCH_CONCURRENCY calls at once). Ids that cannot be
+        resolved are left out of the result, which keeps the order of ``location_ids``.
+        """
+        ids = list(dict.fromkeys(location_id for location_id in location_ids if location_id))
+        details: Dict[str, LocationDetailResponse] = {}
+
+        missing = []
+        for location_id in ids:
+            detail = _detail_lru.get(location_id)
+            if detail is not None:
+                details[location_id] = detail
+            else:
+                missing.append(location_id)
+
+        if missing:
+            cached = await asyncio.to_thread(cache.mget, [CacheKeys.LOCATION_DETAIL.format(poi_id=location_id) for location_id in missing])
+            for location_id, value in zip(missing, cached):
+                if value:
+                    details[location_id] = LocationDetailResponse.model_validate(value)
+                    _detail_lru.set(location_id, details[location_id])
+            missing = [location_id for location_id in missing if location_id not in details]
+
+        if missing and self.db is not None:
+            rows = (await self.db.execute(
+                select(Location).where(Location.amap_poi_id.in_(missing))
+            )).scalars().all()
+            for row in rows:
+                details[row.amap_poi_id] = self._location_to_detail(row)
+                if self._needs_sync(row):
+                    self._schedule_refresh(row.amap_poi_id)
+            await self._cache_details([details[row.amap_poi_id] for row in rows])
+            missing = [location_id for location_id in missing if location_id not in details]
+
+        if missing:
+            semaphore = asyncio.Semaphore(settings.AMAP_BATCH_CONCURRENCY)
+
+            async def fetch(chunk: List[str]) -> Tuple[List[LocationDetailResponse], bool]:
+                async with semaphore:
+                    try:
+                        return await self._fetch_location_details(chunk)
+                    except Exception as e:
+                        print(f"Location batch detail error ({'|'.join(chunk)}): {e}")
+                        return [], False
+
+            size = settings.AMAP_DETAIL_BATCH_SIZE
+            batches = await asyncio.gather(*[fetch(missing[i:i + size]) for i in range(0, len(missing), size)])
+            # Stale copies are served but not written back as fresh
+            fresh = [detail for batch, stale in batches if not stale for detail in batch]
+            if fresh:
+                if self.db is not None:
+                    async with AsyncSessionLocal() as db:
+                        await self._save_locations(db, fresh)
+                await self._cache_details(fresh)
+            for batch, _ in batches:
+                for detail in batch:
+                    details[detail.id] = detail
+
+        return {location_id: details[location_id] for location_id in ids if location_id in details}
+
+    async def _fetch_location_detail(self, location_id: str) -> Tuple[LocationDetailResponse, bool]:
+        details, stale = await self._fetch_location_details([location_id])
+        if not details:
+            raise ValidationError("地点不存在")
+        return details[0], stale
+
+    async def _fetch_location_details(self, location_ids: List[str]) -> Tuple[List[LocationDetailResponse], bool]:
+        """高德 place/detail（多个ID以 | 分隔），返回 (详情列表, 是否为旧副本)"""
+        params = {
+            "id": "|".join(location_ids),
+            "extensions": "all"
+        }
+
+        data = await self.amap.get("/place/detail", params)
+
+        if data.get("status") != "1":
+            raise ValidationError(f"鑾峰彇璇︽儏澶辫触: {data.get('info')}")
+
+        return [self._build_detail(poi) for poi in data.get("pois", []) if poi.get("id")], is_stale(data)
+
+    def _build_detail(self, poi: dict) -> LocationDetailResponse:
+        return LocationDetailResponse(
+            id=poi.get("id"),
+            name=poi.get("name"),
+            type=self._text(poi.get("type")) or "",
+            type_code=self._text(poi.get("typecode")),
+            address=self._text(poi.get("address")),
+            location=poi.get("location"),
+            district=self._text(poi.get("adname")),
+            city=self._text(poi.get("cityname")),
+            province=self._text(poi.get("pname")),
+            tel=self._text(poi.get("tel")),
+            website=self._text(poi.get("website")),
+            business_hours=self._format_business_hours(poi.get("business")),
+            rating=self._parse_rating(poi.get("rating")),
+            price=self._parse_price(poi.get("cost")),
+            images=self._get_poi_images(poi),
+            tags=self._parse_tags(poi.get("tag")),
+            description=self._text(poi.get("introduction")),
+            transportation=self._text(poi.get("traffic")),
+            tips=self._text(poi.get("tips"))
+        )
+
+    @staticmethod
+    async def _cache_details(details: List[LocationDetailResponse]):
+        if not details:
+            return
+        for detail in details:
+            _detail_lru.set(detail.id, detail)
+        await asyncio.to_thread(_store_details, [
+            (CacheKeys.LOCATION_DETAIL.format(poi_id=detail.id), detail.model_dump(mode="json")) for detail in details
+        ])
+
+    @staticmethod
+    def _needs_sync(row: Location) -> bool:
+        max_age = timedelta(hours=settings.LOCATION_SYNC_MAX_AGE_HOURS)
+        return row.last_sync_at is None or datetime.utcnow() - row.last_sync_at > max_age
+
+    def _schedule_refresh(self, location_id: str):
+        if location_id in _refreshing:
+            return
+        _refreshing.add(location_id)
+        task = asyncio.create_task(self._refresh_location(location_id))
+        _background_tasks.add(task)
+
+        def done(finished: asyncio.Task):
+            _background_tasks.discard(finished)
+            _refreshing.discard(location_id)
+        task.add_done_callback(done)
+
+    async def _refresh_location(self, location_id: str):
+        """后台重新同步过期的地点记录"""
+        try:
+            await self._sync_location(location_id)
+        except Exception as e:
+            print(f"Location refresh error ({location_id}): {e}")
+
+    async def _sync_location(self, location_id: str, save: bool = True) -> LocationDetailResponse:
+        """从高德拉取详情，写入 locations 表和缓存（旧副本只返回，不写入）
+
+        Uses its own session: the call may be shared by (or outlive) the request
+        that started it.
+        """
+        detail, stale = await self._fetch_location_detail(location_id)
+        if stale:
+            return detail
+        if save:
+            async with AsyncSessionLocal() as db:
+                await self._save_locations(db, [detail])
+        await self._cache_details([detail])
+        return detail
+
+    async def _save_locations(self, db: AsyncSession, details: List[LocationDetailResponse]):
+        """写入/更新 locations 表（一次查询，一次提交）"""
+        values_by_id = {detail.id: self._detail_to_location_values(detail) for detail in details}
+        try:
+            rows = (await db.execute(
+                select(Location).where(Location.amap_poi_id.in_(list(values_by_id)))
+            )).scalars().all()
+            for row in rows:
+                for key, value in values_by_id.pop(row.amap_poi_id).items():
+                    setattr(row, key, value)
+            db.add_all([
+                Location(amap_poi_id=poi_id, data_source="amap", **values)
+                for poi_id, values in values_by_id.items()
+            ])
+            await db.commit()
+        except IntegrityError:
+            # Another request inserted one of these POIs first; its row is just as fresh
+            await db.rollback()
+        if settings.SUGGEST_ENABLED:
+            for detail in details:
+                existing = suggest_index.get(detail.id)
+                suggest_index.upsert(_location_entry(
+                    detail.id, detail.name, detail.city, detail.district, detail.address,
+                    detail.location or None, existing.score if existing else 0
+                ))
+
+    def _detail_to_location_values(self, detail: LocationDetailResponse) -> Dict[str, Any]:
+        longitude, latitude = self._split_location(detail.location)
+        return {
+            "name": detail.name,
+            "type": detail.type,
+            "type_code": detail.type_code,
+            "address": detail.address,
+            "latitude": latitude,
+            "longitude": longitude,
+            "district": detail.district,
+            "city": detail.city,
+            "province": detail.province,
+            "tel": detail.tel,
+            "website": detail.website,
+            "business_hours": detail.business_hours,
+            "rating": detail.rating,
+            "price": detail.price,
+            "images": detail.images,
+            "tags": detail.tags,
+            "introduction": detail.description,
+            "transportation": detail.transportation,
+            "tips": detail.tips,
+            "last_sync_at": datetime.utcnow(),
+        }
+
+    def _location_to_detail(self, row: Location) -> LocationDetailResponse:
+        return LocationDetailResponse(
+            id=row.amap_poi_id,
+            name=row.name,
+            type=row.type or "",
+            type_code=row.type_code,
+            address=row.address,
+            location=self._join_location(row.longitude, row.latitude),
+            district=row.district,
+            city=row.city,
+            province=row.province,
+            tel=row.tel,
+            website=row.website,
+            business_hours=row.business_hours,
+            rating=row.rating,
+            price=row.price,
+            images=row.images,
+            tags=row.tags,
+            description=row.introduction,
+            transportation=row.transportation,
+            tips=row.tips
+        )
+
+    @staticmethod
+    def _split_location(location: Optional[str]):
+        """"经度,纬度" -> (Decimal经度, Decimal纬度)"""
+        try:
+            longitude, latitude = location.split(",")
+            return Decimal(longitude), Decimal(latitude)
+        except (AttributeError, ValueError, InvalidOperation):
+            return None, None
+
+    @staticmethod
+    def _join_location(longitude: Optional[Decimal], latitude: Optional[Decimal]) -> str:
+        if longitude is None or latitude is None:
+            return ""
+        # DECIMAL(10, 6) pads with zeros; AMap does not
+        return f"{format(longitude.normalize(), 'f')},{format(latitude.normalize(), 'f')}"
+
+    @staticmethod
+    def _text(value) -> Optional[str]:
+        # AMap returns [] instead of "" for empty fields
+        return value if isinstance(value, str) and value else None
 
     async def search_around(
             self,
@@ -111,9 +561,75 @@ class LocationService:
             page: int = 1,
             page_size: int = 20
     ) -> LocationAroundListResponse:
-        url = f"{self.base_url}/place/around"
+        """周边搜索"""
+        category = category_of(self._get_type_code(search_type)) if search_type else ALL_CATEGORIES
+        lng, lat = parse_location(location)
+        # Coverage is tracked per category: an untyped search gets AMap's default type
+        # filter, which the grid cannot reproduce, so it always goes upstream. Neither
+        # do large circles: filling them would take more quota than it saves.
+        use_index = (
+            settings.SPATIAL_INDEX_ENABLED and lng is not None and category != ALL_CATEGORIES
+            and len(spatial_index.cells_for_circle(lng, lat, radius)) <= settings.SPATIAL_INDEX_MAX_QUERY_CELLS
+        )
+        if use_index:
+            local = spatial_index.search(lng, lat, radius, category, (page - 1) * page_size, page_size)
+            if local is not None:
+                metrics.incr("spatial.local")
+                total, hits = local
+                return LocationAroundListResponse(
+                    total=total,
+                    locations=[LocationAroundResponse(distance=distance, **item) for distance, item in hits]
+                )
+            metrics.incr("spatial.miss")
+            self._schedule_cell_fills(spatial_index.uncovered_cells(lng, lat, radius, category), category)
+
+        cache_key = CacheKeys.LOCATION_AROUND.format(
+            location=location, radius=radius, type=search_type or "", page=page, page_size=page_size
+        )
+        load = lambda: self._load_cached(cache_key, LocationAroundListResponse)
+        result = await asyncio.to_thread(load)
+        if result is None:
+            async def fetch():
+                result, stale = await self._fetch_around(location, radius, search_type, page, page_size)
+                if stale:
+                    return result
+                await asyncio.to_thread(cache.set, cache_key, result.model_dump(mode="json"), CacheTTL.LOCATION_SEARCH)
+                if use_index:
+                    # Everything AMap has of this category in the circle is now indexed:
+                    # cells inside it are complete for the category
+                    if spatial_index.count(lng, lat, radius, category) >= result.total:
+                        spatial_index.mark_covered(spatial_index.cells_for_circle(lng, lat, radius, inside=True), category)
+                return result
+
+            result = await _around_flight.do(cache_key, fetch, load)
+        elif _prefetched.get(cache_key):
+            metrics.incr("prefetch.hit")
+
+        if settings.LOCATION_PREFETCH_ENABLED and page * page_size < result.total:
+            next_key = CacheKeys.LOCATION_AROUND.format(
+                location=location, radius=radius, type=search_type or "", page=page + 1, page_size=page_size
+            )
+
+            async def prefetch():
+                result, stale = await self._fetch_around(location, radius, search_type, page + 1, page_size, max_wait=0)
+                if not stale:
+                    await asyncio.to_thread(cache.set, next_key, result.model_dump(mode="json"), CacheTTL.LOCATION_SEARCH)
+                return result
+
+            self._schedule_prefetch(next_key, _around_flight, prefetch)
+        return result
+
+    async def _fetch_around(
+            self,
+            location: str,
+            radius: int,
+            search_type: Optional[str],
+            page: int,
+            page_size: int,
+            max_wait: Optional[float] = None
+    ) -> Tuple[LocationAroundListResponse, bool]:
+        """高德周边搜索，返回 (结果, 是否为旧副本)"""
         params = {
-            "key": self.api_key,
             "location": location,
             "radius": radius,
             "types": self._get_type_code(search_type) if search_type else "",
@@ -123,36 +639,139 @@ class LocationService:
             "extensions": "all"
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params)
-            data = response.json()
-
-            if data.get("status") != "1":
-                raise ValidationError(f": {data.get('info')}")
-
-            pois = data.get("pois", [])
-            total = int(data.get("count", 0))
-
-            locations = []
-            for poi in pois:
-                location_item = LocationAroundResponse(
-                    id=poi.get("id"),
-                    name=poi.get("name"),
-                    type=poi.get("type"),
-                    address=poi.get("address"),
-                    location=poi.get("location"),
-                    district=poi.get("adname"),
-                    city=poi.get("cityname"),
-                    province=poi.get("pname"),
-                    distance=int(poi.get("distance", 0)),
-                    tel=poi.get("tel"),
-                    business_hours=self._format_business_hours(poi.get("business")),
-                    rating=self._parse_rating(poi.get("rating")),
-                    price=self._parse_price(poi.get("cost"))
+        data = await self.amap.get("/place/around", params, max_wait=max_wait)
+
+        if data.get("status") != "1":
+            raise ValidationError(f": {data.get('info')}")
+
+        pois = data.get("pois", [])
+        total = int(data.get("count", 0))
+
+        locations = [
+            LocationAroundResponse(distance=int(poi.get("distance", 0)), **self._build_around_item(poi))
+            for poi in pois
+        ]
+        stale = is_stale(data)
+        if settings.SPATIAL_INDEX_ENABLED and not stale:
+            self._index_pois(pois)
+
+        return LocationAroundListResponse(total=total, locations=locations), stale
+
+    def _build_around_item(self, poi: dict) -> Dict[str, Any]:
+        """周边结果字段（不含距离），同时是空间索引中保存的数据"""
+        return {
+            "id": poi.get("id"),
+            "name": poi.get("name"),
+            "type": self._text(poi.get("type")) or "",
+            "address": self._text(poi.get("address")),
+            "location": poi.get("location"),
+            "district": self._text(poi.get("adname")),
+            "city": self._text(poi.get("cityname")),
+            "province": self._text(poi.get("pname")),
+            "tel": self._text(poi.get("tel")),
+            "business_hours": self._format_business_hours(poi.get("business")),
+            "rating": self._parse_rating(poi.get("rating")),
+            "price": self._parse_price(poi.get("cost"))
+        }
+
+    def _index_pois(self, pois: List[dict]):
+        for poi in pois:
+            lng, lat = parse_location(poi.get("location") or "")
+            if lng is not None and poi.get("id"):
+                spatial_index.upsert(
+                    poi["id"], lng, lat, category_of(self._text(poi.get("typecode"))), self._build_around_item(poi)
                 )
-                locations.append(location_item)
 
-            return LocationAroundListResponse(total=total, locations=locations)
+    def _schedule_cell_fills(self, cells: List[tuple], category: int):
+        """后台从高德补齐缺失/过期网格中的一个大类（数量与并发受配置限制）"""
+        fills = [
+            (key, category) for key in cells
+            if (key, category) not in _filling_cells and _dense_cells.get((key, category)) is None
+        ][:settings.SPATIAL_INDEX_FILL_MAX_CELLS]
+        for fill in fills:
+            if len(_filling_cells) >= settings.SPATIAL_INDEX_FILL_QUEUE:
+                break
+            _filling_cells.add(fill)
+            task = asyncio.create_task(self._fill_cell(*fill))
+            _background_tasks.add(task)
+
+            def done(finished: asyncio.Task, fill=fill):
+                _background_tasks.discard(finished)
+                _filling_cells.discard(fill)
+            task.add_done_callback(done)
+
+    async def _fill_cell(self, key: tuple, category: int):
+        """按网格矩形分页拉取高德多边形搜索中的一个大类；全部拉完才标记该大类已覆盖"""
+        min_lng, min_lat, max_lng, max_lat = spatial_index.cell_bounds(key)
+        params = {
+            "polygon": f"{min_lng:.6f},{max_lat:.6f}|{max_lng:.6f},{min_lat:.6f}",
+            # Explicit: without types AMap applies its default filter
+            "types": f"{category:02d}0000",
+            "offset": POLYGON_PAGE_SIZE,
+            "extensions": "all"
+        }
+        try:
+            async with _fill_slots():
+                fetched = 0
+                for page in range(1, settings.SPATIAL_INDEX_FILL_MAX_PAGES + 1):
+                    # Background work: never queue for a rate-limit slot, no stale copies
+                    data = await self.amap.get("/place/polygon", dict(params, page=page), stale=False, max_wait=0)
+                    if data.get("status") != "1":
+                        raise ValidationError(data.get("info"))
+                    pois = data.get("pois", [])
+                    self._index_pois(pois)
+                    fetched += len(pois)
+                    if not pois or fetched >= int(data.get("count", 0)):
+                        spatial_index.mark_covered([key], category)
+                        metrics.incr("spatial.fill")
+                        return
+            _dense_cells.set((key, category), True)
+            metrics.incr("spatial.fill_too_dense")
+        except Exception as e:
+            print(f"Spatial index fill error ({key}, {category}): {e}")
+
+    def _schedule_prefetch(self, cache_key: str, flight: SingleFlight, fetch):
+        """后台预取下一页（尽力而为：超出并发预算、上游繁忙或已缓存时跳过）
+
+        The fetch joins the same single-flight as user requests, so a user asking for
+        the page while it is being prefetched waits for it instead of calling again.
+        """
+        if cache_key in _prefetching:
+            return
+        if len(_prefetching) >= settings.LOCATION_PREFETCH_CONCURRENCY:
+            metrics.incr("prefetch.skipped_budget")
+            return
+        if not has_spare_capacity(settings.LOCATION_PREFETCH_MIN_TOKENS):
+            metrics.incr("prefetch.skipped_busy")
+            return
+
+        _prefetching.add(cache_key)
+        task = asyncio.create_task(self._prefetch(cache_key, flight, fetch))
+        _background_tasks.add(task)
+
+        def done(finished: asyncio.Task):
+            _background_tasks.discard(finished)
+            _prefetching.discard(cache_key)
+        task.add_done_callback(done)
+
+    @staticmethod
+    async def _prefetch(cache_key: str, flight: SingleFlight, fetch):
+        try:
+            if await asyncio.to_thread(cache.exists, cache_key):
+                return
+            await flight.do(cache_key, fetch)
+            _prefetched.set(cache_key, True)
+            metrics.incr("prefetch.fetched")
+        except Exception as e:
+            # Throttled (prefetches never queue for a rate-limit slot) or upstream error
+            metrics.incr("prefetch.failed")
+            print(f"Prefetch error ({cache_key}): {e}")
+
+    @staticmethod
+    def _load_cached(cache_key: str, model):
+        """Blocking Redis read: call it through asyncio.to_thread"""
+        cached = cache.get(cache_key)
+        return model.model_validate(cached) if cached else None
 
     def _get_poi_image(self, poi: dict) -> Optional[str]:
         photos = poi.get("photos", [])
@@ -201,3 +820,126 @@ class LocationService:
             "交通设施": "150000"
         }
         return type_mapping.get(search_type, "")
+
+
+def _store_details(entries: List[Tuple[str, Dict[str, Any]]]):
+    for cache_key, value in entries:
+        cache.set(cache_key, value, CacheTTL.LOCATION_DETAIL)
+
+
+def _fill_slots() -> asyncio.Semaphore:
+    """当前事件循环的网格填充并发限制（惰性创建）"""
+    global _fill_semaphore
+    loop = asyncio.get_running_loop()
+    if _fill_semaphore is None or _fill_semaphore[0] is not loop:
+        _fill_semaphore = (loop, asyncio.Semaphore(settings.SPATIAL_INDEX_FILL_CONCURRENCY))
+    return _fill_semaphore[1]
+
+
+def _location_entry(poi_id: str, name: str, city: Optional[str], district: Optional[str], address: Optional[str],
+                    location: Optional[str], score: Optional[int]) -> SuggestEntry:
+    return SuggestEntry(
+        poi_id, name, "poi", score or 0,
+        poi_id=poi_id, city=city, district=district, address=address, location=location
+    )
+
+
+def _keyword_entry(keyword: str, city: Optional[str], count: int) -> SuggestEntry:
+    return SuggestEntry(("keyword", city or "", keyword), keyword, "keyword", count, city=city)
+
+
+async def refresh_suggest_index():
+    """从 locations 表和搜索日志更新联想词索引
+
+    The first call loads the most searched locations and the keywords searched at
+    least SUGGEST_MIN_KEYWORD_COUNT times in the last SUGGEST_KEYWORD_DAYS (built in a
+    worker thread, then swapped in). Later calls only read locations updated, and
+    search logs written, since the previous call.
+    """
+    columns = (
+        Location.amap_poi_id, Location.name, Location.city, Location.district, Location.address,
+        Location.longitude, Location.latitude, Location.search_count
+    )
+    keyword_count = func.count(LocationSearchLog.id)
+    loaded = _suggest_state["last_log_id"] is not None
+    async with AsyncSessionLocal() as db:
+        # Read the positions first: rows written while loading are picked up next time
+        locations_since = (await db.execute(select(func.max(Location.updated_at)))).scalar()
+        last_log_id = (await db.execute(select(func.max(LocationSearchLog.id)))).scalar() or 0
+
+        query = select(*columns)
+        if loaded:
+            query = query.where(Location.updated_at >= _suggest_state["locations_since"])
+        else:
+            query = query.order_by(Location.search_count.desc()).limit(settings.SUGGEST_MAX_LOCATIONS)
+        location_rows = (await db.execute(query)).all() if locations_since is not None else []
+
+        query = (
+            select(LocationSearchLog.keyword, LocationSearchLog.city, keyword_count)
+            .where(LocationSearchLog.id <= last_log_id)
+            .group_by(LocationSearchLog.keyword, LocationSearchLog.city)
+        )
+        if loaded:
+            query = query.where(LocationSearchLog.id > _suggest_state["last_log_id"])
+        else:
+            query = (
+                query.where(LocationSearchLog.created_at >= datetime.utcnow() - timedelta(days=settings.SUGGEST_KEYWORD_DAYS))
+                .having(keyword_count >= settings.SUGGEST_MIN_KEYWORD_COUNT)
+                .order_by(keyword_count.desc())
+                .limit(settings.SUGGEST_KEYWORD_LIMIT)
+            )
+        keyword_rows = (await db.execute(query)).all()
+
+    locations = [
+        _location_entry(
+            row.amap_poi_id, row.name, row.city, row.district, row.address,
+            LocationService._join_location(row.longitude, row.latitude) or None, row.search_count
+        )
+        for row in location_rows
+    ]
+    if not loaded:
+        keywords = [_keyword_entry(keyword.strip(), city, count) for keyword, city, count in keyword_rows if keyword.strip()]
+        fresh = SuggestIndex(top_k=suggest_index.top_k, scan_limit=suggest_index.scan_limit)
+        await asyncio.to_thread(fresh.load, locations + keywords)
+        # Rows written through while the build ran are read again next time (locations_since)
+        suggest_index.swap(fresh)
+        _suggest_state["keywords"] = len(keywords)
+    else:
+        for entry in locations:
+            suggest_index.upsert(entry)
+        _add_keyword_counts(keyword_rows)
+
+    if locations_since is not None:
+        _suggest_state["locations_since"] = locations_since
+    _suggest_state["last_log_id"] = last_log_id
+    metrics.set("suggest.entries", len(suggest_index))
+
+
+def _add_keyword_counts(rows):
+    limit = settings.SUGGEST_KEYWORD_LIMIT
+    for keyword, city, count in rows:
+        keyword = keyword.strip()
+        if not keyword:
+            continue
+        entry_id = ("keyword", city or "", keyword)
+        if suggest_index.add_score(entry_id, count):
+            continue
+        _pending_keywords[entry_id] += count
+        if _pending_keywords[entry_id] >= settings.SUGGEST_MIN_KEYWORD_COUNT and _suggest_state["keywords"] < limit:
+            suggest_index.upsert(_keyword_entry(keyword, city, _pending_keywords.pop(entry_id)))
+            _suggest_state["keywords"] += 1
+    if len(_pending_keywords) > 10 * limit:
+        # Forget the long tail
+        kept = _pending_keywords.most_common(limit)
+        _pending_keywords.clear()
+        _pending_keywords.update(dict(kept))
+
+
+async def run_suggest_refresher():
+    """定时刷新联想词索引（在应用 lifespan 中启动）"""
+    while True:
+        try:
+            await refresh_suggest_index()
+        except Exception as e:
+            print(f"Suggest index refresh error: {e}")
+        await asyncio.sleep(settings.SUGGEST_REFRESH_SECONDS)
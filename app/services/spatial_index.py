@@ -0,0 +1,234 @@
+"""内存空间索引（周边搜索）
+
+POIs are bucketed into a regular latitude/longitude grid (``cell_deg`` degrees per
+side). A radius query gathers the cells intersecting the circle and filters their
+points with a vectorized haversine, then sorts by distance.
+
+Having points in a cell does not mean the cell is complete, so coverage is tracked
+separately, per ``(cell, category)``: the owner marks a cell covered once it has
+mirrored every upstream POI in it. A query is answered locally only if every cell
+it touches is covered and fresh; otherwise ``search`` returns None.
+"""
+import math
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+EARTH_RADIUS = 6371000.0  # meters, same as app.utils.helpers.calculate_distance
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS / 180
+ALL_CATEGORIES = -1
+
+CellKey = Tuple[int, int]
+
+
+def category_of(type_code: Optional[str]) -> int:
+    """高德类型代码 -> 大类（"110202|110200" -> 11）"""
+    if not type_code:
+        return ALL_CATEGORIES
+    try:
+        return int(type_code.split("|")[0][:2])
+    except ValueError:
+        return ALL_CATEGORIES
+
+
+def haversine(lat0: float, lng0: float, lat: np.ndarray, lng: np.ndarray, cos_lat: np.ndarray) -> np.ndarray:
+    """Meters from one point to arrays of points; all angles in radians."""
+    a = np.sin((lat - lat0) * 0.5) ** 2 + math.cos(lat0) * cos_lat * np.sin((lng - lng0) * 0.5) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class _Cell:
+    __slots__ = ("ids", "lats", "lngs", "categories", "items", "_arrays")
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.lats: List[float] = []
+        self.lngs: List[float] = []
+        self.categories: List[int] = []
+        self.items: List[Any] = []
+        self._arrays = None
+
+    def arrays(self):
+        # Rebuilt lazily after writes; reads vastly outnumber writes
+        if self._arrays is None:
+            lat = np.radians(np.asarray(self.lats, dtype=np.float64))
+            lng = np.radians(np.asarray(self.lngs, dtype=np.float64))
+            self._arrays = (lat, lng, np.cos(lat), np.asarray(self.categories, dtype=np.int16))
+        return self._arrays
+
+
+class SpatialIndex:
+    """网格空间索引
+
+    ``max_age`` (seconds) is how long a cell's coverage stays fresh. Not thread-safe;
+    use it from the event loop only.
+    """
+
+    def __init__(self, cell_deg: float = 0.01, max_age: Optional[float] = None):
+        self.cell_deg = cell_deg
+        self.max_age = max_age
+        self._cells: Dict[CellKey, _Cell] = {}
+        self._where: Dict[str, Tuple[CellKey, int]] = {}
+        self._coverage: Dict[Tuple[CellKey, int], float] = {}
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def cell_key(self, lng: float, lat: float) -> CellKey:
+        return math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg)
+
+    def cell_bounds(self, key: CellKey) -> Tuple[float, float, float, float]:
+        """(min_lng, min_lat, max_lng, max_lat)"""
+        row, col = key
+        return col * self.cell_deg, row * self.cell_deg, (col + 1) * self.cell_deg, (row + 1) * self.cell_deg
+
+    # 写入
+
+    def upsert(self, poi_id: str, lng: float, lat: float, category: int, item: Any):
+        """写入/更新一个POI（item 为查询时原样返回的数据）"""
+        key = self.cell_key(lng, lat)
+        found = self._where.get(poi_id)
+        if found is not None and found[0] != key:
+            self._remove(poi_id)
+            found = None
+
+        if found is None:
+            cell = self._cells.get(key)
+            if cell is None:
+                cell = self._cells[key] = _Cell()
+            self._where[poi_id] = (key, len(cell.ids))
+            cell.ids.append(poi_id)
+            cell.lats.append(lat)
+            cell.lngs.append(lng)
+            cell.categories.append(category)
+            cell.items.append(item)
+        else:
+            cell = self._cells[key]
+            position = found[1]
+            cell.lats[position] = lat
+            cell.lngs[position] = lng
+            cell.categories[position] = category
+            cell.items[position] = item
+        cell._arrays = None
+
+    def _remove(self, poi_id: str):
+        key, position = self._where.pop(poi_id)
+        cell = self._cells[key]
+        last = len(cell.ids) - 1
+        # Swap-remove keeps the lists dense
+        for values in (cell.ids, cell.lats, cell.lngs, cell.categories, cell.items):
+            values[position] = values[last]
+            values.pop()
+        if position != last:
+            self._where[cell.ids[position]] = (key, position)
+        if cell.ids:
+            cell._arrays = None
+        else:
+            del self._cells[key]
+
+    def mark_covered(self, keys: List[CellKey], category: int = ALL_CATEGORIES):
+        now = time.time()
+        for key in keys:
+            self._coverage[(key, category)] = now
+
+    # 覆盖
+
+    def cells_for_circle(self, lng: float, lat: float, radius: float, inside: bool = False) -> List[CellKey]:
+        """与圆相交的网格（inside=True 时为完全落在圆内的网格），按离圆心由近到远排序"""
+        dlat = radius / METERS_PER_DEGREE
+        dlng = dlat / max(math.cos(math.radians(min(abs(lat) + dlat, 89.9))), 1e-6)
+        row_lo, col_lo = self.cell_key(lng - dlng, lat - dlat)
+        row_hi, col_hi = self.cell_key(lng + dlng, lat + dlat)
+        rows, cols = np.meshgrid(np.arange(row_lo, row_hi + 1), np.arange(col_lo, col_hi + 1), indexing="ij")
+        rows, cols = rows.ravel(), cols.ravel()
+
+        lat0, lng0 = math.radians(lat), math.radians(lng)
+        if inside:
+            # Farthest corner within the radius
+            distance = np.zeros(len(rows))
+            for row_offset in (0, 1):
+                for col_offset in (0, 1):
+                    corner_lat = np.radians((rows + row_offset) * self.cell_deg)
+                    corner_lng = np.radians((cols + col_offset) * self.cell_deg)
+                    distance = np.maximum(distance, haversine(lat0, lng0, corner_lat, corner_lng, np.cos(corner_lat)))
+        else:
+            # Nearest point of the cell within the radius
+            near_lat = np.radians(np.clip(lat, rows * self.cell_deg, (rows + 1) * self.cell_deg))
+            near_lng = np.radians(np.clip(lng, cols * self.cell_deg, (cols + 1) * self.cell_deg))
+            distance = haversine(lat0, lng0, near_lat, near_lng, np.cos(near_lat))
+
+        selected = np.flatnonzero(distance <= radius)
+        selected = selected[np.argsort(distance[selected], kind="stable")]
+        return [(int(rows[i]), int(cols[i])) for i in selected]
+
+    def is_fresh(self, key: CellKey, category: int = ALL_CATEGORIES, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        for coverage_key in ((key, ALL_CATEGORIES), (key, category)):
+            covered_at = self._coverage.get(coverage_key)
+            if covered_at is not None and (self.max_age is None or now - covered_at <= self.max_age):
+                return True
+        return False
+
+    def uncovered_cells(self, lng: float, lat: float, radius: float, category: int = ALL_CATEGORIES) -> List[CellKey]:
+        """圆内缺失或过期的网格，按离圆心由近到远排序"""
+        now = time.time()
+        return [key for key in self.cells_for_circle(lng, lat, radius) if not self.is_fresh(key, category, now)]
+
+    # 查询
+
+    def count(self, lng: float, lat: float, radius: float, category: int = ALL_CATEGORIES) -> int:
+        return len(self._query(lng, lat, radius, category)[0])
+
+    def search(
+            self,
+            lng: float,
+            lat: float,
+            radius: float,
+            category: int = ALL_CATEGORIES,
+            offset: int = 0,
+            limit: int = 20
+    ) -> Optional[Tuple[int, List[Tuple[int, Any]]]]:
+        """半径查询，按距离排序
+
+        Returns ``(total, [(distance_m, item), ...])`` for the requested page, or None
+        when part of the circle is not covered and the caller should go upstream.
+        """
+        if self.uncovered_cells(lng, lat, radius, category):
+            return None
+        indices, distances, cells, offsets = self._query(lng, lat, radius, category)
+        end = offset + limit
+        if end < len(distances):
+            # Only the first `end` need ordering
+            head = np.argpartition(distances, end)[:end]
+            order = head[np.argsort(distances[head], kind="stable")][offset:]
+        else:
+            order = np.argsort(distances, kind="stable")[offset:end]
+
+        page = []
+        for position in order:
+            # Map the flat index back to its cell
+            flat_index = indices[position]
+            cell_number = int(np.searchsorted(offsets, flat_index, side="right")) - 1
+            item = cells[cell_number].items[flat_index - offsets[cell_number]]
+            page.append((int(round(float(distances[position]))), item))
+        return len(indices), page
+
+    def _query(self, lng: float, lat: float, radius: float, category: int):
+        cells = [self._cells[key] for key in self.cells_for_circle(lng, lat, radius) if key in self._cells]
+        if not cells:
+            return np.empty(0, dtype=np.int64), np.empty(0), cells, np.zeros(1, dtype=np.int64)
+
+        arrays = [cell.arrays() for cell in cells]
+        offsets = np.zeros(len(cells) + 1, dtype=np.int64)
+        np.cumsum([len(cell.ids) for cell in cells], out=offsets[1:])
+        lats, lngs, cos_lats, categories = (
+            np.concatenate([cell_arrays[i] for cell_arrays in arrays]) for i in range(4)
+        )
+
+        distances = haversine(math.radians(lat), math.radians(lng), lats, lngs, cos_lats)
+        mask = distances <= radius
+        if category != ALL_CATEGORIES:
+            mask &= categories == category
+        indices = np.flatnonzero(mask)
+        return indices, distances[indices], cells, offsets
@@ -0,0 +1,244 @@
+"""地点联想词索引（前缀 + 拼音）
+
+Every entry (a POI name or a frequent search keyword) is indexed under its
+normalized name, its full pinyin ("xihu") and its pinyin initials ("xh"), each both
+globally and scoped to its city. Keys live in one sorted list, so a prefix is a
+``bisect`` range; the best entries of that range by score (search count) are picked
+with ``heapq.nlargest``. Ranges too wide to scan per keystroke (one or two letters)
+keep their top entries cached.
+"""
+import heapq
+import re
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+from pypinyin import lazy_pinyin
+
+CITY_SEPARATOR = "\x1f"
+_END = "\U0010ffff"
+_IGNORED = re.compile(r"[\s·•'’\-_()（）]+")
+
+
+def normalize(text: str) -> str:
+    return _IGNORED.sub("", text or "").lower()
+
+
+def normalize_city(city: Optional[str]) -> str:
+    # "杭州市" and "杭州" are the same scope
+    city = normalize(city or "")
+    return city[:-1] if len(city) > 2 and city.endswith("市") else city
+
+
+@lru_cache(maxsize=65536)
+def _pinyin_keys(text: str) -> Tuple[str, str]:
+    # One conversion gives both: runs without hanzi come back tagged and are kept whole
+    full, initials = [], []
+    for token in lazy_pinyin(text, errors=lambda chars: ["\0" + chars]):
+        if token.startswith("\0"):
+            full.append(token[1:])
+            initials.append(token[1:])
+        else:
+            full.append(token)
+            initials.append(token[:1])
+    return "".join(full), "".join(initials)
+
+
+def index_keys(name: str) -> List[str]:
+    """名称、全拼、拼音首字母（去重）"""
+    text = normalize(name)
+    if not text:
+        return []
+    keys = [text, *_pinyin_keys(text)]
+    return [key for i, key in enumerate(keys) if key and key not in keys[:i]]
+
+
+class SuggestEntry:
+    __slots__ = ("entry_id", "name", "source", "score", "poi_id", "city", "district", "address", "location", "keys")
+
+    def __init__(self, entry_id: Hashable, name: str, source: str, score: int = 0, poi_id: Optional[str] = None,
+                 city: Optional[str] = None, district: Optional[str] = None, address: Optional[str] = None,
+                 location: Optional[str] = None):
+        self.entry_id = entry_id
+        self.name = name
+        self.source = source
+        self.score = score
+        self.poi_id = poi_id
+        self.city = city
+        self.district = district
+        self.address = address
+        self.location = location
+        self.keys: List[str] = []
+
+    def rank(self):
+        return self.score, -len(self.name)
+
+
+class SuggestIndex:
+    """联想词索引
+
+    ``scan_limit`` is the widest range scanned per query; wider ranges cache their
+    ``top_k`` entries, patched in place by writes that raise a score and dropped by
+    writes that lower one. Not thread-safe; use it from the event loop only (``load``
+    may run in a thread on an index nobody reads yet).
+    """
+
+    def __init__(self, top_k: int = 20, scan_limit: int = 2000):
+        self.top_k = top_k
+        self.scan_limit = scan_limit
+        self._entries: Dict[Hashable, SuggestEntry] = {}
+        self._keys: List[str] = []
+        self._refs: List[SuggestEntry] = []
+        self._top_cache: Dict[str, List[SuggestEntry]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, entry_id: Hashable) -> Optional[SuggestEntry]:
+        return self._entries.get(entry_id)
+
+    @staticmethod
+    def _entry_keys(entry: SuggestEntry) -> List[str]:
+        keys = index_keys(entry.name)
+        city = normalize_city(entry.city)
+        if city:
+            keys += [f"{city}{CITY_SEPARATOR}{key}" for key in keys]
+        return keys
+
+    def load(self, entries: Iterable[SuggestEntry]):
+        """整体重建（一次排序）"""
+        pairs = []
+        self._entries = {}
+        for entry in entries:
+            entry.keys = self._entry_keys(entry)
+            self._entries[entry.entry_id] = entry
+            pairs.extend((key, entry) for key in entry.keys)
+        pairs.sort(key=lambda pair: pair[0])
+        self._keys = [key for key, _ in pairs]
+        self._refs = [entry for _, entry in pairs]
+        self._top_cache = {}
+        # Wide ranges are what a cold first keystroke would scan
+        if len(self._keys) > self.scan_limit:
+            self._warm("", 0, len(self._keys))
+
+    def _warm(self, prefix: str, low: int, high: int) -> List[SuggestEntry]:
+        """自底向上计算并缓存宽前缀的 top（每个键只扫描一次）"""
+        candidates = {}
+        position = low
+        while position < high:
+            key = self._keys[position]
+            if key == prefix:
+                candidates[id(self._refs[position])] = self._refs[position]
+                position += 1
+                continue
+            child = key[:len(prefix) + 1]
+            child_high = bisect_left(self._keys, child + _END, position, high)
+            if child_high - position > self.scan_limit:
+                top = self._warm(child, position, child_high)
+            else:
+                top = self._refs[position:child_high]
+            candidates.update((id(entry), entry) for entry in top)
+            position = child_high
+        top = heapq.nlargest(self.top_k, candidates.values(), key=SuggestEntry.rank)
+        if prefix:
+            self._top_cache[prefix] = top
+        return top
+
+    def swap(self, other: "SuggestIndex"):
+        """换成另一个索引的内容（用于在线程中构建好后整体替换）"""
+        self._entries, self._keys, self._refs, self._top_cache = other._entries, other._keys, other._refs, {}
+
+    def upsert(self, entry: SuggestEntry):
+        """新增/更新一个条目（名称未变时只更新字段和分数）"""
+        existing = self._entries.get(entry.entry_id)
+        if existing is not None and existing.name == entry.name and existing.city == entry.city:
+            lowered = entry.score < existing.score
+            for field in ("source", "score", "poi_id", "district", "address", "location"):
+                setattr(existing, field, getattr(entry, field))
+            if lowered:
+                self._invalidate(existing.keys)
+            else:
+                self._promote(existing)
+            return
+        if existing is not None:
+            self.remove(entry.entry_id)
+
+        entry.keys = self._entry_keys(entry)
+        self._entries[entry.entry_id] = entry
+        for key in entry.keys:
+            position = bisect_left(self._keys, key)
+            self._keys.insert(position, key)
+            self._refs.insert(position, entry)
+        self._promote(entry)
+
+    def add_score(self, entry_id: Hashable, amount: int) -> bool:
+        entry = self._entries.get(entry_id)
+        if entry is None:
+            return False
+        entry.score += amount
+        if amount < 0:
+            self._invalidate(entry.keys)
+        else:
+            self._promote(entry)
+        return True
+
+    def remove(self, entry_id: Hashable):
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        for key in entry.keys:
+            position = bisect_left(self._keys, key)
+            while position < len(self._keys) and self._keys[position] == key:
+                if self._refs[position] is entry:
+                    del self._keys[position]
+                    del self._refs[position]
+                    break
+                position += 1
+        self._invalidate(entry.keys)
+
+    def _promote(self, entry: SuggestEntry):
+        # A new or higher-ranked entry can only push others down: patch cached tops in place
+        if not self._top_cache:
+            return
+        for key in entry.keys:
+            for end in range(1, len(key) + 1):
+                top = self._top_cache.get(key[:end])
+                if top is None:
+                    continue
+                if not any(cached is entry for cached in top):
+                    if len(top) >= self.top_k and entry.rank() <= top[-1].rank():
+                        continue
+                    top.append(entry)
+                top.sort(key=SuggestEntry.rank, reverse=True)
+                del top[self.top_k:]
+
+    def _invalidate(self, keys: List[str]):
+        if not self._top_cache:
+            return
+        for key in keys:
+            for end in range(1, len(key) + 1):
+                self._top_cache.pop(key[:end], None)
+
+    def search(self, query: str, city: Optional[str] = None, limit: int = 10) -> List[SuggestEntry]:
+        """前缀匹配，按分数从高到低"""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        scope = normalize_city(city)
+        if scope:
+            prefix = f"{scope}{CITY_SEPARATOR}{prefix}"
+        return self._top(prefix)[:limit]
+
+    def _top(self, prefix: str) -> List[SuggestEntry]:
+        cached = self._top_cache.get(prefix)
+        if cached is not None:
+            return cached
+
+        low = bisect_left(self._keys, prefix)
+        high = bisect_left(self._keys, prefix + _END, low)
+        # One entry can match through its name, pinyin and initials
+        candidates = {id(entry): entry for entry in self._refs[low:high]}.values()
+        top = heapq.nlargest(self.top_k, candidates, key=SuggestEntry.rank)
+        if high - low > self.scan_limit:
+            self._top_cache[prefix] = top
+        return top
@@ -0,0 +1,74 @@
+from typing import Dict, Iterable, List, Optional, Set
+from sqlalchemy.orm import Session
+
+from app.models.user import User
+from app.schemas.trip import TripCollaboratorInfo
+
+
+class UserLoader:
+    """请求级用户批量加载器（DataLoader风格）
+
+    Ids are collected with load_many() and resolved together with a single
+    ``IN (...)`` query the first time any of them is read. Resolved users are
+    memoized for the lifetime of the loader, so one instance should live no
+    longer than a request (it is owned by the per-request TripService).
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self._users: Dict[int, Optional[User]] = {}
+        self._pending: Set[int] = set()
+
+    def prime(self, user: Optional[User]):
+        """Seed the loader with an already loaded user (e.g. the current user)."""
+        if user is not None:
+            self._users[user.id] = user
+            self._pending.discard(user.id)
+
+    def load_many(self, user_ids: Iterable[int]):
+        """Queue ids to be resolved by the next batch."""
+        for user_id in user_ids:
+            if user_id is not None and user_id not in self._users:
+                self._pending.add(user_id)
+
+    def get(self, user_id: int) -> Optional[User]:
+        self.load_many([user_id])
+        self._dispatch()
+        return self._users.get(user_id)
+
+    def get_many(self, user_ids: Iterable[int]) -> Dict[int, Optional[User]]:
+        user_ids = list(user_ids)
+        self.load_many(user_ids)
+        self._dispatch()
+        return {user_id: self._users.get(user_id) for user_id in user_ids}
+
+    def _dispatch(self):
+        if not self._pending:
+            return
+        pending_ids = list(self._pending)
+        self._pending.clear()
+
+        users = self.db.query(User).filter(User.id.in_(pending_ids)).all()
+        found = {user.id: user for user in users}
+        for user_id in pending_ids:
+            self._users[user_id] = found.get(user_id)
+
+
+class CollaboratorLoader:
+    """行程协作者批量加载器
+
+    Collaborators are currently just the owner; once a collaborators table
+    exists, its rows should be batched here the same way.
+    """
+
+    def __init__(self, user_loader: UserLoader):
+        self.user_loader = user_loader
+
+    def load_many(self, trips: Iterable) -> None:
+        self.user_loader.load_many(trip.user_id for trip in trips)
+
+    def get(self, trip) -> List[TripCollaboratorInfo]:
+        owner = self.user_loader.get(trip.user_id)
+        if not owner:
+            return []
+        return [TripCollaboratorInfo(user_id=owner.id, avatar_url=owner.avatar_url, role="owner")]
@@ -1,109 +1,273 @@
+import asyncio
 import httpx
-from typing import Optional, Dict, Any
+import time
+from collections import defaultdict
+from typing import Optional, Dict, Any, List, Set, Tuple
 from datetime import date
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
+from app.core.http_client import shared_http_client
 from app.core.exceptions import ValidationError
+from app.models.trip import TripDay
 from app.schemas.trip import WeatherInfo
+from app.services.forecast_engine import daily_forecasts
+from app.utils.cache import cache, CacheKeys, CacheTTL, LRUCache
+from app.utils.metrics import metrics
+from app.utils.singleflight import SingleFlight
+
+GEOCODE_URL = "http://api.openweathermap.org/geo/1.0/direct"
+
+# City coordinates never change: kept for the life of the process (and in Redis,
+# without expiry). Unknown cities are remembered for WEATHER_GEOCODE_NEGATIVE_TTL.
+_geocodes: Dict[str, Tuple[float, float]] = {}
+_missing_geocodes = LRUCache(maxsize=1024, ttl=settings.WEATHER_GEOCODE_NEGATIVE_TTL)
+_geocode_flight = SingleFlight("weather.geocode")
+# Forecasts are cached per ~10 km cell (coordinates rounded to 0.1°) and served stale
+# while one background refresh per cell runs
+_forecast_flight = SingleFlight("weather.forecast")
+_refreshing_forecasts: Set[str] = set()
+_background_tasks: Set[asyncio.Task] = set()
+
+
+class UpstreamBudget:
+    """一轮刷新可用的上游预报请求数"""
+
+    def __init__(self, calls: int):
+        self.remaining = calls
+
+    def take(self) -> bool:
+        if self.remaining <= 0:
+            return False
+        self.remaining -= 1
+        return True
 
 
 class WeatherService:
-    def __init__(self):
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
         self.base_url = settings.WEATHER_BASE_URL
         self.api_key = settings.WEATHER_API_KEY
+        self._http_client = http_client
 
-    async def get_weather_forecast(self, city: str, target_date: date) -> Optional[WeatherInfo]:
-        """Get weather forecast"""
-        if not self.api_key:
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        return self._http_client or shared_http_client()
+
+    async def geocode(self, city: str) -> Optional[Tuple[float, float]]:
+        """城市 -> (纬度, 经度)；未知城市返回 None
+
+        Looked up in this process, then Redis, and only then upstream (concurrent
+        lookups of one city share that call). Upstream errors
+        propagate and are not cached; only a definite "no such city" is.
+        """
+        key = city.strip().lower()
+        coordinates = _geocodes.get(key)
+        if coordinates is not None:
+            return coordinates
+        if _missing_geocodes.get(key):
+            return None
+
+        cached = cache.get(CacheKeys.WEATHER_GEOCODE.format(city=key))
+        if cached is not None:
+            # [] marks an unknown city
+            coordinates = tuple(cached) if cached else None
+        else:
+            coordinates = await _geocode_flight.do(key, lambda: self._fetch_geocode(key))
+
+        if coordinates is None:
+            _missing_geocodes.set(key, True)
+        else:
+            _geocodes[key] = coordinates
+        return coordinates
+
+    async def _fetch_geocode(self, key: str) -> Optional[Tuple[float, float]]:
+        metrics.incr("weather.geocode_upstream")
+        response = await self.http_client.get(GEOCODE_URL, params={"q": key, "limit": 1, "appid": self.api_key})
+        response.raise_for_status()
+        geo_data = response.json()
+        if not isinstance(geo_data, list):
+            raise ValueError(f"Unexpected geocoding response for {key}: {geo_data}")
+
+        cache_key = CacheKeys.WEATHER_GEOCODE.format(city=key)
+        if not geo_data or not isinstance(geo_data[0], dict) or "lat" not in geo_data[0] or "lon" not in geo_data[0]:
+            cache.set(cache_key, [], settings.WEATHER_GEOCODE_NEGATIVE_TTL)
             return None
 
+        coordinates = (float(geo_data[0]["lat"]), float(geo_data[0]["lon"]))
+        cache.set(cache_key, list(coordinates))
+        return coordinates
+
+    async def get_city_forecast_items(self, city: str, wait: bool = True,
+                                      budget: Optional[UpstreamBudget] = None) -> List[Dict[str, Any]]:
+        """城市未来5天的3小时预报；失败时返回空列表
+
+        Served from the forecast cache when possible (stale entries trigger a background
+        refresh). On a miss, ``wait=False`` returns [] at once and fetches in the
+        background, for read paths that must not block on the weather provider.
+        With a ``budget`` (the periodic refresher), stale or missing entries are fetched
+        inline while the budget lasts and left as they are once it runs out.
+        """
+        if not self.api_key:
+            return []
+
         try:
-            # Get city coordinates
-            geo_url = f"http://api.openweathermap.org/geo/1.0/direct"
-            geo_params = {
-                "q": city,
-                "limit": 1,
-                "appid": self.api_key
-            }
-
-            async with httpx.AsyncClient() as client:
-                geo_response = await client.get(geo_url, params=geo_params)
-                geo_data = geo_response.json()
-
-                if not geo_data or not isinstance(geo_data, list) or len(geo_data) == 0:
-                    print(f"Could not find geo data for city: {city}")
-                    return None
-                
-                # Add more robust error handling for geo_data structure
-                if not isinstance(geo_data[0], dict) or "lat" not in geo_data[0] or "lon" not in geo_data[0]:
-                    print(f"Geo data for city {city} is malformed: {geo_data[0]}")
-                    return None
-
-                lat = geo_data[0]["lat"]
-                lon = geo_data[0]["lon"]
-
-                # Get weather forecast
-                weather_url = f"{self.base_url}/forecast"
-                weather_params = {
-                    "lat": lat,
-                    "lon": lon,
-                    "appid": self.api_key,
-                    "units": "metric",
-                    "lang": "zh_cn"
-                }
-
-                weather_response = await client.get(weather_url, params=weather_params)
-                weather_response.raise_for_status()
-                weather_data = weather_response.json()
-
-                # Find weather for the target date
-                # OpenWeatherMap 5 day / 3 hour forecast returns a list.
-                # We need to find the forecast entry closest to midday for the target_date.
-                target_dt_str = target_date.strftime("%Y-%m-%d")
-                
-                best_match_for_date = None
-
-                for forecast_item in weather_data.get("list", []):
-                    item_dt_txt = forecast_item.get("dt_txt", "")
-                    if target_dt_str in item_dt_txt:
-                        # Simple approach: take the first entry for the day, or one around midday
-                        # A more complex approach might average or pick the most representative
-                        if best_match_for_date is None or "12:00:00" in item_dt_txt :
-                             best_match_for_date = forecast_item
-                             if "12:00:00" in item_dt_txt: # Prefer midday forecast
-                                 break 
-                
-                if best_match_for_date:
-                    weather_details = best_match_for_date.get("weather", [{}])[0]
-                    main_details = best_match_for_date.get("main", {})
-                    wind_details = best_match_for_date.get("wind", {})
-                    
-                    # The WeatherInfo schema expects specific string formats.
-                    # Note: OpenWeatherMap 'pop' is probability of precipitation.
-                    precipitation_percentage = int(best_match_for_date.get("pop", 0) * 100)
-
-                    return WeatherInfo(
-                        condition=weather_details.get("description"),
-                        temperature=f"{int(main_details.get('temp_min', 0))}°-{int(main_details.get('temp_max', 0))}°",
-                        icon=weather_details.get("icon"),
-                        humidity=f"{main_details.get('humidity', 0)}%",
-                        wind=f"{wind_details.get('speed', 0)}m/s",
-                        precipitation=f"{precipitation_percentage}%"
-                        # uv_index, sunrise, sunset are not directly available in the 5-day forecast's list items.
-                        # These would require a different API call (e.g., One Call API) or be omitted.
-                    )
-                else:
-                    print(f"No forecast data found for {target_date} in city {city}")
-                    return None
+            coordinates = await self.geocode(city)
+            if coordinates is None:
+                print(f"Could not find geo data for city: {city}")
+                return []
+            return await self._get_forecast_items(*coordinates, wait=wait, budget=budget) or []
 
         except httpx.HTTPStatusError as e:
             print(f"HTTP error occurred while fetching weather data: {e}")
-            return None
         except httpx.RequestError as e:
             print(f"Request error occurred while fetching weather data: {e}")
-            return None
-        except (KeyError, IndexError, TypeError) as e:
-            print(f"Error parsing weather data: {str(e)}. Data: {weather_data if 'weather_data' in locals() else 'N/A'}")
-            return None
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            print(f"Error parsing weather data: {str(e)}")
         except Exception as e:
             print(f"An unexpected error occurred while fetching weather information: {str(e)}")
+        return []
+
+    async def _get_forecast_items(self, lat: float, lon: float, wait: bool = True,
+                                  budget: Optional[UpstreamBudget] = None) -> Optional[List[Dict[str, Any]]]:
+        cell = (round(lat, 1), round(lon, 1))
+        cache_key = CacheKeys.WEATHER_FORECAST.format(lat=f"{cell[0]:.1f}", lon=f"{cell[1]:.1f}")
+        entry = cache.get(cache_key)
+        if budget is not None:
+            return await self._refresh_forecast_items(cache_key, cell, entry, budget)
+        if entry is not None:
+            metrics.incr("weather.forecast_hit")
+            if time.time() - entry["fetched_at"] >= settings.WEATHER_FORECAST_SOFT_TTL:
+                self._schedule_forecast_refresh(cache_key, cell)
+            return entry["list"]
+
+        metrics.incr("weather.forecast_miss")
+        if not wait:
+            self._schedule_forecast_refresh(cache_key, cell)
             return None
+        return await _forecast_flight.do(cache_key, lambda: self._fetch_forecast(cache_key, cell))
+
+    async def _refresh_forecast_items(self, cache_key: str, cell: Tuple[float, float], entry: Optional[Dict[str, Any]],
+                                      budget: UpstreamBudget) -> Optional[List[Dict[str, Any]]]:
+        if entry is not None and time.time() - entry["fetched_at"] < settings.WEATHER_FORECAST_SOFT_TTL:
+            metrics.incr("weather.forecast_hit")
+            return entry["list"]
+        if not budget.take():
+            metrics.incr("weather.refresh_skipped_budget")
+            return entry["list"] if entry is not None else None
+        try:
+            return await _forecast_flight.do(cache_key, lambda: self._fetch_forecast(cache_key, cell))
+        except Exception as e:
+            if entry is None:
+                raise
+            print(f"Forecast refresh error ({cache_key}): {e}")
+            return entry["list"]
+
+    def _schedule_forecast_refresh(self, cache_key: str, cell: Tuple[float, float]):
+        if cache_key in _refreshing_forecasts:
+            return
+        _refreshing_forecasts.add(cache_key)
+        task = asyncio.create_task(self._refresh_forecast(cache_key, cell))
+        _background_tasks.add(task)
+
+        def done(finished: asyncio.Task):
+            _background_tasks.discard(finished)
+            _refreshing_forecasts.discard(cache_key)
+        task.add_done_callback(done)
+
+    async def _refresh_forecast(self, cache_key: str, cell: Tuple[float, float]):
+        try:
+            await _forecast_flight.do(cache_key, lambda: self._fetch_forecast(cache_key, cell))
+        except Exception as e:
+            # The stale entry keeps being served until its hard TTL
+            print(f"Forecast refresh error ({cache_key}): {e}")
+
+    async def _fetch_forecast(self, cache_key: str, cell: Tuple[float, float]) -> List[Dict[str, Any]]:
+        metrics.incr("weather.forecast_upstream")
+        weather_url = f"{self.base_url}/forecast"
+        weather_params = {
+            "lat": cell[0],
+            "lon": cell[1],
+            "appid": self.api_key,
+            "units": "metric",
+            "lang": "zh_cn"
+        }
+
+        weather_response = await self.http_client.get(weather_url, params=weather_params)
+        weather_response.raise_for_status()
+        forecast_items = [self._compact_forecast_item(item) for item in weather_response.json().get("list", [])]
+        cache.set(cache_key, {"fetched_at": time.time(), "list": forecast_items}, CacheTTL.WEATHER_FORECAST)
+        return forecast_items
+
+    @staticmethod
+    def _compact_forecast_item(forecast_item: Dict[str, Any]) -> Dict[str, Any]:
+        # Only the fields read back (same shape as the API), about a tenth of the response
+        weather_details = (forecast_item.get("weather") or [{}])[0]
+        main_details = forecast_item.get("main", {})
+        wind_details = forecast_item.get("wind") or {}
+        return {
+            "dt": forecast_item.get("dt"),
+            "dt_txt": forecast_item.get("dt_txt", ""),
+            "weather": [{"description": weather_details.get("description"), "icon": weather_details.get("icon")}],
+            "main": {key: main_details.get(key) for key in ("temp_min", "temp_max", "humidity") if key in main_details},
+            "wind": {"speed": wind_details["speed"]} if "speed" in wind_details else {},
+            "pop": forecast_item.get("pop", 0),
+        }
+
+    async def fill_trips_weather(self, db: AsyncSession, trip_ids: List[int],
+                                 budget: Optional[UpstreamBudget] = None) -> Dict[int, List[int]]:
+        """按城市批量填充多个行程各天的天气
+
+        Fetches each distinct city of the trips' days once, concurrently, then writes
+        every day that has a forecast in one bulk UPDATE (not committed). Cities are
+        fetched in the order of ``trip_ids``, so with a ``budget`` the first trips are
+        the ones kept fresh. Returns trip_id -> day_index of the updated days.
+        """
+        if not trip_ids or not self.api_key:
+            return {}
+        days = (await db.execute(
+            select(TripDay.id, TripDay.trip_id, TripDay.day_index, TripDay.city, TripDay.date, TripDay.timezone)
+            .where(TripDay.trip_id.in_(trip_ids))
+        )).all()
+        priority = {trip_id: position for position, trip_id in enumerate(trip_ids)}
+        days_by_city: Dict[str, list] = defaultdict(list)
+        for day in sorted(days, key=lambda day: (priority[day.trip_id], day.day_index)):
+            if day.city:
+                days_by_city[day.city].append(day)
+        if not days_by_city:
+            return {}
+
+        semaphore = asyncio.Semaphore(settings.WEATHER_FETCH_CONCURRENCY)
+
+        async def fetch(city: str) -> List[Dict[str, Any]]:
+            async with semaphore:
+                return await self.get_city_forecast_items(city, budget=budget)
+
+        cities = list(days_by_city)
+        forecast_items = dict(zip(cities, await asyncio.gather(*(fetch(city) for city in cities))))
+
+        # One aggregation per city and timezone, shared by every day in it
+        forecasts: Dict[Tuple[str, Optional[str]], Dict[date, WeatherInfo]] = {}
+        rows, updated = [], defaultdict(list)
+        for city, city_days in days_by_city.items():
+            for day in city_days:
+                key = (city, day.timezone)
+                if key not in forecasts:
+                    forecasts[key] = daily_forecasts(forecast_items[city], day.timezone)
+                weather = forecasts[key].get(day.date)
+                if weather is None:
+                    continue
+                rows.append({
+                    "id": day.id,
+                    "weather_condition": weather.condition,
+                    "weather_icon": weather.icon,
+                    "temperature": weather.temperature,
+                    "humidity": weather.humidity,
+                    "wind": weather.wind,
+                    "precipitation": weather.precipitation,
+                })
+                updated[day.trip_id].append(day.day_index)
+        if rows:
+            # Bulk UPDATE by primary key: one executemany statement
+            await db.execute(update(TripDay), rows)
+        metrics.incr("weather.days_filled", len(rows))
+        return {trip_id: sorted(day_indexes) for trip_id, day_indexes in updated.items()}
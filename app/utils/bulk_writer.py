@@ -0,0 +1,151 @@
+"""缓冲批量写入（日志类表）
+
+Request handlers call ``record`` to queue a row; it never waits for the database.
+A background flusher bulk-inserts the queued rows when ``batch_size`` of them are
+waiting or every ``flush_interval`` seconds, whichever comes first. The buffer is
+bounded: once ``max_pending`` rows are waiting, new rows are dropped (and counted)
+instead of slowing requests down. ``stop`` writes out whatever is left.
+
+Rows are best-effort: a batch whose insert fails is dropped, not retried (counted,
+and logged once per batch).
+
+``BulkCounter`` buffers increments the same way and applies them as one
+``UPDATE ... SET column = column + n`` executemany per batch.
+"""
+import asyncio
+import logging
+from collections import Counter
+from itertools import islice
+from typing import Any, Dict, Hashable, List, Optional
+
+from sqlalchemy import bindparam, insert, update
+
+from app.core.database import AsyncSessionLocal
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class BulkWriter:
+    """单表缓冲写入器
+
+    Counters (see app.utils.metrics): ``<name>.recorded``, ``<name>.dropped`` (buffer
+    full), ``<name>.written`` and ``<name>.failed`` (rows in failed batches); gauge
+    ``<name>.pending``.
+    """
+
+    def __init__(self, model, name: str, batch_size: int = 500, flush_interval: float = 2.0, max_pending: int = 10000):
+        self.model = model
+        self.name = name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._buffer: List[Dict[str, Any]] = []
+        # Created in start(): an Event belongs to the loop it is first waited on
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def record(self, values: Dict[str, Any]) -> bool:
+        """排队一行，缓冲区满时丢弃并返回 False"""
+        if len(self._buffer) >= self.max_pending:
+            metrics.incr(f"{self.name}.dropped")
+            return False
+        self._buffer.append(values)
+        metrics.incr(f"{self.name}.recorded")
+        metrics.set(f"{self.name}.pending", len(self._buffer))
+        if len(self._buffer) >= self.batch_size and self._wake is not None:
+            self._wake.set()
+        return True
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止后台写入并写完缓冲区"""
+        self._stopping = True
+        if self._task is not None:
+            self._wake.set()
+            await self._task
+            self._task = None
+            self._wake = None
+        await self.flush()
+
+    async def _run(self):
+        while not self._stopping:
+            if len(self._buffer) < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        """按批写入当前缓冲的所有行"""
+        while self._buffer:
+            batch = self._buffer[:self.batch_size]
+            del self._buffer[:self.batch_size]
+            metrics.set(f"{self.name}.pending", len(self._buffer))
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(insert(self.model), batch)
+                    await db.commit()
+                metrics.incr(f"{self.name}.written", len(batch))
+            except Exception:
+                metrics.incr(f"{self.name}.failed", len(batch))
+                logger.warning("Bulk write failed (%s, %d rows dropped)", self.name, len(batch), exc_info=True)
+
+
+class BulkCounter(BulkWriter):
+    """计数列缓冲累加器
+
+    ``record`` sums increments per key in memory (at most ``max_pending`` distinct
+    keys); a flush applies ``batch_size`` keys per executemany UPDATE. Keys with no
+    matching row are ignored. Same counters and gauge as BulkWriter, counted in keys.
+    """
+
+    def __init__(self, column, key_column, name: str, batch_size: int = 500, flush_interval: float = 2.0,
+                 max_pending: int = 10000):
+        super().__init__(column.table, name, batch_size, flush_interval, max_pending)
+        self._buffer: Counter = Counter()
+        self._statement = (
+            update(column.table)
+            .where(key_column == bindparam("counted_key"))
+            .values({column.name: column + bindparam("increment")})
+        )
+
+    def record(self, key: Hashable, amount: int = 1) -> bool:
+        """累加一个键的计数，缓冲的键已满时丢弃并返回 False"""
+        if key not in self._buffer and len(self._buffer) >= self.max_pending:
+            metrics.incr(f"{self.name}.dropped")
+            return False
+        self._buffer[key] += amount
+        metrics.incr(f"{self.name}.recorded")
+        metrics.set(f"{self.name}.pending", len(self._buffer))
+        if len(self._buffer) >= self.batch_size and self._wake is not None:
+            self._wake.set()
+        return True
+
+    async def flush(self):
+        """按批写入当前缓冲的所有增量"""
+        while self._buffer:
+            batch = [
+                {"counted_key": key, "increment": self._buffer.pop(key)}
+                for key in list(islice(self._buffer, self.batch_size))
+            ]
+            metrics.set(f"{self.name}.pending", len(self._buffer))
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(self._statement, batch)
+                    await db.commit()
+                metrics.incr(f"{self.name}.written", len(batch))
+            except Exception:
+                metrics.incr(f"{self.name}.failed", len(batch))
+                logger.warning("Bulk update failed (%s, %d keys dropped)", self.name, len(batch), exc_info=True)
@@ -1,6 +1,8 @@
 import redis
 import json
 import pickle
+import time
+from collections import OrderedDict
 from typing import Any, Optional, Union, Dict, List
 from datetime import timedelta
 from functools import wraps
@@ -26,19 +28,34 @@ class RedisCache:
             if value is None:
                 return default
 
-            # 灏濊瘯JSON鍙嶅簭鍒楀寲
-            try:
-                return json.loads(value.decode('utf-8'))
-            except (json.JSONDecodeError, UnicodeDecodeError):
-                # 濡傛灉JSON澶辫触锛屽皾璇昿ickle鍙嶅簭鍒楀寲
-                try:
-                    return pickle.loads(value)
-                except:
-                    return value.decode('utf-8') if isinstance(value, bytes) else value
+            return self._loads(value)
         except Exception as e:
             print(f"Redis get error: {e}")
             return default
 
+    def mget(self, keys: List[str]) -> List[Any]:
+        """批量获取缓存值（缺失的键为 None）"""
+        if not keys:
+            return []
+        try:
+            values = self.redis_client.mget(keys)
+        except Exception as e:
+            print(f"Redis mget error: {e}")
+            return [None] * len(keys)
+        return [None if value is None else self._loads(value) for value in values]
+
+    @staticmethod
+    def _loads(value: bytes) -> Any:
+        # 灏濊瘯JSON鍙嶅簭鍒楀寲
+        try:
+            return json.loads(value.decode('utf-8'))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            # 濡傛灉JSON澶辫触锛屽皾璇昿ickle鍙嶅簭鍒楀寲
+            try:
+                return pickle.loads(value)
+            except:
+                return value.decode('utf-8') if isinstance(value, bytes) else value
+
     def set(self, key: str, value: Any, expire: Optional[Union[int, timedelta]] = None) -> bool:
         """璁剧疆缂撳瓨鍊�"""
         try:
@@ -59,6 +76,17 @@ class RedisCache:
             print(f"Redis set error: {e}")
             return False
 
+    def add(self, key: str, value: Any, expire: Optional[Union[int, timedelta]] = None) -> bool:
+        """仅当键不存在时设置缓存值"""
+        try:
+            serialized_value = json.dumps(value, ensure_ascii=False, default=str)
+            if isinstance(expire, timedelta):
+                expire = int(expire.total_seconds())
+            return bool(self.redis_client.set(key, serialized_value, ex=expire, nx=True))
+        except Exception as e:
+            print(f"Redis add error: {e}")
+            return False
+
     def delete(self, *keys: str) -> int:
         """鍒犻櫎缂撳瓨"""
         try:
@@ -219,25 +247,38 @@ class CacheKeys:
     USER_INFO = "user:info:{user_id}"
     USER_TRIPS = "user:trips:{user_id}"
     USER_FAVORITES = "user:favorites:{user_id}"
+    USER_TRIP_COUNT = "user:trips:count:{user_id}"  # hash: status -> total
 
     # 琛岀▼鐩稿叧
     TRIP_DETAIL = "trip:detail:{trip_id}"
-    TRIP_OVERVIEW = "trip:overview:{trip_id}"
-    TRIP_DAY = "trip:day:{trip_id}:{day_index}"
+    TRIP_VERSION = "trip:version:{trip_id}"  # bumped by every trip write
+    TRIP_OVERVIEW = "trip:overview:{trip_id}:{version}"
+    TRIP_DAY = "trip:day:{trip_id}:{day_index}:{version}"
     TRIP_FOODS = "trip:foods:{trip_id}"
 
     # 鍦扮偣鐩稿叧
     LOCATION_DETAIL = "location:detail:{poi_id}"
-    LOCATION_SEARCH = "location:search:{keyword}:{city}:{page}"
-    LOCATION_AROUND = "location:around:{location}:{radius}:{type}:{page}"
+    LOCATION_SEARCH = "location:search:{keyword}:{city}:{page}:{page_size}"
+    LOCATION_AROUND = "location:around:{location}:{radius}:{type}:{page}:{page_size}"
+    LOCATION_SUGGEST = "location:suggest:{keyword}:{city}"  # AMap input tips, only on index misses
 
     # 澶╂皵鐩稿叧
-    WEATHER_FORECAST = "weather:forecast:{city}:{date}"
+    WEATHER_FORECAST = "weather:forecast:{lat}:{lon}"  # per ~10 km cell: coordinates rounded to 0.1°
+    WEATHER_GEOCODE = "weather:geocode:{city}"  # [lat, lon], or [] for an unknown city
 
     # 缁熻�＄浉鍏�
     DAILY_STATS = "stats:daily:{date}"
     USER_ACTIVITY = "stats:user:{user_id}:{date}"
 
+    # Cross-worker single-flight lock (app/utils/singleflight.py)
+    SINGLEFLIGHT_LOCK = "lock:singleflight:{key}"
+    # Held by the worker running the current trip weather refresh pass (app/services/trip_service.py)
+    WEATHER_REFRESH_LOCK = "lock:weather_refresh"
+
+    # AMap client (app/services/amap_client.py)
+    AMAP_RATE_LIMIT = "amap:ratelimit"  # hash: tokens, ts
+    AMAP_STALE = "amap:stale:{digest}"  # last good response, served while AMap is unavailable
+
 
 # 缂撳瓨杩囨湡鏃堕棿甯搁噺
 class CacheTTL:
@@ -251,11 +292,56 @@ class CacheTTL:
     # 鍏蜂綋涓氬姟缂撳瓨鏃堕棿
     USER_INFO = 30 * MINUTE
     TRIP_DETAIL = 10 * MINUTE
+    TRIP_SNAPSHOT = HOUR  # versioned overview/day entries, never stale
+    TRIP_VERSION = 30 * DAY
+    USER_TRIP_COUNT = 10 * MINUTE
     LOCATION_SEARCH = 2 * HOUR
-    WEATHER_FORECAST = 30 * MINUTE
+    LOCATION_DETAIL = DAY  # POI details rarely change; rows are re-synced after LOCATION_SYNC_MAX_AGE_HOURS
+    WEATHER_FORECAST = 6 * HOUR  # hard expiry; entries are refreshed after WEATHER_FORECAST_SOFT_TTL
     DAILY_STATS = DAY
 
 
+
+class LRUCache:
+    """进程内LRU缓存（可选TTL）
+
+    Sits in front of Redis for very hot keys. Entries are per process, so keep the
+    TTL short enough that staleness across workers does not matter.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return default
+        value, expires_at = item
+        if expires_at is not None and expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Any, value: Any):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Any):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
 def cache_result(key_pattern: str, expire: int = CacheTTL.HOUR):
     """缂撳瓨瑁呴グ鍣�"""
 
@@ -1,4 +1,6 @@
+import base64
 import hashlib
+import json
 import uuid
 import random
 import string
@@ -189,6 +191,22 @@ def url_decode(text: str) -> str:
     return unquote(text)
 
 
+def encode_cursor(data: Dict[str, Any]) -> str:
+    """编码不透明分页游标"""
+    raw = json.dumps(data, separators=(',', ':'), default=str).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Optional[Dict[str, Any]]:
+    """解码分页游标，格式错误时返回None"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return data if isinstance(data, dict) else None
+    except (ValueError, UnicodeError):
+        return None
+
+
 def generate_amap_navigation_url(
         from_lng: float, from_lat: float, from_name: str,
         to_lng: float, to_lat: float, to_name: str,
@@ -1,4 +1,6 @@
-from .cache import cache, CacheKeys, CacheTTL, cache_result, invalidate_cache_pattern
+from .cache import cache, CacheKeys, CacheTTL, LRUCache, cache_result, invalidate_cache_pattern
+from .metrics import metrics, Metrics
+from .singleflight import SingleFlight
 from .helpers import (
     generate_uuid, generate_short_id, generate_share_code,
     md5_hash, sha256_hash, validate_phone, validate_email,
@@ -6,6 +8,7 @@ from .helpers import (
     format_duration, parse_location, calculate_distance,
     convert_timezone, get_date_range, format_business_hours,
     extract_numbers, clean_text, truncate_text, url_encode, url_decode,
+    encode_cursor, decode_cursor,
     generate_amap_navigation_url, generate_web_navigation_url,
     safe_get, safe_int, safe_float, safe_decimal,
     batch_process, remove_duplicates, merge_dicts, flatten_dict,
@@ -14,7 +17,10 @@ from .helpers import (
 
 __all__ = [
     # Cache
-    "cache", "CacheKeys", "CacheTTL", "cache_result", "invalidate_cache_pattern",
+    "cache", "CacheKeys", "CacheTTL", "LRUCache", "cache_result", "invalidate_cache_pattern",
+
+    # Metrics / single-flight
+    "metrics", "Metrics", "SingleFlight",
 
     # Helpers
     "generate_uuid", "generate_short_id", "generate_share_code",
@@ -23,6 +29,7 @@ __all__ = [
     "format_duration", "parse_location", "calculate_distance",
     "convert_timezone", "get_date_range", "format_business_hours",
     "extract_numbers", "clean_text", "truncate_text", "url_encode", "url_decode",
+    "encode_cursor", "decode_cursor",
     "generate_amap_navigation_url", "generate_web_navigation_url",
     "safe_get", "safe_int", "safe_float", "safe_decimal",
     "batch_process", "remove_duplicates", "merge_dicts", "flatten_dict",
@@ -0,0 +1,43 @@
+"""进程内计数器/仪表
+
+Counters and gauges live in the worker process; with several workers, scrape
+each one (or sum them) for cluster totals.
+"""
+from collections import Counter
+from threading import Lock
+from typing import Dict
+
+
+class Metrics:
+    """命名计数器（incr）和仪表（set，记录当前值，如队列长度）"""
+
+    def __init__(self):
+        self._counters: Counter = Counter()
+        self._gauges: Dict[str, float] = {}
+        self._lock = Lock()
+
+    def incr(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def set(self, name: str, value: float):
+        with self._lock:
+            self._gauges[name] = value
+
+    def get(self, name: str) -> float:
+        if name in self._gauges:
+            return self._gauges[name]
+        return self._counters.get(name, 0)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(sorted({**self._counters, **self._gauges}.items()))
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+
+
+# 全局计数器实例
+metrics = Metrics()
@@ -1,3 +1,9 @@
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
 def success_response(data=None, message="success"):
     """
     鎴愬姛鍝嶅簲
@@ -17,3 +23,21 @@ def error_response(code=1, message="error", data=None):
         "message": message,
         "data": data
     }
+
+
+def _orjson_default(value: Any):
+    # Same representation Pydantic uses in JSON mode
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class FastJSONResponse(JSONResponse):
+    """orjson序列化的JSON响应
+
+    For payloads that are already trusted (snapshots, dicts built from ORM rows).
+    Returning it from a route bypasses response_model validation and serialization.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_orjson_default)
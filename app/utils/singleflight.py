@@ -0,0 +1,126 @@
+"""合并并发的相同上游调用（single-flight）
+
+Concurrent callers with the same key share one in-flight task per worker. The call
+runs as its own task, so a caller that disconnects does not cancel it for the rest.
+
+With ``distributed=True`` the task also takes a short Redis lock, so only one worker
+in the cluster calls upstream. Workers that lose the lock poll ``load`` (which reads
+the result the winner caches) until it shows up; if the lock goes away without a
+result, or is held past its TTL, they call upstream themselves. Redis is a blocking
+client, so the lock calls and ``load`` run in a worker thread.
+"""
+import asyncio
+import json
+import uuid
+from typing import Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+from app.utils.cache import cache, CacheKeys
+from app.utils.metrics import metrics
+
+T = TypeVar("T")
+
+# Deletes the lock only while this worker still holds it
+_RELEASE_LOCK = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """按键合并并发调用
+
+    Counters (see app.utils.metrics): ``<name>.upstream`` for calls that reached
+    upstream, ``<name>.coalesced`` for callers that joined an in-flight call in this
+    worker, ``<name>.coalesced_remote`` for results another worker fetched, and
+    ``<name>.lock_fallback`` for waits that gave up on the Redis lock.
+    """
+
+    def __init__(self, name: str, distributed: bool = False, lock_ttl: int = 10, poll_interval: float = 0.05):
+        self.name = name
+        self.distributed = distributed
+        self.lock_ttl = lock_ttl
+        self.poll_interval = poll_interval
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(
+            self,
+            key: str,
+            fn: Callable[[], Awaitable[T]],
+            load: Optional[Callable[[], Optional[T]]] = None
+    ) -> T:
+        """执行或加入 key 对应的调用
+
+        ``fn`` calls upstream (and should cache its result); ``load`` reads that cached
+        result back and returns None while it is missing; it is called in a worker
+        thread. The Redis lock is only used when the instance is distributed and
+        ``load`` is given.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run(key, fn, load))
+            self._calls[key] = task
+            task.add_done_callback(lambda finished: self._forget(key, finished))
+        else:
+            metrics.incr(f"{self.name}.coalesced")
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved, in case every caller went away
+
+    async def _run(self, key: str, fn, load):
+        if not self.distributed or load is None:
+            return await self._call_upstream(fn)
+
+        lock_key = CacheKeys.SINGLEFLIGHT_LOCK.format(key=key)
+        token = uuid.uuid4().hex
+        if await asyncio.to_thread(cache.add, lock_key, token, expire=self.lock_ttl):
+            try:
+                return await self._call_upstream(fn)
+            finally:
+                await asyncio.to_thread(self._release, lock_key, token)
+
+        # Another worker holds the lock: wait for the result it caches
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.lock_ttl
+        while loop.time() < deadline:
+            result, held = await asyncio.to_thread(self._poll, load, lock_key)
+            if result is not None:
+                metrics.incr(f"{self.name}.coalesced_remote")
+                return result
+            if not held:
+                # Released without a result (the holder failed) or Redis is unreachable
+                break
+            await asyncio.sleep(self.poll_interval)
+
+        metrics.incr(f"{self.name}.lock_fallback")
+        return await self._call_upstream(fn)
+
+    @staticmethod
+    def _poll(load, lock_key: str):
+        """(cached result, whether the lock is still held); re-reads once after a release"""
+        result = load()
+        if result is not None:
+            return result, True
+        if cache.exists(lock_key):
+            return None, True
+        return load(), False
+
+    async def _call_upstream(self, fn):
+        metrics.incr(f"{self.name}.upstream")
+        return await fn()
+
+    @staticmethod
+    def _release(lock_key: str, token: str):
+        try:
+            # cache.add stored the token JSON-encoded
+            cache.redis_client.eval(_RELEASE_LOCK, 1, lock_key, json.dumps(token))
+        except Exception as e:
+            print(f"Redis lock release error: {e}")
@@ -55,6 +55,7 @@ CREATE TABLE IF NOT EXISTS trips (
     like_count INT DEFAULT 0 COMMENT 'Like count',
     share_count INT DEFAULT 0 COMMENT 'Share count',
     is_public TINYINT DEFAULT 0 COMMENT 'Is public: 0 Private, 1 Public',
+    overview_snapshot JSON COMMENT 'Pre-assembled overview payload (read model, rebuilt on write)',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
@@ -63,6 +64,7 @@ CREATE TABLE IF NOT EXISTS trips (
     INDEX idx_public (is_public, status),
     INDEX idx_start_datetime (start_datetime),
     INDEX idx_created_at (created_at),
+    INDEX idx_user_created (user_id, created_at, id),
     INDEX idx_departure_poi_id (departure_poi_id),
     INDEX idx_generation_status (generation_status)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='Trips table';
@@ -109,6 +111,7 @@ CREATE TABLE IF NOT EXISTS trip_days (
     is_generated TINYINT DEFAULT 0 COMMENT 'Detailed itinerary generated: 0 No, 1 Yes',
     place_count INT DEFAULT 0 COMMENT 'Number of places',
     food_count INT DEFAULT 0 COMMENT 'Number of food items',
+    detail_snapshot JSON COMMENT 'Pre-assembled day detail payload (read model, rebuilt on write)',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (trip_id) REFERENCES trips(id) ON DELETE CASCADE,
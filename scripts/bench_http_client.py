@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""外部HTTP客户端基准测试
+
+Runs LocationService.search_locations against a local AMap stub server, once with
+a new httpx.AsyncClient per call (the previous behaviour) and once with the shared
+pooled client from app/core/http_client.py, and prints p50/p99 latency.
+
+    python scripts/bench_http_client.py               # plain HTTP
+    python scripts/bench_http_client.py --tls         # self-signed TLS, closer to the real AMap API
+
+The stub is a single-threaded asyncio server in a separate process; keep
+--concurrency below the point where it (or a shared CPU) saturates, otherwise
+both modes only measure the stub.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import multiprocessing
+import os
+import ssl
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# app.core.database builds its engines on import: default to in-memory SQLite so
+# the MySQL drivers are not needed
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+STUB_BODY = json.dumps({
+    "status": "1", "info": "OK", "count": "2",
+    "pois": [
+        {"id": "B000A7BD6C", "name": "西湖", "type": "风景名胜", "address": "龙井路1号", "location": "120.148,30.242",
+         "adname": "西湖区", "cityname": "杭州市", "pname": "浙江省", "photos": [{"url": "https://example.com/1.jpg"}]},
+        {"id": "B000A83M61", "name": "灵隐寺", "type": "风景名胜", "address": "法云弄1号", "location": "120.101,30.241",
+         "adname": "西湖区", "cityname": "杭州市", "pname": "浙江省", "photos": []},
+    ]
+}, ensure_ascii=False).encode()
+
+
+async def handle_connection(reader, writer):
+    """Minimal HTTP/1.1 keep-alive responder"""
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            if not head:
+                break
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                + f"Content-Length: {len(STUB_BODY)}\r\n\r\n".encode() + STUB_BODY
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+
+def self_signed_context():
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.utcnow()
+    cert = (
+        x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+        .serial_number(x509.random_serial_number()).not_valid_before(now)
+        .not_valid_after(now + datetime.timedelta(days=1)).sign(key, hashes.SHA256())
+    )
+    directory = tempfile.mkdtemp()
+    cert_path, key_path = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_path, key_path)
+    return context
+
+
+async def run(mode, base_url, requests, concurrency, verify):
+    import httpx
+    from app.core.http_client import create_http_client
+    from app.services.location_service import LocationService
+
+    shared = create_http_client(verify=verify) if mode == "shared" else None
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            began = time.perf_counter()
+            if shared is not None:
+                service = LocationService(shared)
+                service.amap.base_url = base_url
+                await service.search_locations("西湖", "杭州")
+            else:
+                async with httpx.AsyncClient(verify=verify) as client:
+                    service = LocationService(client)
+                    service.amap.base_url = base_url
+                    await service.search_locations("西湖", "杭州")
+            latencies.append((time.perf_counter() - began) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    if shared is not None:
+        await shared.aclose()
+
+    latencies.sort()
+    return statistics.median(latencies), latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+
+
+def serve_stub(port_queue, tls):
+    """Stub server in its own process, so it does not share the client's event loop"""
+    async def serve():
+        server = await asyncio.start_server(handle_connection, "127.0.0.1", 0,
+                                            ssl=self_signed_context() if tls else None)
+        port_queue.put(server.sockets[0].getsockname()[1])
+        async with server:
+            await server.serve_forever()
+    asyncio.run(serve())
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--tls", action="store_true", help="使用自签名证书的HTTPS桩服务")
+    args = parser.parse_args()
+
+    port_queue = multiprocessing.Queue()
+    stub = multiprocessing.Process(target=serve_stub, args=(port_queue, args.tls), daemon=True)
+    stub.start()
+    base_url = f"{'https' if args.tls else 'http'}://127.0.0.1:{port_queue.get(timeout=10)}"
+
+    print(f"{'client':<10} {'p50 ms':>8} {'p99 ms':>8}   ({args.requests} requests, concurrency {args.concurrency}, {base_url.split(':')[0]})")
+    for mode in ("per-call", "shared"):
+        p50, p99 = await run(mode, base_url, args.requests, args.concurrency, verify=False)
+        print(f"{mode:<10} {p50:>8.2f} {p99:>8.2f}")
+
+    stub.terminate()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""行程组装基准测试
+
+Times the ordering step of TripService._build_itinerary on large days (all-day
+city walks with 200+ items), comparing the previous approach (format every
+start_time as "HH:MM", then re-parse each string with strptime in the sort key)
+with the merge engine in app/services/itinerary_engine.py. Also times the whole
+_build_itinerary including the ItineraryItem models.
+
+    python scripts/bench_itinerary.py --items 200 400 800
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+from datetime import datetime, time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# app.core.database builds its engines on import: default to in-memory SQLite so
+# the MySQL drivers are not needed
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.services.itinerary_engine import timeline, merge_timelines
+
+
+def make_day(total_items, seed=7):
+    """Places, foods and transportations of one day, each stream ordered and in time order."""
+    rng = random.Random(seed)
+    streams = {"places": [], "foods": [], "transportations": []}
+    minute = 6 * 60
+    for i in range(total_items):
+        kind = rng.choices(["places", "foods", "transportations"], weights=[5, 2, 3])[0]
+        minute += rng.randint(0, 2) # stays within one day up to ~900 items
+        start_time = time((minute // 60) % 24, minute % 60)
+        rows = streams[kind]
+        streams[kind].append(SimpleNamespace(
+            id=i, visit_order=len(rows) + 1, transport_order=len(rows) + 1, start_time=start_time,
+            name=f"poi-{i}", category="景点" if kind == "places" else "food", notes=None, description=None,
+            price=None, images=None, image_url=None, latitude=None, longitude=None, duration=30,
+            amap_poi_id=f"B{i:09d}", amap_navigation_url=None, web_navigation_url=None,
+            transportation_mode="walking", from_name="a", to_name="b", from_latitude=None,
+            from_longitude=None, to_latitude=None, to_longitude=None, distance=None,
+        ))
+    return streams["places"], streams["foods"], streams["transportations"]
+
+
+def legacy_order(places, foods, transportations):
+    items = []
+    for rows, order_attr in ((places, "visit_order"), (foods, "visit_order"), (transportations, "transport_order")):
+        for row in sorted(rows, key=lambda r: getattr(r, order_attr)):
+            items.append((row.start_time.strftime("%H:%M") if row.start_time else None, row))
+
+    def sort_key(item):
+        if item[0]:
+            try:
+                return datetime.strptime(item[0], "%H:%M").time()
+            except ValueError:
+                return datetime.max.time()
+        return datetime.max.time()
+
+    items.sort(key=sort_key)
+    return [row for _, row in items]
+
+
+def merged_order(places, foods, transportations):
+    merged = merge_timelines(
+        timeline(places, "place", "visit_order"),
+        timeline(foods, "food", "visit_order"),
+        timeline(transportations, "transportation", "transport_order"),
+    )
+    return [row for _, _, row in merged]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, nargs="+", default=[200, 400, 800], help="每天行程项目数")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    from app.services.trip_service import TripService
+    service = TripService(db=None)
+
+    print(f"{'items':>6} {'legacy sort us':>15} {'merge us':>9} {'speedup':>8} {'full build us':>14}")
+    for total_items in args.items:
+        rows = make_day(total_items)
+        assert [r.id for r in legacy_order(*rows)] == [r.id for r in merged_order(*rows)]
+
+        legacy = min(timeit.repeat(lambda: legacy_order(*rows), number=args.repeat, repeat=3)) / args.repeat * 1e6
+        merged = min(timeit.repeat(lambda: merged_order(*rows), number=args.repeat, repeat=3)) / args.repeat * 1e6
+        full = min(timeit.repeat(lambda: service._build_itinerary(None, rows), number=args.repeat // 10 or 1, repeat=3)) / (args.repeat // 10 or 1) * 1e6
+        print(f"{total_items:>6} {legacy:>15.1f} {merged:>9.1f} {legacy / merged:>7.1f}x {full:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""地点联想索引基准测试
+
+Loads N synthetic entries (default 200k names of 2-6 common characters, Zipf-like
+scores, spread over a few cities) into app.services.suggest_index.SuggestIndex, then
+times suggest queries by prefix kind (characters, full pinyin, initials) and length,
+with and without a city scope.
+
+    python scripts/bench_suggest_index.py --entries 200000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.suggest_index import SuggestIndex, SuggestEntry, index_keys
+
+CHARACTERS = "西湖山水公园大学酒店广场中心博物馆寺庙古镇老街美食火锅小吃商场购物天地花港观鱼灵隐飞来峰雷峰塔断桥宋城千岛龙井茶"
+CITIES = ["杭州市", "苏州市", "上海市", "南京市", "宁波市"]
+
+
+def make_entries(count, seed=7):
+    rng = random.Random(seed)
+    entries = []
+    for i in range(count):
+        name = "".join(rng.choice(CHARACTERS) for _ in range(rng.randint(2, 6)))
+        entries.append(SuggestEntry(f"B{i}", name, "poi", int(10000 / (1 + rng.paretovariate(1.2))), city=rng.choice(CITIES)))
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    entries = make_entries(args.entries)
+    index = SuggestIndex()
+    began = time.perf_counter()
+    index.load(entries)
+    print(f"{args.entries} entries, {len(index._keys)} keys, built in {time.perf_counter() - began:.1f}s")
+
+    rng = random.Random(11)
+    sample = [rng.choice(entries) for _ in range(args.queries)]
+    print(f"{'prefix':>10} {'len':>4} {'city':>5} {'avg hits':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for kind in ("name", "pinyin", "initials"):
+        for length in (1, 2, 4):
+            for scoped in (False, True):
+                timings, hits = [], []
+                for entry in sample:
+                    keys = index_keys(entry.name)
+                    key = {"name": keys[0], "pinyin": keys[1], "initials": keys[-1]}[kind][:length]
+                    t0 = time.perf_counter()
+                    found = index.search(key, entry.city if scoped else None, 10)
+                    timings.append((time.perf_counter() - t0) * 1000)
+                    hits.append(len(found))
+                timings.sort()
+                p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+                print(f"{kind:>10} {length:>4} {'yes' if scoped else 'no':>5} {statistics.mean(hits):>9.1f} "
+                      f"{statistics.median(timings):>8.3f} {p99:>8.3f} {timings[-1]:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
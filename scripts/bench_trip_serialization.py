@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""行程响应序列化基准测试
+
+Serializes the responses of a 30-day trip (overview, one day detail, and a list
+page of 20 such trips with days) two ways:
+
+- before: validate the snapshot into the Pydantic model in the service, then let
+  FastAPI validate it again through response_model, jsonable_encoder and render
+  it with the stdlib json module
+- after:  hand the trusted snapshot dict straight to FastJSONResponse (orjson)
+
+    python scripts/bench_trip_serialization.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import timeit
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+import orjson
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# app.core.database builds its engines on import: default to in-memory SQLite so
+# the MySQL drivers are not needed
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+
+def build_snapshots(days=30, items_per_day=12):
+    from app.models.trip import Trip, TripDay, TripPlace, TripFood, TripTransportation
+    from app.schemas.trip import TripCollaboratorInfo, TripOverviewResponse
+    from app.services.trip_service import TripService
+
+    service = TripService(db=None)
+    start = datetime(2026, 5, 1, 9)
+    trip = Trip(
+        id=1, user_id=1, title="30天环游", description="bench", departure_poi_id="B000A7BD6C",
+        departure_name="北京", destinations=["B000A83M61", "B000A8UIN8"], start_datetime=start,
+        end_datetime=start + timedelta(days=days - 1), start_timezone="Asia/Shanghai",
+        end_timezone="Asia/Shanghai", days=days, people_count=2, travel_mode=1, preferences=["美食"],
+        budget=Decimal("20000.00"), estimated_cost=Decimal("18888.50"), tags=["长途"], is_public=0,
+        status=0, generation_status=2, view_count=0, like_count=0, share_count=0,
+        weather_info={"summary": "晴"}, created_at=start, updated_at=start,
+    )
+    collaborators = [TripCollaboratorInfo(user_id=1, avatar_url="https://example.com/a.png", role="owner")]
+
+    day_models, day_details = [], []
+    for day_index in range(1, days + 1):
+        day = TripDay(
+            id=day_index, trip_id=1, day_index=day_index, date=date(2026, 5, 1) + timedelta(days=day_index - 1),
+            datetime=start, title=f"DAY {day_index}", city="杭州", weather_condition="sunny", temperature="18°-26°",
+            is_generated=1, place_count=items_per_day // 2, food_count=items_per_day // 4,
+            estimated_cost=Decimal("600.00"), start_point_name="酒店", start_point_time=time(8, 30),
+        )
+        places = [TripPlace(name=f"景点{i}", category="景点", visit_order=i + 1, start_time=time(9 + i, 0),
+                            price=Decimal("80.00"), latitude=Decimal("30.259244"), longitude=Decimal("120.215843"),
+                            duration=60, amap_poi_id=f"B0{i:08d}", images=["https://example.com/p.jpg"])
+                  for i in range(items_per_day // 2)]
+        foods = [TripFood(name=f"餐厅{i}", category="food", visit_order=i + 1, start_time=time(12 + i * 3, 0),
+                          price=Decimal("120.00"), amap_poi_id=f"B1{i:08d}", images=[])
+                 for i in range(items_per_day // 4)]
+        transportations = [TripTransportation(transport_order=i + 1, from_name=f"景点{i}", to_name=f"景点{i + 1}",
+                                              start_time=time(10 + i, 0), transportation_mode="walking",
+                                              distance=Decimal("1.20"), duration=15)
+                           for i in range(items_per_day // 4)]
+        day_models.append(day)
+        day_details.append(service._dump_snapshot(service._build_trip_day_detail(day, (places, foods, transportations))))
+
+    trip_info = service._build_trip_full_response(trip, collaborators)
+    overview = service._dump_snapshot(TripOverviewResponse(
+        trip_info=trip_info,
+        days_overview=[service._build_trip_day_overview_item(day, [{"name": "景点0", "image_url": None}]) for day in day_models]
+    ))
+    list_item = {
+        key: value for key, value in trip_info.model_dump().items()
+        if key not in ("departure", "destinations", "start_timezone", "end_timezone", "preferences",
+                       "overview", "generation_status", "view_count", "like_count", "share_count", "cover_image")
+    }
+    list_item.update(cover_image=None, weather_info=trip.weather_info, days_overview=overview["days_overview"])
+    trip_list = {"total": 20, "page": 1, "page_size": 20, "total_pages": 1, "has_next": False,
+                 "has_prev": False, "next_cursor": None, "trips": [dict(list_item, id=i) for i in range(20)]}
+    return overview, day_details[0], trip_list
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    from app.schemas.trip import TripDayDetailResponse, TripListResponse, TripOverviewResponse
+    from app.utils.response_util import FastJSONResponse
+
+    overview, day_detail, trip_list = build_snapshots()
+    cases = [
+        ("overview (30 days)", TripOverviewResponse, overview),
+        ("day detail", TripDayDetailResponse, day_detail),
+        ("list (20 trips, days)", TripListResponse, trip_list),
+    ]
+
+    loop = asyncio.new_event_loop()
+    print(f"{'response':<24} {'bytes':>8} {'before us':>10} {'after us':>9} {'speedup':>8}")
+    for name, model, payload in cases:
+        field = create_response_field(name=f"Response_{model.__name__}", type_=model)
+
+        def before():
+            content = loop.run_until_complete(serialize_response(
+                field=field, response_content=model.model_validate(payload)
+            ))
+            return JSONResponse(content).body
+
+        def after():
+            return FastJSONResponse(payload).body
+
+        assert orjson.loads(before()) == orjson.loads(after())
+        before_us = min(timeit.repeat(before, number=args.repeat, repeat=3)) / args.repeat * 1e6
+        after_us = min(timeit.repeat(after, number=args.repeat, repeat=3)) / args.repeat * 1e6
+        print(f"{name:<24} {len(after()):>8} {before_us:>10.1f} {after_us:>9.1f} {before_us / after_us:>7.1f}x")
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""测试公共夹具
+
+The services run against an in-memory SQLite database through the same async
+engine the app uses (``sqlite+aiosqlite``), and against an in-process stand-in for
+the Redis cache.
+"""
+import asyncio
+import json
+import os
+import threading
+
+# Must be set before app.core.config is imported
+os.environ["DATABASE_URL"] = "sqlite://"
+os.environ["DEBUG"] = "false"
+
+import pytest
+from sqlalchemy import BigInteger
+from sqlalchemy.ext.compiler import compiles
+
+from app.core.database import AsyncSessionLocal, Base, async_engine
+import app.models.location  # noqa: F401 (registers the tables)
+import app.models.trip  # noqa: F401
+from app.models.user import User
+
+
+@compiles(BigInteger, "sqlite")
+def _compile_big_integer(type_, compiler, **kw):
+    # SQLite only autoincrements INTEGER PRIMARY KEY columns
+    return "INTEGER"
+
+
+# MySQL index names are per table, SQLite ones are per database
+for _table in Base.metadata.tables.values():
+    for _index in _table.indexes:
+        if not _index.name.startswith(_table.name):
+            _index.name = f"{_table.name}_{_index.name}"
+
+
+class InMemoryCache:
+    """RedisCache stand-in; records the threads it is called from"""
+
+    def __init__(self):
+        self.data = {}
+        self.threads = set()
+
+    def _touch(self):
+        self.threads.add(threading.get_ident())
+
+    def get(self, key, default=None):
+        self._touch()
+        value = self.data.get(key)
+        return default if value is None else json.loads(value)
+
+    def mget(self, keys):
+        return [self.get(key) for key in keys]
+
+    def exists(self, key):
+        self._touch()
+        return key in self.data
+
+    def set(self, key, value, expire=None):
+        self._touch()
+        self.data[key] = json.dumps(value, default=str)
+        return True
+
+    def add(self, key, value, expire=None):
+        self._touch()
+        if key in self.data:
+            return False
+        self.data[key] = json.dumps(value, default=str)
+        return True
+
+    def incr(self, key, amount=1):
+        self._touch()
+        value = int(json.loads(self.data.get(key, "0"))) + amount
+        self.data[key] = json.dumps(value)
+        return value
+
+    def delete(self, *keys):
+        self._touch()
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def expire(self, key, time):
+        self._touch()
+        return key in self.data
+
+    def hget(self, name, key):
+        self._touch()
+        return self.hgetall(name).get(key)
+
+    def hset(self, name, key, value):
+        self._touch()
+        fields = self.hgetall(name)
+        fields[key] = value
+        self.data[name] = json.dumps(fields, default=str)
+        return True
+
+    def hgetall(self, name):
+        self._touch()
+        return json.loads(self.data.get(name, "{}"))
+
+
+# Modules that hold a reference to the global RedisCache
+CACHE_USERS = (
+    "app.services.amap_client",
+    "app.services.location_service",
+    "app.services.trip_service",
+    "app.services.weather_service",
+    "app.utils.singleflight",
+)
+
+
+@pytest.fixture
+def fake_cache(monkeypatch):
+    fake = InMemoryCache()
+    for module in CACHE_USERS:
+        monkeypatch.setattr(f"{module}.cache", fake)
+    return fake
+
+
+@pytest.fixture
+def run_in_db():
+    """run_in_db(scenario): runs ``await scenario(db, user)`` on a fresh schema in its own event loop"""
+    def run(scenario):
+        async def main():
+            async with async_engine.begin() as connection:
+                await connection.run_sync(Base.metadata.create_all)
+            try:
+                async with AsyncSessionLocal() as db:
+                    user = User(open_id="test-open-id", nickname="tester", avatar_url="https://example.com/a.png")
+                    db.add(user)
+                    await db.commit()
+                    return await scenario(db, user)
+            finally:
+                # Drops the in-memory database along with its only connection
+                await async_engine.dispose()
+        return asyncio.run(main())
+    return run
@@ -0,0 +1,179 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.core.exceptions import ServiceUnavailableError
+from app.services import amap_client
+from app.services.amap_client import AmapClient, CircuitBreaker, TokenBucket, is_stale
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(amap_client, "time", SimpleNamespace(monotonic=fake.monotonic))
+    return fake
+
+
+class TestTokenBucket:
+    def test_burst_then_wait(self, clock):
+        bucket = TokenBucket(rate=2, burst=2)
+        assert bucket.reserve(max_wait=1) == 0
+        assert bucket.reserve(max_wait=1) == 0
+        # Empty: the next token comes up in 1 / rate seconds
+        assert bucket.reserve(max_wait=1) == pytest.approx(0.5)
+
+    def test_refuses_beyond_max_wait_without_taking_a_token(self, clock):
+        bucket = TokenBucket(rate=1, burst=1)
+        bucket.reserve(max_wait=0)
+        assert bucket.reserve(max_wait=0.5) is None
+        assert bucket.available() == pytest.approx(0)
+
+    def test_refills_over_time_up_to_burst(self, clock):
+        bucket = TokenBucket(rate=1, burst=3)
+        for _ in range(3):
+            bucket.reserve(max_wait=0)
+        clock.now += 2
+        assert bucket.available() == pytest.approx(2)
+        clock.now += 10
+        assert bucket.available() == pytest.approx(3)
+
+    def test_refund(self, clock):
+        bucket = TokenBucket(rate=1, burst=1)
+        bucket.reserve(max_wait=0)
+        bucket.refund()
+        assert bucket.reserve(max_wait=0) == 0
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures(self, clock):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+        for _ in range(2):
+            breaker.record_failure()
+        assert breaker.state == "closed"
+        breaker.record_failure()
+        assert breaker.state == "open"
+        assert not breaker.allow()
+
+    def test_success_resets_the_count(self, clock):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state == "closed"
+
+    def test_half_open_lets_one_probe_through(self, clock):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        breaker.record_failure()
+        clock.now += 30
+        assert breaker.state == "half-open"
+        assert breaker.allow()
+        assert not breaker.allow()
+
+        breaker.record_success()
+        assert breaker.state == "closed"
+        assert breaker.allow()
+
+    def test_failed_probe_reopens(self, clock):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        breaker.record_failure()
+        clock.now += 30
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == "open"
+        clock.now += 29
+        assert not breaker.allow()
+
+    def test_lost_probe_frees_its_slot(self, clock):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        breaker.record_failure()
+        clock.now += 30
+        assert breaker.allow()
+        # The probe never reports back
+        clock.now += 30
+        assert breaker.allow()
+
+
+class FakeUpstream:
+    """Answers AMap calls from a list of (status_code, json) responses, the last one repeating"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def handler(self, request):
+        status_code, body = self.responses[min(self.calls, len(self.responses) - 1)]
+        self.calls += 1
+        return httpx.Response(status_code, json=body)
+
+
+OK = (200, {"status": "1", "infocode": "10000", "pois": []})
+SERVER_ERROR = (500, {})
+
+
+@pytest.fixture
+def upstream_settings(monkeypatch, clock, fake_cache):
+    monkeypatch.setattr(settings, "AMAP_MAX_RETRIES", 2)
+    monkeypatch.setattr(settings, "AMAP_RETRY_BACKOFF", 0)
+    monkeypatch.setattr(settings, "AMAP_RATE_LIMIT_REDIS", False)
+    monkeypatch.setattr(amap_client, "_local_bucket", TokenBucket(rate=1000, burst=1000))
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    monkeypatch.setattr(amap_client, "_breaker", breaker)
+    return breaker
+
+
+def _get(upstream, path="/place/text", params=None):
+    async def call():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(upstream.handler)) as http_client:
+            return await AmapClient(http_client).get(path, params or {"keywords": "西湖"})
+    return asyncio.run(call())
+
+
+class TestAmapClient:
+    def test_retries_are_not_counted_as_failures(self, upstream_settings):
+        upstream = FakeUpstream(SERVER_ERROR, SERVER_ERROR, OK)
+        assert _get(upstream)["status"] == "1"
+        assert upstream.calls == 3
+        assert upstream_settings.failures == 0
+
+    def test_one_failure_per_call_once_retries_are_spent(self, upstream_settings, fake_cache):
+        upstream = FakeUpstream(SERVER_ERROR)
+        with pytest.raises(ServiceUnavailableError):
+            _get(upstream)
+        assert upstream.calls == 3
+        assert upstream_settings.failures == 1
+        assert upstream_settings.state == "closed"
+
+    def test_open_circuit_serves_the_stale_copy(self, upstream_settings, fake_cache):
+        assert not is_stale(_get(FakeUpstream(OK)))
+
+        upstream = FakeUpstream(SERVER_ERROR)
+        for _ in range(2):
+            stale = _get(upstream)
+            assert is_stale(stale)
+        assert upstream_settings.state == "open"
+
+        calls = upstream.calls
+        assert is_stale(_get(upstream))
+        assert upstream.calls == calls
+
+        # Redis is a blocking client: never called on the event loop thread
+        assert threading.get_ident() not in fake_cache.threads
+
+    def test_quota_exceeded_is_not_retried(self, upstream_settings, fake_cache):
+        upstream = FakeUpstream((200, {"status": "0", "info": "DAILY_QUERY_OVER_LIMIT", "infocode": "10003"}))
+        with pytest.raises(ServiceUnavailableError):
+            _get(upstream)
+        assert upstream.calls == 1
+        assert upstream_settings.failures == 1
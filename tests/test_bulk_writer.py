@@ -0,0 +1,139 @@
+import asyncio
+import logging
+
+import pytest
+from sqlalchemy import func, select
+
+from app.models.location import Location, LocationSearchLog
+from app.utils import bulk_writer
+from app.utils.bulk_writer import BulkCounter, BulkWriter
+from app.utils.metrics import Metrics
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    fresh = Metrics()
+    monkeypatch.setattr(bulk_writer, "metrics", fresh)
+    return fresh
+
+
+def _log(keyword="西湖"):
+    return {"keyword": keyword, "city": "杭州", "search_type": "keyword", "result_count": 1}
+
+
+async def _logged(db):
+    return await db.scalar(select(func.count()).select_from(LocationSearchLog))
+
+
+async def _until(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_flushes_when_a_batch_is_full(run_in_db, metrics):
+    async def scenario(db, user):
+        writer = BulkWriter(LocationSearchLog, "log", batch_size=3, flush_interval=60)
+        writer.start()
+        for _ in range(3):
+            writer.record(_log())
+        await _until(lambda: metrics.get("log.written") == 3)
+        assert await _logged(db) == 3
+
+        # Below batch_size and long before the interval: stays buffered
+        writer.record(_log())
+        await asyncio.sleep(0.05)
+        assert len(writer) == 1 and metrics.get("log.pending") == 1
+        await writer.stop()
+        assert metrics.get("log.written") == 4
+
+    run_in_db(scenario)
+
+
+def test_flushes_on_the_interval(run_in_db, metrics):
+    async def scenario(db, user):
+        writer = BulkWriter(LocationSearchLog, "log", batch_size=100, flush_interval=0.05)
+        writer.start()
+        writer.record(_log())
+        writer.record(_log())
+        await _until(lambda: metrics.get("log.written") == 2)
+        assert len(writer) == 0
+        assert await _logged(db) == 2
+        await writer.stop()
+
+    run_in_db(scenario)
+
+
+def test_drops_rows_when_the_buffer_is_full(run_in_db, metrics):
+    async def scenario(db, user):
+        writer = BulkWriter(LocationSearchLog, "log", batch_size=10, max_pending=2)
+        assert writer.record(_log("a")) and writer.record(_log("b"))
+        assert not writer.record(_log("c"))
+        assert len(writer) == 2
+        assert metrics.get("log.recorded") == 2 and metrics.get("log.dropped") == 1
+
+        # Never started: stop still writes out the buffer
+        await writer.stop()
+        keywords = (await db.scalars(select(LocationSearchLog.keyword))).all()
+        assert sorted(keywords) == ["a", "b"]
+
+    run_in_db(scenario)
+
+
+def test_stop_writes_the_rest_in_batches(run_in_db, metrics):
+    async def scenario(db, user):
+        writer = BulkWriter(LocationSearchLog, "log", batch_size=2, flush_interval=60)
+        for _ in range(5):
+            writer.record(_log())
+        writer.start()
+        await writer.stop()
+        assert len(writer) == 0
+        assert await _logged(db) == 5
+        assert writer._task is None
+
+    run_in_db(scenario)
+
+
+def test_failed_batch_is_counted_and_dropped(run_in_db, metrics, caplog):
+    async def scenario(db, user):
+        writer = BulkWriter(LocationSearchLog, "log", batch_size=2)
+        writer.record(_log())
+        writer.record({"keyword": None})  # NOT NULL: the whole batch fails
+        writer.record(_log())
+        with caplog.at_level(logging.WARNING, logger=bulk_writer.__name__):
+            await writer.flush()
+        assert metrics.get("log.failed") == 2 and metrics.get("log.written") == 1
+        assert len(writer) == 0
+        assert await _logged(db) == 1
+        assert len(caplog.records) == 1
+
+    run_in_db(scenario)
+
+
+def test_counter_sums_increments_per_key(run_in_db, metrics):
+    async def scenario(db, user):
+        db.add_all([
+            Location(amap_poi_id=poi_id, name=poi_id, search_count=count)
+            for poi_id, count in (("B1", 10), ("B2", 0), ("B3", 5))
+        ])
+        await db.commit()
+
+        counter = BulkCounter(
+            Location.__table__.c.search_count, Location.__table__.c.amap_poi_id, "count", batch_size=2, max_pending=3
+        )
+        counter.record("B1")
+        counter.record("B1", 2)
+        counter.record("B2")
+        counter.record("missing")  # No such row: ignored on flush
+        assert len(counter) == 3
+        assert not counter.record("B3")
+        assert counter.record("B2")  # Already buffered keys still count when full
+        assert metrics.get("count.dropped") == 1
+
+        await counter.stop()
+        counts = dict((await db.execute(select(Location.amap_poi_id, Location.search_count))).all())
+        assert counts == {"B1": 13, "B2": 2, "B3": 5}
+        assert metrics.get("count.written") == 3
+
+    run_in_db(scenario)
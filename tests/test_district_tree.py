@@ -0,0 +1,136 @@
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services.district_service import DistrictService
+from app.services.district_tree import DistrictTree
+
+
+def _district(adcode, name, level, *children, center="120.15,30.28", citycode=[]):
+    return {"adcode": adcode, "name": name, "level": level, "center": center, "citycode": citycode,
+            "districts": list(children)}
+
+
+AMAP_DISTRICTS = {"status": "1", "districts": [_district(
+    "100000", "中华人民共和国", "country",
+    _district("330000", "浙江省", "province",
+              _district("330100", "杭州市", "city",
+                        _district("330106", "西湖区", "district", citycode="0571"),
+                        _district("330102", "上城区", "district", center=[], citycode="0571"),
+                        citycode="0571")),
+    _district("110000", "北京市", "province",
+              _district("110100", "北京城区", "city",
+                        _district("110101", "东城区", "district", citycode="010"),
+                        citycode="010")),
+    _district("440000", "广东省", "province",
+              _district("441900", "东莞市", "city",
+                        _district("441900", "东城街道", "street"),
+                        citycode="0769")),
+)]}
+
+
+def _tree():
+    return DistrictTree.from_amap(AMAP_DISTRICTS)
+
+
+def _names(tree, nodes):
+    return [tree.names[node] for node in nodes]
+
+
+def test_builds_from_amap():
+    tree = _tree()
+    assert len(tree) == 10  # Streets are skipped
+    assert _names(tree, tree.roots()) == ["浙江省", "北京市", "广东省"]
+    assert _names(tree, tree.children[tree.find("330100")]) == ["西湖区", "上城区"]
+    assert tree.node(tree.find("330102")) == {
+        "adcode": "330102", "name": "上城区", "level": "district", "center": None, "citycode": "0571",
+    }
+    # 东莞市's streets repeat its adcode; the city keeps it
+    assert tree.names[tree.find("441900")] == "东莞市"
+    assert tree.find("999999") is None
+
+
+def test_ancestors():
+    tree = _tree()
+    assert _names(tree, tree.ancestors(tree.find("330106"))) == ["浙江省", "杭州市", "西湖区"]
+    assert _names(tree, tree.ancestors(tree.find("330000"))) == ["浙江省"]
+    # The municipality's adcode resolves to the province, not to 北京城区
+    assert _names(tree, tree.ancestors(tree.find("110000"))) == ["北京市"]
+    assert _names(tree, tree.ancestors(tree.find("110101"))) == ["北京市", "北京城区", "东城区"]
+
+
+def test_prefix_search():
+    tree = _tree()
+    assert _names(tree, tree.search("西湖")) == ["西湖区"]
+    assert _names(tree, tree.search("hangzhou")) == ["杭州市"]
+    assert _names(tree, tree.search("zj")) == ["浙江省"]
+    # Higher levels first, then shorter names
+    assert _names(tree, tree.search("dong")) == ["东莞市", "东城区"]
+    assert _names(tree, tree.search("bj")) == ["北京市", "北京城区"]
+    assert _names(tree, tree.search("bj", level="city")) == ["北京城区"]
+    assert _names(tree, tree.search("d", limit=1)) == ["东莞市"]
+    assert tree.search("") == [] and tree.search("xyz") == []
+
+
+def test_snapshot_round_trip():
+    tree = _tree()
+    loaded = DistrictTree.from_snapshot(json.loads(json.dumps(tree.to_snapshot(), ensure_ascii=False)))
+    assert loaded.to_snapshot() == tree.to_snapshot()
+    assert _names(loaded, loaded.ancestors(loaded.find("330106"))) == ["浙江省", "杭州市", "西湖区"]
+    assert _names(loaded, loaded.search("xh")) == ["西湖区"]
+    assert loaded.children == tree.children
+
+
+class FakeAmap:
+    def __init__(self, response=None):
+        self.response = response
+        self.calls = 0
+
+    async def get(self, path, params, stale=True):
+        self.calls += 1
+        if self.response is None:
+            raise RuntimeError("AMap down")
+        return self.response
+
+
+@pytest.fixture
+def snapshot_path(tmp_path, monkeypatch):
+    path = tmp_path / "data" / "districts.json"
+    monkeypatch.setattr(settings, "DISTRICT_SNAPSHOT_PATH", str(path))
+    return path
+
+
+def _load(amap):
+    service = DistrictService()
+    service.amap = amap
+    return asyncio.run(service._load_tree())
+
+
+def test_fetches_and_saves_the_snapshot(snapshot_path):
+    amap = FakeAmap(AMAP_DISTRICTS)
+    tree = _load(amap)
+    assert amap.calls == 1
+    assert json.loads(snapshot_path.read_text(encoding="utf-8")) == tree.to_snapshot()
+    assert os.listdir(snapshot_path.parent) == ["districts.json"]  # No temp file left behind
+
+    # A fresh snapshot is loaded without calling AMap
+    assert _load(amap).to_snapshot() == tree.to_snapshot()
+    assert amap.calls == 1
+
+
+def test_stale_snapshot_is_kept_when_amap_fails(snapshot_path, monkeypatch):
+    _load(FakeAmap(AMAP_DISTRICTS))
+    stale = time.time() - (settings.DISTRICT_SNAPSHOT_MAX_AGE_DAYS + 1) * 86400
+    os.utime(snapshot_path, (stale, stale))
+
+    amap = FakeAmap()
+    assert len(_load(amap)) == 10
+    assert amap.calls == 1
+
+    snapshot_path.unlink()
+    with pytest.raises(RuntimeError):
+        _load(amap)
@@ -0,0 +1,83 @@
+from datetime import date, datetime
+
+import pytz
+
+from app.services.forecast_engine import daily_forecasts
+
+
+def _slot(utc_hour, day=1, temp_min=20.0, temp_max=25.0, condition="晴", icon="01d", pop=0.0,
+          humidity=60, wind=3.0, dt_txt_only=False):
+    moment = datetime(2026, 5, day, utc_hour, tzinfo=pytz.utc)
+    main = {"temp_min": temp_min, "temp_max": temp_max}
+    if humidity is not None:
+        main["humidity"] = humidity
+    slot = {
+        "dt": int(moment.timestamp()),
+        "dt_txt": moment.strftime("%Y-%m-%d %H:%M:%S"),
+        "main": main,
+        "weather": [{"description": condition, "icon": icon}],
+        "wind": {"speed": wind} if wind is not None else {},
+        "pop": pop,
+    }
+    if dt_txt_only:
+        del slot["dt"]
+    return slot
+
+
+def test_slots_are_bucketed_by_local_date():
+    # 15:00 UTC is 23:00 in Shanghai, 16:00 UTC is already the next day there
+    slots = [_slot(15), _slot(16)]
+    assert set(daily_forecasts(slots, "Asia/Shanghai")) == {date(2026, 5, 1), date(2026, 5, 2)}
+    assert set(daily_forecasts(slots, "UTC")) == {date(2026, 5, 1)}
+    # New York is behind UTC: both are still 1 May there
+    assert set(daily_forecasts(slots, "America/New_York")) == {date(2026, 5, 1)}
+
+
+def test_unknown_timezone_falls_back_to_shanghai():
+    assert set(daily_forecasts([_slot(16)], "Mars/Olympus")) == {date(2026, 5, 2)}
+
+
+def test_slots_cached_without_dt_use_dt_txt():
+    slots = [_slot(15, dt_txt_only=True), _slot(16, dt_txt_only=True)]
+    assert set(daily_forecasts(slots)) == {date(2026, 5, 1), date(2026, 5, 2)}
+
+
+def test_daily_aggregates():
+    slots = [
+        _slot(0, temp_min=18.4, temp_max=21.0, pop=0.2, humidity=50, wind=2.0),
+        _slot(3, temp_min=20.0, temp_max=27.9, pop=0.75, humidity=70, wind=4.0),
+        _slot(6, temp_min=19.0, temp_max=24.0, pop=0.1, humidity=None, wind=None),
+    ]
+    weather = daily_forecasts(slots, "UTC")[date(2026, 5, 1)]
+    assert weather.temperature == "18°-27°"
+    assert weather.precipitation == "75%"
+    # Slots without a value are left out of the average, not counted as 0
+    assert weather.humidity == "60%"
+    assert weather.wind == "3.0m/s"
+
+
+def test_missing_values_are_left_empty():
+    weather = daily_forecasts([_slot(0, humidity=None, wind=None)], "UTC")[date(2026, 5, 1)]
+    assert weather.humidity is None
+    assert weather.wind is None
+
+    slot = _slot(0)
+    slot["main"] = {}
+    assert daily_forecasts([slot], "UTC")[date(2026, 5, 1)].temperature is None
+
+
+def test_most_frequent_condition_daytime_wins_ties():
+    slots = [
+        _slot(0, condition="小雨", icon="10n"),
+        _slot(3, condition="小雨", icon="10n"),
+        _slot(6, condition="晴", icon="01d"),
+        _slot(9, condition="晴", icon="01n"),
+        _slot(12, condition="多云", icon="03d"),
+    ]
+    weather = daily_forecasts(slots, "UTC")[date(2026, 5, 1)]
+    assert weather.condition == "晴"
+    assert weather.icon == "01d"
+
+    weather = daily_forecasts(slots[:2], "UTC")[date(2026, 5, 1)]
+    assert weather.condition == "小雨"
+    assert weather.icon == "10d"  # Day icon of the condition
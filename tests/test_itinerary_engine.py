@@ -0,0 +1,74 @@
+from datetime import time
+from types import SimpleNamespace
+
+from app.services.itinerary_engine import SECONDS_PER_DAY, UNTIMED, merge_timelines, time_to_seconds, timeline
+
+
+def _rows(*start_times, order_attr="visit_order"):
+    return [
+        SimpleNamespace(name=f"r{order}", start_time=start_time, **{order_attr: order})
+        for order, start_time in enumerate(start_times, 1)
+    ]
+
+
+def _names(entries):
+    return [row.name for _, _, row in entries]
+
+
+def test_time_to_seconds():
+    assert time_to_seconds(time(0, 0)) == 0
+    assert time_to_seconds(time(9, 30, 15)) == 9 * 3600 + 30 * 60 + 15
+
+
+def test_stream_follows_its_order_not_its_times():
+    rows = _rows(time(9), time(11), time(10))
+    entries = timeline(reversed(rows), "place", "visit_order")
+    # Order 3 at 10:00 comes after 11:00: the stream is taken to cross midnight
+    assert _names(entries) == ["r1", "r2", "r3"]
+    assert [key for key, _, _ in entries] == [9 * 3600, 11 * 3600, SECONDS_PER_DAY + 10 * 3600]
+
+
+def test_crossing_midnight():
+    entries = timeline(_rows(time(22), time(23, 30), time(0, 30), time(2)), "place", "visit_order")
+    keys = [key for key, _, _ in entries]
+    assert keys == sorted(keys)
+    assert keys[2] == SECONDS_PER_DAY + 30 * 60
+
+
+def test_untimed_rows_take_their_predecessors_key():
+    entries = timeline(_rows(None, time(9), None, time(10)), "place", "visit_order")
+    assert [key for key, _, _ in entries] == [9 * 3600, 9 * 3600, 9 * 3600, 10 * 3600]
+
+    entries = timeline(_rows(None, None), "place", "visit_order")
+    assert [key for key, _, _ in entries] == [UNTIMED, UNTIMED]
+
+
+def test_merge_orders_by_time_and_keeps_stream_order_on_ties():
+    places = timeline(_rows(time(9), time(14)), "place", "visit_order")
+    foods = timeline(_rows(time(12), time(14)), "food", "visit_order")
+    transports = timeline(_rows(time(8, 30), time(12), order_attr="transport_order"), "transport", "transport_order")
+
+    merged = [(tag, row.name) for _, tag, row in merge_timelines(places, foods, transports)]
+    assert merged == [
+        ("transport", "r1"),
+        ("place", "r1"),
+        # 12:00 tie: foods are passed before transports
+        ("food", "r1"),
+        ("transport", "r2"),
+        # 14:00 tie: places before foods
+        ("place", "r2"),
+        ("food", "r2"),
+    ]
+
+
+def test_untimed_stream_goes_last():
+    places = timeline(_rows(None), "place", "visit_order")
+    foods = timeline(_rows(time(23, 59)), "food", "visit_order")
+    assert [tag for _, tag, _ in merge_timelines(places, foods)] == ["food", "place"]
+
+
+def test_merge_after_midnight_sorts_after_the_evening():
+    places = timeline(_rows(time(21), time(1)), "place", "visit_order")
+    foods = timeline(_rows(time(23)), "food", "visit_order")
+    merged = [(tag, row.name) for _, tag, row in merge_timelines(places, foods)]
+    assert merged == [("place", "r1"), ("food", "r1"), ("place", "r2")]
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.services import amap_client, location_service
+from app.services.amap_client import CircuitBreaker, TokenBucket
+from app.services.location_service import LocationService
+
+
+class FakeAmap:
+    """AMap stand-in answering by path; counts calls per path"""
+
+    def __init__(self, **responses):
+        self.responses = responses
+        self.calls = {}
+
+    def handler(self, request):
+        path = request.url.path.rsplit("/v3", 1)[-1]
+        self.calls[path] = self.calls.get(path, 0) + 1
+        return httpx.Response(200, json=self.responses[path])
+
+
+DETAIL = {
+    "status": "1", "infocode": "10000",
+    "pois": [{"id": "B000A8UIN8", "name": "西湖", "type": "风景名胜", "location": "120.14,30.25", "cityname": "杭州市"}],
+}
+SEARCH = {"status": "1", "infocode": "10000", "count": "1", "pois": DETAIL["pois"]}
+
+
+@pytest.fixture
+def amap(monkeypatch, fake_cache):
+    monkeypatch.setattr(settings, "AMAP_RATE_LIMIT_REDIS", False)
+    monkeypatch.setattr(settings, "LOCATION_PREFETCH_ENABLED", False)
+    monkeypatch.setattr(amap_client, "_local_bucket", TokenBucket(rate=1000, burst=1000))
+    monkeypatch.setattr(amap_client, "_breaker", CircuitBreaker(5, 30))
+    location_service._detail_lru.clear()
+    yield FakeAmap(**{"/place/detail": DETAIL, "/place/text": SEARCH})
+    location_service._detail_lru.clear()
+
+
+def _run(amap, scenario):
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(amap.handler)) as http_client:
+            return await scenario(LocationService(http_client))
+    return asyncio.run(main())
+
+
+def test_detail_read_through(amap, fake_cache):
+    async def scenario(service):
+        first = await service.get_location_detail("B000A8UIN8")
+        assert (await service.get_location_detail("B000A8UIN8")) == first  # Process LRU
+        location_service._detail_lru.clear()
+        assert (await service.get_location_detail("B000A8UIN8")) == first  # Redis
+        assert (await service.get_location_details(["B000A8UIN8", "B000A8UIN8"])) == {"B000A8UIN8": first}
+        return first
+
+    detail = _run(amap, scenario)
+    assert detail.name == "西湖"
+    assert amap.calls == {"/place/detail": 1}
+    assert threading.get_ident() not in fake_cache.threads
+
+
+def test_search_is_cached(amap, fake_cache):
+    async def scenario(service):
+        first = await service.search_locations("西湖", "杭州")
+        assert (await service.search_locations("西湖", "杭州")) == first
+        return first
+
+    assert _run(amap, scenario).total == 1
+    assert amap.calls == {"/place/text": 1}
+    assert threading.get_ident() not in fake_cache.threads
+
+
+AROUND = {"status": "1", "infocode": "10000", "count": "1", "pois": [dict(DETAIL["pois"][0], distance="10", typecode="110202")]}
+POLYGON = {"status": "1", "infocode": "10000", "count": "0", "pois": []}
+
+
+@pytest.mark.parametrize("enabled, radius, fills", [(False, 1000, 0), (True, 1000, 4), (True, 50000, 0)])
+def test_around_grid_fills(amap, monkeypatch, enabled, radius, fills):
+    monkeypatch.setattr(settings, "SPATIAL_INDEX_ENABLED", enabled)
+    monkeypatch.setattr(location_service, "spatial_index", location_service.SpatialIndex(cell_deg=0.01))
+    amap.responses.update({"/place/around": AROUND, "/place/polygon": POLYGON})
+
+    async def scenario(service):
+        result = await service.search_around("120.14,30.25", radius, "景点")
+        await asyncio.gather(*location_service._background_tasks)
+        return result
+
+    assert _run(amap, scenario).total == 1
+    assert amap.calls.get("/place/polygon", 0) == fills
+
+
+def test_local_suggestions_honour_limit(amap, monkeypatch):
+    index = location_service.SuggestIndex(top_k=20)
+    index.load([
+        location_service._location_entry(f"B{i}", f"西湖{i}号", "杭州市", None, None, None, i) for i in range(15)
+    ])
+    monkeypatch.setattr(location_service, "suggest_index", index)
+    monkeypatch.setattr(settings, "SUGGEST_ENABLED", True)
+
+    async def scenario(service):
+        return await service.suggest("xh", "杭州", limit=12)
+
+    suggestions = _run(amap, scenario).suggestions
+    assert [suggestion.id for suggestion in suggestions] == [f"B{i}" for i in range(14, 2, -1)]
+    assert amap.calls == {}
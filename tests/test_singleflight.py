@@ -0,0 +1,116 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.utils.cache import CacheKeys
+from app.utils.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_upstream_call():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def main():
+        flight = SingleFlight("test")
+        results = await asyncio.gather(*[flight.do("key", fetch) for _ in range(5)])
+        assert flight.in_flight() == 0
+        return results
+
+    assert asyncio.run(main()) == ["result"] * 5
+    assert len(calls) == 1
+
+
+def test_different_keys_do_not_coalesce():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0)
+        return len(calls)
+
+    async def main():
+        flight = SingleFlight("test")
+        return await asyncio.gather(flight.do("a", fetch), flight.do("b", fetch))
+
+    asyncio.run(main())
+    assert len(calls) == 2
+
+
+def test_error_reaches_every_caller_and_is_not_cached():
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream down")
+
+    async def main():
+        flight = SingleFlight("test")
+        results = await asyncio.gather(*[flight.do("key", failing) for _ in range(3)], return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        # The failure is forgotten: the next caller tries again
+        with pytest.raises(ValueError):
+            await flight.do("key", failing)
+
+    asyncio.run(main())
+    assert len(calls) == 2
+
+
+def test_cancelled_caller_does_not_cancel_the_call():
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def main():
+        flight = SingleFlight("test")
+        first = asyncio.create_task(flight.do("key", fetch))
+        second = asyncio.create_task(flight.do("key", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "result"
+
+
+def test_waits_for_the_result_of_the_worker_holding_the_lock(fake_cache):
+    lock_key = CacheKeys.SINGLEFLIGHT_LOCK.format(key="key")
+    fake_cache.add(lock_key, "other-worker")
+    fake_cache.threads.clear()
+
+    async def fetch():
+        raise AssertionError("the lock holder fetches, not this worker")
+
+    async def main():
+        flight = SingleFlight("test", distributed=True, lock_ttl=2, poll_interval=0.01)
+        waiter = asyncio.create_task(flight.do("key", fetch, lambda: fake_cache.get("result")))
+        await asyncio.sleep(0.05)
+        await asyncio.to_thread(fake_cache.set, "result", "from the other worker")
+        return await waiter
+
+    assert asyncio.run(main()) == "from the other worker"
+    # The polls are blocking Redis calls: never on the event loop thread
+    assert threading.get_ident() not in fake_cache.threads
+
+
+def test_calls_upstream_when_the_lock_is_released_without_a_result(fake_cache):
+    lock_key = CacheKeys.SINGLEFLIGHT_LOCK.format(key="key")
+    fake_cache.add(lock_key, "other-worker")
+
+    async def fetch():
+        return "fetched here"
+
+    async def main():
+        flight = SingleFlight("test", distributed=True, lock_ttl=2, poll_interval=0.01)
+        waiter = asyncio.create_task(flight.do("key", fetch, lambda: fake_cache.get("result")))
+        await asyncio.sleep(0.05)
+        fake_cache.delete(lock_key)
+        return await waiter
+
+    assert asyncio.run(main()) == "fetched here"
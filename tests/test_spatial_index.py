@@ -0,0 +1,91 @@
+import pytest
+
+from app.services import spatial_index as spatial_index_module
+from app.services.spatial_index import ALL_CATEGORIES, SpatialIndex, category_of
+from app.utils.helpers import calculate_distance
+
+CENTER = (120.1551, 30.2741)  # lng, lat
+SCENIC, FOOD = 11, 5
+
+
+def _index(**kwargs) -> SpatialIndex:
+    index = SpatialIndex(cell_deg=0.01, **kwargs)
+    # A line of POIs heading east, 100 m apart, alternating categories
+    for i in range(20):
+        lng = CENTER[0] + i * 0.00104
+        index.upsert(f"P{i}", lng, CENTER[1], SCENIC if i % 2 == 0 else FOOD, {"id": f"P{i}"})
+    return index
+
+
+def _cover(index: SpatialIndex, radius: float, category: int = ALL_CATEGORIES):
+    index.mark_covered(index.cells_for_circle(*CENTER, radius), category)
+
+
+def test_category_of():
+    assert category_of("110202|110200") == 11
+    assert category_of("050000") == 5
+    assert category_of("") == ALL_CATEGORIES
+    assert category_of("abc") == ALL_CATEGORIES
+
+
+def test_uncovered_circle_is_not_answered():
+    index = _index()
+    assert index.search(*CENTER, 500) is None
+    assert index.uncovered_cells(*CENTER, 500) == index.cells_for_circle(*CENTER, 500)
+
+
+def test_partly_covered_circle_is_not_answered():
+    index = _index()
+    _cover(index, 500)
+    assert index.search(*CENTER, 500) is not None
+    assert index.search(*CENTER, 3000) is None
+
+
+def test_coverage_is_per_category():
+    index = _index()
+    _cover(index, 1000, SCENIC)
+    assert index.search(*CENTER, 1000, SCENIC) is not None
+    assert index.search(*CENTER, 1000, FOOD) is None
+    # Covered for every category covers each one
+    _cover(index, 1000)
+    assert index.search(*CENTER, 1000, FOOD) is not None
+
+
+def test_coverage_expires(monkeypatch):
+    index = _index(max_age=60)
+    _cover(index, 500)
+    now = spatial_index_module.time.time()
+    monkeypatch.setattr(spatial_index_module.time, "time", lambda: now + 61)
+    assert index.search(*CENTER, 500) is None
+
+
+def test_results_sorted_by_distance_within_radius():
+    index = _index()
+    _cover(index, 950)
+    total, hits = index.search(*CENTER, 950, limit=50)
+    assert total == 10  # 0 m .. 900 m
+    assert [item["id"] for _, item in hits] == [f"P{i}" for i in range(10)]
+    distances = [distance for distance, _ in hits]
+    assert distances == sorted(distances)
+    assert distances[3] == pytest.approx(calculate_distance(CENTER[1], CENTER[0], CENTER[1], CENTER[0] + 3 * 0.00104), abs=1)
+
+
+def test_category_filter_and_paging():
+    index = _index()
+    _cover(index, 2000, SCENIC)
+    total, first_page = index.search(*CENTER, 2000, SCENIC, offset=0, limit=3)
+    total_again, second_page = index.search(*CENTER, 2000, SCENIC, offset=3, limit=3)
+    assert total == total_again == 10
+    assert [item["id"] for _, item in first_page + second_page] == ["P0", "P2", "P4", "P6", "P8", "P10"]
+
+
+def test_upsert_moves_and_updates_points():
+    index = _index()
+    # Moves P0 far away: it leaves its cell
+    index.upsert("P0", CENTER[0] + 1, CENTER[1], SCENIC, {"id": "P0", "moved": True})
+    index.upsert("P1", CENTER[0] + 0.00104, CENTER[1], FOOD, {"id": "P1", "name": "updated"})
+    _cover(index, 250)
+    assert len(index) == 20
+    total, hits = index.search(*CENTER, 250)
+    assert [item for _, item in hits] == [{"id": "P1", "name": "updated"}, {"id": "P2"}]
+    assert index.count(*CENTER, 250) == total == 2
@@ -0,0 +1,88 @@
+from app.services.suggest_index import SuggestEntry, SuggestIndex, index_keys, normalize_city
+
+
+def _entry(entry_id, name, city="杭州市", score=0):
+    return SuggestEntry(entry_id, name, "poi", score, poi_id=entry_id, city=city)
+
+
+def _names(entries):
+    return [entry.name for entry in entries]
+
+
+def _index(scan_limit=2000):
+    index = SuggestIndex(top_k=5, scan_limit=scan_limit)
+    index.load([
+        _entry("B1", "西湖", score=50),
+        _entry("B2", "西溪湿地", score=30),
+        _entry("B3", "西湖银泰", score=10),
+        _entry("B4", "外滩", city="上海市", score=40),
+        _entry("B5", "西塘古镇", city="嘉兴市", score=20),
+    ])
+    return index
+
+
+def test_index_keys():
+    assert index_keys("西湖") == ["西湖", "xihu", "xh"]
+    assert index_keys("K11 购物艺术中心")[:2] == ["k11购物艺术中心", "k11gouwuyishuzhongxin"]
+    assert normalize_city("杭州市") == normalize_city("杭州") == "杭州"
+
+
+def test_matches_name_pinyin_and_initials():
+    index = _index()
+    assert _names(index.search("西湖")) == ["西湖", "西湖银泰"]
+    assert _names(index.search("xihu")) == ["西湖", "西湖银泰"]
+    assert _names(index.search("XH")) == ["西湖", "西湖银泰"]
+    assert _names(index.search("xx")) == ["西溪湿地"]
+
+
+def test_ranked_by_score_and_limited():
+    index = _index()
+    assert _names(index.search("x")) == ["西湖", "西溪湿地", "西塘古镇", "西湖银泰"]
+    assert _names(index.search("x", limit=2)) == ["西湖", "西溪湿地"]
+
+
+def test_city_scope():
+    index = _index()
+    assert _names(index.search("x", "杭州")) == ["西湖", "西溪湿地", "西湖银泰"]
+    assert _names(index.search("x", "嘉兴市")) == ["西塘古镇"]
+    assert index.search("x", "北京") == []
+
+
+def test_upsert_patches_cached_top():
+    index = _index(scan_limit=2)
+    assert _names(index.search("x", limit=2)) == ["西湖", "西溪湿地"]
+    assert "x" in index._top_cache
+
+    index.upsert(_entry("B6", "西泠印社", score=60))
+    assert "x" in index._top_cache  # Patched in place, not dropped
+    assert _names(index.search("x", limit=2)) == ["西泠印社", "西湖"]
+    assert _names(index.search("xlys")) == ["西泠印社"]
+
+
+def test_add_score_patches_or_drops_cached_top():
+    index = _index(scan_limit=2)
+    index.search("x")
+
+    assert index.add_score("B3", 100)
+    assert "x" in index._top_cache
+    assert _names(index.search("x", limit=1)) == ["西湖银泰"]
+
+    assert index.add_score("B3", -200)
+    assert "x" not in index._top_cache
+    assert _names(index.search("x"))[-1] == "西湖银泰"
+    assert not index.add_score("missing", 1)
+
+
+def test_remove_and_rename():
+    index = _index(scan_limit=2)
+    index.search("x")
+
+    index.remove("B1")
+    assert "x" not in index._top_cache
+    assert _names(index.search("xh")) == ["西湖银泰"]
+
+    # Renaming re-indexes the entry under its new keys
+    index.upsert(_entry("B3", "湖滨银泰", score=10))
+    assert index.search("xh") == []
+    assert _names(index.search("hb")) == ["湖滨银泰"]
+    assert len(index) == 4
@@ -0,0 +1,141 @@
+import re
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import event
+
+from app.core.database import async_engine
+from app.schemas.trip import TripCreate, TripDayUpdate, TripDayUpdateItineraryItem
+from app.services.trip_service import AsyncTripService
+
+ITINERARY_TABLES = ("trip_places", "trip_foods", "trip_transportations")
+_STATEMENT = re.compile(r"^\s*(INSERT INTO|UPDATE|DELETE FROM)\s+(\w+)", re.IGNORECASE)
+
+
+class StubLocationService:
+    async def get_location_details(self, poi_ids):
+        return {}
+
+
+@contextmanager
+def itinerary_writes():
+    """[(verb, table, rows), ...] written to the itinerary tables inside the block"""
+    writes = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        match = _STATEMENT.match(statement)
+        if match and match.group(2) in ITINERARY_TABLES:
+            verb = match.group(1).split()[0].upper()
+            writes.append((verb, match.group(2), len(parameters) if executemany else 1))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        yield writes
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+
+def _item(poi_id, at, kind="attraction", **kwargs):
+    return TripDayUpdateItineraryItem(type=kind, amap_poi_id=poi_id, time=at, **kwargs)
+
+
+A, B, C = _item("B0A", "09:00"), _item("B0B", "11:00"), _item("B0C", "10:00")
+LUNCH = _item("B0F", "12:00", kind="food")
+
+
+async def _setup(db, user):
+    service = AsyncTripService(db, user, location_service=StubLocationService())
+    trip = await service.create_trip(TripCreate(
+        title="杭州", departure="B000A7BD6C", destinations=["B000A8UIN8"],
+        start_datetime=datetime(2026, 5, 1, 9), end_datetime=datetime(2026, 5, 2, 18),
+    ), user.id)
+    await service.update_trip_day(trip.id, 1, TripDayUpdate(itinerary=[A, B, LUNCH]), user.id)
+    return service, trip.id
+
+
+async def _stops(service, trip_id, user_id):
+    detail, _ = await service.get_trip_day_detail_payload(trip_id, 1, user_id)
+    return [item["name"] for item in detail["itinerary"]]
+
+
+async def _overview_attractions(service, trip_id, user_id):
+    overview, _ = await service.get_trip_overview_payload(trip_id, user_id)
+    return [attraction["name"] for attraction in overview["days_overview"][0]["attractions"]]
+
+
+def test_reorder_updates_only_moved_rows(run_in_db, fake_cache):
+    async def scenario(db, user):
+        service, trip_id = await _setup(db, user)
+        with itinerary_writes() as writes:
+            moved_a = _item("B0A", "11:30")
+            await service.update_trip_day(trip_id, 1, TripDayUpdate(itinerary=[B, moved_a, LUNCH]), user.id)
+        # A and B swap visit_order and A's time changes too: one UPDATE per set of
+        # changed columns, one row each; the lunch row is untouched
+        assert writes == [("UPDATE", "trip_places", 1), ("UPDATE", "trip_places", 1)]
+        assert await _stops(service, trip_id, user.id) == ["B0B", "B0A", "B0F"]
+        assert await _overview_attractions(service, trip_id, user.id) == ["B0B", "B0A"]
+
+    run_in_db(scenario)
+
+
+def test_insert_adds_one_row_and_shifts_the_rest(run_in_db, fake_cache):
+    async def scenario(db, user):
+        service, trip_id = await _setup(db, user)
+        with itinerary_writes() as writes:
+            await service.update_trip_day(trip_id, 1, TripDayUpdate(itinerary=[A, C, B, LUNCH]), user.id)
+        # C takes visit_order 2, B moves to 3
+        assert sorted(writes) == [("INSERT", "trip_places", 1), ("UPDATE", "trip_places", 1)]
+        assert await _stops(service, trip_id, user.id) == ["B0A", "B0C", "B0B", "B0F"]
+        assert await _overview_attractions(service, trip_id, user.id) == ["B0A", "B0C"]
+
+    run_in_db(scenario)
+
+
+def test_delete_removes_only_that_row(run_in_db, fake_cache):
+    async def scenario(db, user):
+        service, trip_id = await _setup(db, user)
+        with itinerary_writes() as writes:
+            day = await service.update_trip_day(trip_id, 1, TripDayUpdate(itinerary=[A, LUNCH]), user.id)
+        assert writes == [("DELETE", "trip_places", 1)]
+        assert day.total_places == 1
+        assert await _stops(service, trip_id, user.id) == ["B0A", "B0F"]
+        assert await _overview_attractions(service, trip_id, user.id) == ["B0A"]
+
+    run_in_db(scenario)
+
+
+def test_unchanged_itinerary_writes_nothing(run_in_db, fake_cache):
+    async def scenario(db, user):
+        service, trip_id = await _setup(db, user)
+        with itinerary_writes() as writes:
+            await service.update_trip_day(trip_id, 1, TripDayUpdate(itinerary=[A, B, LUNCH]), user.id)
+        assert writes == []
+
+    run_in_db(scenario)
+
+
+def test_empty_itinerary_clears_the_day(run_in_db, fake_cache):
+    async def scenario(db, user):
+        service, trip_id = await _setup(db, user)
+        with itinerary_writes() as writes:
+            day = await service.update_trip_day(trip_id, 1, TripDayUpdate(itinerary=[]), user.id)
+        assert sorted(writes) == [("DELETE", "trip_foods", 1), ("DELETE", "trip_places", 1)]
+        assert day.itinerary == []
+        assert await _stops(service, trip_id, user.id) == []
+        assert await _overview_attractions(service, trip_id, user.id) == []
+
+    run_in_db(scenario)
+
+
+def test_transport_between_stops(run_in_db, fake_cache):
+    async def scenario(db, user):
+        service, trip_id = await _setup(db, user)
+        walk_from_a = _item("B0A", "09:00", duration=60, next_transport="walking")
+        with itinerary_writes() as writes:
+            day = await service.update_trip_day(trip_id, 1, TripDayUpdate(itinerary=[walk_from_a, B, LUNCH]), user.id)
+        assert sorted(writes) == [("INSERT", "trip_transportations", 1), ("UPDATE", "trip_places", 1)]
+        transport = [item for item in day.itinerary if item.type == "transportation"]
+        assert len(transport) == 1
+        assert transport[0].time == "10:00"
+
+    run_in_db(scenario)
@@ -0,0 +1,58 @@
+from datetime import datetime, time, timedelta
+
+import pytest
+from sqlalchemy import event, select
+
+from app.core.database import async_engine
+from app.models.trip import TripDay, TripPlace
+from app.schemas.trip import TripCreate
+from app.services.trip_service import TripService
+
+# trip, owner, days, top attractions
+OVERVIEW_QUERIES = 4
+
+
+async def _create_trip(db, user, days: int, places_per_day: int = 4) -> int:
+    start = datetime(2026, 5, 1, 9)
+    trip_data = TripCreate(
+        title=f"{days}日游",
+        departure="B000A7BD6C",
+        destinations=["B000A8UIN8"],
+        start_datetime=start,
+        end_datetime=start + timedelta(days=days - 1),
+    )
+    trip = await db.run_sync(lambda session: TripService(session).create_trip(trip_data, user.id))
+    day_rows = (await db.execute(select(TripDay).where(TripDay.trip_id == trip.id))).scalars().all()
+    for day in day_rows:
+        for order in range(1, places_per_day + 1):
+            db.add(TripPlace(
+                trip_id=trip.id, day_id=day.id, day_index=day.day_index, visit_order=order,
+                name=f"景点{day.day_index}-{order}", category="景点" if order % 2 else "购物",
+                amap_poi_id=f"B{day.day_index:03d}{order:02d}", start_time=time(8 + order, 0),
+            ))
+    await db.commit()
+    return trip.id
+
+
+@pytest.mark.parametrize("days", [3, 30, 90])
+def test_overview_build_runs_constant_queries(run_in_db, fake_cache, days):
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    async def scenario(db, user):
+        trip_id = await _create_trip(db, user, days)
+        db.expunge_all()  # Nothing cached in the session; the owner is not primed either
+
+        event.listen(async_engine.sync_engine, "before_cursor_execute", count_statement)
+        try:
+            overview = await db.run_sync(lambda session: TripService(session)._build_trip_overview(trip_id))
+        finally:
+            event.remove(async_engine.sync_engine, "before_cursor_execute", count_statement)
+
+        assert len(overview.days_overview) == days
+        assert all(len(day.attractions) == 2 for day in overview.days_overview)
+
+    run_in_db(scenario)
+    assert len(statements) == OVERVIEW_QUERIES, statements
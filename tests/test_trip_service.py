@@ -0,0 +1,135 @@
+import threading
+from datetime import datetime
+
+import pytest
+from sqlalchemy import update
+
+from app.core.exceptions import PermissionError, ValidationError
+from app.models.trip import Trip
+from app.schemas.trip import TripCreate, TripDayUpdate
+from app.services.trip_service import AsyncTripService
+from app.utils.cache import CacheKeys
+
+
+class StubLocationService:
+    """No AMap in tests: every POI id stays a placeholder"""
+
+    async def get_location_details(self, poi_ids):
+        return {}
+
+
+def _trip_data(days=3):
+    return TripCreate(
+        title="杭州三日游",
+        departure="B000A7BD6C",
+        destinations=["B000A8UIN8", "B000A83M61"],
+        start_datetime=datetime(2026, 5, 1, 9),
+        end_datetime=datetime(2026, 5, days, 18),
+    )
+
+
+def test_create_overview_update_cancel(run_in_db, fake_cache):
+    async def scenario(db, user):
+        service = AsyncTripService(db, user, location_service=StubLocationService())
+
+        trip = await service.create_trip(_trip_data(), user.id)
+        assert trip.days == 3
+
+        listing = await service.get_trips_payload(user.id)
+        assert listing["total"] == 1
+        assert [item["id"] for item in listing["trips"]] == [trip.id]
+
+        overview, etag = await service.get_trip_overview_payload(trip.id, user.id)
+        assert [day["day_index"] for day in overview["days_overview"]] == [1, 2, 3]
+        assert await service.get_trip_overview_payload(trip.id, user.id, etag) == (None, etag)
+
+        day = await service.update_trip_day(trip.id, 2, TripDayUpdate(title="西湖一日"), user.id)
+        assert day.title == "西湖一日"
+
+        overview, new_etag = await service.get_trip_overview_payload(trip.id, user.id, etag)
+        assert new_etag != etag
+        assert overview["days_overview"][1]["title"] == "西湖一日"
+        detail, _ = await service.get_trip_day_detail_cached(trip.id, 2, user.id)
+        assert detail.title == "西湖一日"
+
+        cancelled = await service.cancel_trip(trip.id, user.id, confirm=True)
+        assert cancelled.status == 2
+
+        overview, _ = await service.get_trip_overview_payload(trip.id, user.id)
+        assert overview["trip_info"]["status"] == 2
+        assert (await service.get_trips_payload(user.id, status="cancelled"))["total"] == 1
+        assert (await service.get_trips_payload(user.id, status="planning"))["total"] == 0
+
+    run_in_db(scenario)
+
+    # Redis is a blocking client: it must never be called on the event loop thread
+    assert fake_cache.threads
+    assert threading.get_ident() not in fake_cache.threads
+
+
+def test_cached_overview_checks_permission(run_in_db, fake_cache):
+    async def scenario(db, user):
+        service = AsyncTripService(db, user, location_service=StubLocationService())
+        trip = await service.create_trip(_trip_data(), user.id)
+
+        await service.get_trip_overview_payload(trip.id, user.id)  # Now cached
+        with pytest.raises(PermissionError):
+            await service.get_trip_overview_payload(trip.id, user.id + 1)
+
+    run_in_db(scenario)
+
+
+def test_cursor_pages_through_equal_timestamps(run_in_db, fake_cache):
+    async def scenario(db, user):
+        service = AsyncTripService(db, user, location_service=StubLocationService())
+        trip_ids = [(await service.create_trip(_trip_data(), user.id)).id for _ in range(5)]
+        # Same created_at (and start) on every trip: the id breaks the tie
+        await db.execute(update(Trip).values(created_at=datetime(2026, 4, 1, 12)))
+        await db.commit()
+
+        seen, cursor = [], None
+        while True:
+            listing = await service.get_trips_payload(user.id, page_size=2, cursor=cursor)
+            seen += [item["id"] for item in listing["trips"]]
+            cursor = listing["next_cursor"]
+            if not listing["has_next"]:
+                assert cursor is None
+                break
+        assert seen == sorted(trip_ids, reverse=True)
+
+        with pytest.raises(ValidationError):
+            await service.get_trips_payload(user.id, cursor="not-a-cursor")
+
+    run_in_db(scenario)
+
+
+def test_status_filter_and_cached_counts(run_in_db, fake_cache):
+    async def scenario(db, user):
+        service = AsyncTripService(db, user, location_service=StubLocationService())
+        first = await service.create_trip(_trip_data(), user.id)
+        second = await service.create_trip(_trip_data(), user.id)
+        count_key = CacheKeys.USER_TRIP_COUNT.format(user_id=user.id)
+
+        assert (await service.get_trips_payload(user.id))["total"] == 2
+        assert (await service.get_trips_payload(user.id, status="planning"))["total"] == 2
+        assert fake_cache.hgetall(count_key) == {"all": 2, "planning": 2}
+
+        # Creating a trip drops the cached counts
+        third = await service.create_trip(_trip_data(), user.id)
+        assert fake_cache.hgetall(count_key) == {}
+        assert (await service.get_trips_payload(user.id))["total"] == 3
+
+        # So does cancelling one
+        await service.get_trips_payload(user.id, status="cancelled")
+        await service.cancel_trip(second.id, user.id, confirm=True)
+        assert fake_cache.hgetall(count_key) == {}
+
+        cancelled = await service.get_trips_payload(user.id, status="cancelled")
+        assert (cancelled["total"], [item["id"] for item in cancelled["trips"]]) == (1, [second.id])
+        planning = await service.get_trips_payload(user.id, status="Planning")
+        assert (planning["total"], [item["id"] for item in planning["trips"]]) == (2, [third.id, first.id])
+
+        with pytest.raises(ValidationError):
+            await service.get_trips_payload(user.id, status="archived")
+
+    run_in_db(scenario)
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app.core.config import settings
+from app.models.trip import Trip
+from app.schemas.trip import TripCreate
+from app.services import trip_service
+from app.services.trip_service import AsyncTripService, refresh_upcoming_trip_weather
+from app.utils.cache import CacheKeys
+from app.utils.metrics import Metrics
+
+
+class StubLocationService:
+    async def get_location_details(self, poi_ids):
+        return {}
+
+
+@pytest.fixture
+def refresh(monkeypatch, fake_cache):
+    """Records the batches passed to fill_trips_weather instead of calling the weather API"""
+    monkeypatch.setattr(settings, "WEATHER_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "WEATHER_REFRESH_BATCH_SIZE", 2)
+    monkeypatch.setattr(trip_service, "metrics", Metrics())
+    batches, budgets = [], set()
+
+    async def fill_trips_weather(self, trip_ids, budget=None):
+        batches.append(list(trip_ids))
+        budgets.add(id(budget))
+        return {trip_id: [1] for trip_id in trip_ids}
+
+    monkeypatch.setattr(AsyncTripService, "fill_trips_weather", fill_trips_weather)
+    return batches, budgets
+
+
+async def _trip(db, user, status, starts_in):
+    service = AsyncTripService(db, user, location_service=StubLocationService())
+    start = datetime.now() + starts_in
+    trip = await service.create_trip(TripCreate(
+        title="杭州", departure="B000A7BD6C", destinations=["B000A8UIN8"],
+        start_datetime=start, end_datetime=start + timedelta(days=1),
+    ), user.id)
+    await db.execute(update(Trip).where(Trip.id == trip.id).values(status=status))
+    await db.commit()
+    return trip.id
+
+
+def test_selects_in_progress_then_upcoming_trips(run_in_db, refresh):
+    batches, budgets = refresh
+
+    async def scenario(db, user):
+        later = await _trip(db, user, 0, timedelta(days=3))
+        soon = await _trip(db, user, 0, timedelta(hours=2))
+        in_progress = await _trip(db, user, 3, timedelta(days=-1))
+        await _trip(db, user, 0, timedelta(days=settings.WEATHER_REFRESH_DAYS + 1))  # Beyond the forecast
+        await _trip(db, user, 0, timedelta(hours=-2))  # Already started, still planning
+        await _trip(db, user, 2, timedelta(days=1))  # Cancelled
+        await _trip(db, user, 1, timedelta(days=1))  # Completed
+
+        assert await refresh_upcoming_trip_weather() == 3
+        return [in_progress, soon, later]
+
+    expected = run_in_db(scenario)
+    assert batches == [expected[:2], expected[2:]]
+    assert len(budgets) == 1  # One upstream budget for the whole pass
+    assert trip_service.metrics.get("weather.refresh_trips") == 3
+
+
+def test_one_pass_per_interval(run_in_db, refresh, fake_cache):
+    batches, _ = refresh
+
+    async def scenario(db, user):
+        await _trip(db, user, 0, timedelta(days=1))
+        assert await refresh_upcoming_trip_weather() == 1
+        # Another worker (or this one) within the interval: the lock is still held
+        assert await refresh_upcoming_trip_weather() == 0
+        assert len(batches) == 1
+        assert trip_service.metrics.get("weather.refresh_skipped_locked") == 1
+
+        # The lock expires after WEATHER_REFRESH_SECONDS
+        await asyncio.to_thread(fake_cache.delete, CacheKeys.WEATHER_REFRESH_LOCK)
+        assert await refresh_upcoming_trip_weather() == 1
+        assert len(batches) == 2
+
+    run_in_db(scenario)
+    assert threading.get_ident() not in fake_cache.threads
+
+
+def test_no_pass_without_api_key(run_in_db, refresh, monkeypatch, fake_cache):
+    monkeypatch.setattr(settings, "WEATHER_API_KEY", "")
+
+    async def scenario(db, user):
+        await _trip(db, user, 0, timedelta(days=1))
+        assert await refresh_upcoming_trip_weather() == 0
+
+    run_in_db(scenario)
+    assert refresh[0] == []
+    assert CacheKeys.WEATHER_REFRESH_LOCK not in fake_cache.data